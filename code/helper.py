@@ -67,6 +67,22 @@ def evaluate_ast(node, symbols=None, species=None, parameters=None):
         except Exception as e:
             raise e
 
+    elif node_type in (libsbml.AST_PLUS, libsbml.AST_TIMES) or \
+            (node_type == libsbml.AST_MINUS and node.getNumChildren() == 1):
+        # The L3 parser gives n-ary sums and products, e.g. a*b*c as one node, and
+        # unary minus as a minus with a single child
+        children = [evaluate_ast(node.getChild(i), symbols=symbols, species=species, parameters=parameters)
+                    for i in range(node.getNumChildren())]
+
+        if node_type == libsbml.AST_PLUS:
+            value = sum(children)
+        elif node_type == libsbml.AST_TIMES:
+            value = 1
+            for child in children:
+                value *= child
+        else:
+            value = -children[0]
+
     else:  # Binary operators
         try:
             left = evaluate_ast(node.getLeftChild(), symbols=symbols, species=species, parameters=parameters)
@@ -75,14 +91,10 @@ def evaluate_ast(node, symbols=None, species=None, parameters=None):
         except Exception as e:
             raise e
 
-        if node_type == libsbml.AST_PLUS:
-            value = left + right
-        elif node_type == libsbml.AST_DIVIDE:
+        if node_type == libsbml.AST_DIVIDE:
             value = left / right
         elif node_type == libsbml.AST_MINUS:
             value = left - right
-        elif node_type == libsbml.AST_TIMES:
-            value = left * right
         elif node_type == 296:  # AST_POWER
             value = math.pow(left, right)
         else:
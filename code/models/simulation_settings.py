@@ -1,19 +1,61 @@
 import numpy as np
 
 
+class SolverSettings:
+    """
+    :param str method: integrator of the ODE simulator: "odeint", one of the solve_ivp
+        methods "LSODA", "BDF", "Radau", "RK45" and "DOP853", or "auto" to pick one
+        by probing the stiffness of the network at the start of the integration
+    :param float rtol: relative tolerance, None for the default of the integrator
+    :param float atol: absolute tolerance, None for the default of the integrator
+    :param float max_step: largest step of the integrator, None for no limit
+    :param bool dense_output: also return a continuous solution (solve_ivp methods only)
+    """
+
+    METHODS = ("odeint", "auto", "LSODA", "BDF", "Radau", "RK45", "DOP853")
+
+    def __init__(self, method="odeint", rtol=None, atol=None, max_step=None, dense_output=False):
+        if method not in SolverSettings.METHODS:
+            raise ValueError("Unknown method " + str(method) + ", expected one of " + str(SolverSettings.METHODS))
+
+        self.method = method
+        self.rtol = rtol
+        self.atol = atol
+        self.max_step = max_step
+        self.dense_output = dense_output
+
+    """
+    Return the tolerances and step limit which are set, as keyword arguments of the
+    integrator
+    :param str method: integrator the options are for, the method of the settings if None
+    """
+
+    def integrator_options(self, method=None):
+        options = {"rtol": self.rtol, "atol": self.atol}
+        if (method or self.method) == "odeint":
+            options["hmax"] = self.max_step
+        else:
+            options["max_step"] = self.max_step
+
+        return {key: value for key, value in options.items() if value is not None}
+
+
 class SimulationSettings:
     """
     :param float start_time: of simulation
     :param float end_time: of simulation
     :param int precision: how many data points in the given time period
     :param List[str] plotted_species: Which species to plot in the visualisation
+    :param SolverSettings solver: integrator of deterministic simulations, odeint with
+        its default tolerances if None
     """
 
-    def __init__(self, start_time, end_time, precision, plotted_species):
+    def __init__(self, start_time, end_time, precision, plotted_species, solver=None):
         self.plotted_species = plotted_species
         self.start_time = start_time
         self.end_time = end_time
         self.precision = precision
+        self.solver = solver or SolverSettings()
 
     """
     Return time space using the simulation settings
@@ -0,0 +1,78 @@
+import time
+
+import numpy as np
+
+from models.simulation_settings import SimulationSettings, SolverSettings
+from simulation.ode_simulator import OdeSimulator
+from test import get_large_network, get_synthetic_network
+
+"""
+Benchmark of the right hand sides of OdeSimulator. Prints the wall clock time of a
+whole integration with the dictionary based right hand side, and with the compiled one
+under each kind of Jacobian, with the largest difference from the dictionary based
+results. Then prints the work of each integrator on the same networks.
+"""
+
+# Each synthetic gene has an mRNA and a protein species
+SYNTHETIC_GENES = [50, 500]
+
+REPEATS = 3
+
+# Default relative and absolute tolerance of odeint
+ODEINT_TOLERANCE = 1.49012e-8
+
+
+def time_simulation(net, sim, compiled, jacobian=None):
+    """
+    Return the best wall clock time of a few integrations and the results of the last
+    :param Network net: network to simulate
+    :param SimulationSettings sim: for simulation
+    :param bool compiled: use the compiled right hand side
+    :param str jacobian: Jacobian of the compiled right hand side, see OdeSimulator.simulate
+    :returns Tuple[float, np.ndarray] of seconds and results
+    """
+
+    best = np.inf
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        results = OdeSimulator.simulate(net, sim, compiled, jacobian)
+        best = min(best, time.perf_counter() - start)
+
+    return best, results
+
+
+if __name__ == '__main__':
+    networks = [("large network", get_large_network())]
+    networks += [("synthetic " + str(2 * genes), get_synthetic_network(genes)) for genes in SYNTHETIC_GENES]
+    sim = SimulationSettings(0, 1000, 1000, [])
+    sparse_sim = SimulationSettings(0, 1000, 1000, [], SolverSettings("BDF", rtol=ODEINT_TOLERANCE,
+                                                                      atol=ODEINT_TOLERANCE))
+
+    print("{:>20} {:>20} {:>10} {:>10} {:>12}".format("network", "right hand side", "time (s)", "speedup",
+                                                      "max diff"))
+
+    for name, net in networks:
+        legacy, legacy_results = time_simulation(net, sim, False)
+        print("{:>20} {:>20} {:>10.3f}".format(name, "dict", legacy))
+
+        for jacobian in OdeSimulator.JACOBIANS:
+            # odeint takes no sparse Jacobian, BDF at the tolerances of odeint does
+            jacobian_sim = sparse_sim if jacobian == "sparse" else sim
+            compiled, compiled_results = time_simulation(net, jacobian_sim, True, jacobian)
+            difference = np.max(np.abs(legacy_results - compiled_results))
+            print("{:>20} {:>20} {:>10.3f} {:>10.1f} {:>12.2e}".format(name, "compiled, " + str(jacobian), compiled,
+                                                                      legacy / compiled, difference))
+
+    print()
+    print("{:>20} {:>15} {:>10} {:>10} {:>10} {:>10}".format("network", "method", "time (s)", "nfev", "njev", "nlu"))
+
+    for name, net in networks:
+        for method in SolverSettings.METHODS:
+            solver_sim = SimulationSettings(0, 1000, 1000, [], SolverSettings(method))
+            start = time.perf_counter()
+            solution = OdeSimulator.solve(net, solver_sim, compiled=True, jacobian="dense")
+            elapsed = time.perf_counter() - start
+
+            label = method if method == solution.method else method + " -> " + solution.method
+            print("{:>20} {:>15} {:>10.3f} {:>10} {:>10} {:>10}".format(name, label, elapsed, solution.nfev,
+                                                                       solution.njev, solution.nlu))
@@ -0,0 +1,152 @@
+from itertools import accumulate
+
+import numpy as np
+
+from simulation import jit_gillespie
+from simulation.compiled_network import CompiledNetwork
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.jit_gillespie import JitGillespieSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import ChunkedEventRecorder, ChunkedGridRecorder, EventRecorder
+
+
+class CompiledGillespieSimulator:
+    """
+    Gillespie's direct method run over a CompiledNetwork. The network is turned into an
+    integer state vector, a sparse stoichiometry matrix and a propensity array once.
+    After each event only the propensities of the reactions in the dependency graph of
+    the fired reaction are recomputed.
+
+    When numba is installed, the loop runs as native code by default, see
+    JitGillespieSimulator; otherwise, or for networks with custom rate formulae, it
+    runs in Python.
+
+    Each firing of a reaction changes its species by their stoichiometry (one molecule
+    per reactant and product) and waiting times are exponentially distributed.
+    """
+
+    BACKENDS = ("auto", "python", "numba")
+
+    # simulate() also takes a CompiledNetwork, which it does not modify
+    TAKES_COMPILED_NETWORK = True
+
+    """
+    Performs a Gillespie simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param Network net: to simulate, or its CompiledNetwork to reuse it across runs
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every event by default
+    :param str backend: "python", "numba" for the native code of JitGillespieSimulator,
+        or "auto" for numba when it is installed and supports the network and recorder
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    @staticmethod
+    def simulate(net, sim, rng=None, recorder=None, backend="auto"):
+        if backend not in CompiledGillespieSimulator.BACKENDS:
+            raise ValueError("Unknown backend " + str(backend) + ", expected one of " +
+                             str(CompiledGillespieSimulator.BACKENDS))
+
+        rng = RandomStream.of(rng)
+        recorder = recorder or EventRecorder()
+        compiled = net if isinstance(net, CompiledNetwork) else CompiledNetwork(net)
+
+        if backend == "numba" or (backend == "auto" and jit_gillespie.available() and
+                                   jit_gillespie.supports(compiled, recorder)):
+            return JitGillespieSimulator().run(compiled, sim, rng, recorder)
+
+        return _run_to_end(CompiledGillespieSimulator._direct_method(compiled, sim, rng, recorder))
+
+    @staticmethod
+    def _direct_method(compiled, sim, rng, recorder):
+        """
+        Run the direct method, feeding every event to the recorder. This is a generator
+        which yields after each event, so that stream() can hand over what the recorder
+        holds while the simulation advances, and returns the results of the recorder.
+        :param CompiledNetwork compiled: network to simulate
+        :param SimulationSettings sim: for simulation
+        :param RandomStream rng: source of random numbers
+        :param EventRecorder recorder: decides which states are kept
+        """
+
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+
+        x = compiled.initial_state()
+        a = np.maximum(compiled.propensities(x), 0.0).tolist()
+        x = x.tolist()
+        t = sim.start_time
+
+        recorder.start(compiled.species_names, sim, t, x, changes)
+        advance, record = recorder.advance, recorder.record
+
+        while True:
+            cumulative = list(accumulate(a))
+            a0 = cumulative[-1] if cumulative else 0
+            if a0 <= 0:
+                break
+
+            t = t + rng.exponential(a0)
+            if t > sim.end_time:
+                break
+
+            advance(t, x)
+            j = rng.pick(cumulative, a0)
+
+            for i, change in changes[j]:
+                x[i] += change
+            for k in dependents[j]:
+                a[k] = max(functions[k](x), 0.0)
+
+            record(t, x, j)
+            yield
+
+        return recorder.finish(sim.end_time, x)
+
+    """
+    Performs a Gillespie simulation of the given network like simulate(), but yields
+    the results in chunks while the simulation advances instead of returning them at
+    the end. Only one chunk is held at a time, so memory stays flat for arbitrarily
+    long simulations. Closing the generator stops the simulation.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param bool grid: yield samples on the time space of the settings rather than every event
+    :param int chunk_size: number of events or grid samples in each chunk
+    :returns Iterator[SampledTrajectory] of consecutive chunks of the trajectory
+    """
+
+    @staticmethod
+    def stream(net, sim, rng=None, grid=False, chunk_size=1024):
+        rng = RandomStream.of(rng)
+        recorder = ChunkedGridRecorder(chunk_size) if grid else ChunkedEventRecorder(chunk_size)
+        run = CompiledGillespieSimulator._direct_method(CompiledNetwork(net), sim, rng, recorder)
+
+        while True:
+            try:
+                next(run)
+            except StopIteration as stop:
+                yield from stop.value
+                return
+
+            if recorder.chunks:
+                yield from recorder.take()
+
+    @staticmethod
+    def visualise(results, sim):
+        GillespieSimulator.visualise(results, sim)
+
+
+def _run_to_end(generator):
+    """
+    Exhaust a generator and return its return value
+    """
+
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
@@ -0,0 +1,739 @@
+import numpy as np
+from scipy import sparse
+
+from models.formulae.degradation_formula import DegradationFormula
+from models.formulae.transcription_formula import TranscriptionFormula
+from models.formulae.translation_formula import TranslationFormula
+from models.input_gate import InputGate
+from models.reg_type import RegType
+
+
+class CompiledNetwork:
+    """
+    A Network lowered into arrays once, so that simulators can work on a state vector
+    instead of a dictionary of species. Species become indices into the state vector,
+    reactions become columns of a sparse stoichiometry matrix and the rate functions
+    are grouped into vectorised propensity kernels.
+
+    Rate parameters are read when the network is compiled, so a network which is
+    mutated afterwards has to be compiled again.
+
+    :param Network net: network to compile
+    """
+
+    def __init__(self, net):
+        self.species_names = list(net.species.keys())
+        self.reaction_names = [r.name for r in net.reactions]
+        self.species_index = {s: i for i, s in enumerate(self.species_names)}
+        self.initial_values = np.array([float(net.species[s]) for s in self.species_names])
+
+        self.reactions = list(net.reactions)
+        self.stoichiometry = self._build_stoichiometry()
+
+        # For each reaction, a list of (species index, change) pairs
+        self.changes = [list(zip(self.stoichiometry.indices[self.stoichiometry.indptr[j]:
+                                                            self.stoichiometry.indptr[j + 1]].tolist(),
+                                 self.stoichiometry.data[self.stoichiometry.indptr[j]:
+                                                         self.stoichiometry.indptr[j + 1]].tolist()))
+                        for j in range(self.reaction_count)]
+
+        self.reads = [self._species_read_by(r.rate_function) for r in self.reactions]
+        self._symbolic_formulae = dict()
+        self.dependents = self._build_dependency_graph()
+        self.propensity_functions = [self._propensity_function(j) for j in range(self.reaction_count)]
+
+        self._compile_kernels()
+
+    @property
+    def species_count(self):
+        return len(self.species_names)
+
+    @property
+    def reaction_count(self):
+        return len(self.reactions)
+
+    def _build_stoichiometry(self):
+        """
+        Return the (species x reactions) stoichiometry matrix, where each species on the
+        left of a reaction counts -1 and each species on the right counts +1
+        :returns scipy.sparse.csc_matrix of the stoichiometry
+        """
+
+        rows, cols, data = [], [], []
+        for j, r in enumerate(self.reactions):
+            for s in (r.left or []):
+                rows.append(self.species_index[s])
+                cols.append(j)
+                data.append(-1)
+            for s in (r.right or []):
+                rows.append(self.species_index[s])
+                cols.append(j)
+                data.append(1)
+
+        # Converting to CSC sums duplicate entries, e.g. A + A -> B
+        matrix = sparse.csc_matrix((np.array(data, dtype=np.int64), (rows, cols)),
+                                   shape=(self.species_count, self.reaction_count))
+        matrix.eliminate_zeros()
+        matrix.sort_indices()
+        return matrix
+
+    def _species_read_by(self, formula):
+        """
+        Return the indices of the species which the given rate function reads
+        :param Formula formula: rate function of a reaction
+        :returns List[int] of species indices
+        """
+
+        if isinstance(formula, DegradationFormula):
+            names = [formula.decaying_species]
+        elif isinstance(formula, TranslationFormula):
+            names = [formula.mrna_species]
+        elif isinstance(formula, TranscriptionFormula):
+            names = [reg.from_gene for reg in (formula.regulators or [])]
+        else:
+            names = self._names_in_formula(formula)
+
+        return sorted({self.species_index[s] for s in names if s in self.species_index})
+
+    def _names_in_formula(self, formula):
+        """
+        Return the names appearing in the AST of a formula which is not one of the built in
+        formulae. If the formula cannot be parsed, every species is assumed to be read.
+        :param Formula formula: rate function of a reaction
+        :returns List[str] of names
+        """
+
+        try:
+            from libsbml import parseL3Formula, AST_NAME
+            ast = parseL3Formula(formula.get_formula_string())
+        except (ImportError, AttributeError, TypeError):
+            ast = None
+
+        if ast is None:
+            return self.species_names
+
+        names = []
+        stack = [ast]
+        while stack:
+            node = stack.pop()
+            if node.getType() == AST_NAME:
+                names.append(node.getName())
+            stack.extend(node.getChild(i) for i in range(node.getNumChildren()))
+
+        return names
+
+    def _build_dependency_graph(self):
+        """
+        Return, for every reaction, the reactions whose propensities change when it fires,
+        i.e. those reading a species which the reaction changes
+        :returns List[List[int]] of dependent reactions
+        """
+
+        readers = [[] for _ in self.species_names]
+        for j, species in enumerate(self.reads):
+            for i in species:
+                readers[i].append(j)
+
+        return [sorted({k for i, _ in self.changes[j] for k in readers[i]})
+                for j in range(self.reaction_count)]
+
+    def _propensity_function(self, j):
+        """
+        Return a function computing the propensity of the given reaction from a state
+        vector, for simulators which only update a few propensities at a time
+        :param int j: index of the reaction to compile
+        :returns Callable[[Sequence[float]], float] of the reaction's propensity
+        """
+
+        reaction = self.reactions[j]
+        f = reaction.rate_function
+
+        if isinstance(f, (DegradationFormula, TranslationFormula)):
+            i = self.reads[j][0]
+            rate = float(f.rate)
+            return lambda x: rate * x[i]
+
+        if isinstance(f, TranscriptionFormula):
+            rate = float(f.rate)
+            regulators = f.regulators or []
+
+            if not regulators or (len(regulators) == 2 and f.input_gate == InputGate.NONE):
+                return lambda x: rate
+            elif len(regulators) > 2:
+                return lambda x: 0.0
+            elif len(regulators) == 1:
+                h = self._hill_factor(regulators[0], f.hill_coeff)
+                return lambda x: rate * h(x)
+            elif f.input_gate == InputGate.AND:
+                h1 = self._hill_factor(regulators[0], f.hill_coeff)
+                h2 = self._hill_factor(regulators[1], f.hill_coeff)
+                return lambda x: rate * h1(x) * h2(x)
+            else:  # InputGate.OR
+                one, two = regulators
+                i1, k1 = self.species_index[one.from_gene], float(one.k)
+                i2, k2 = self.species_index[two.from_gene], float(two.k)
+                n = float(f.hill_coeff)
+                act1 = 1.0 if one.reg_type == RegType.ACTIVATION else 0.0
+                act2 = 1.0 if two.reg_type == RegType.ACTIVATION else 0.0
+                offset = 0.0 if act1 and act2 else 1.0
+
+                def or_gate(x):
+                    a = (x[i1] / k1) ** n
+                    b = (x[i2] / k2) ** n
+                    return rate * (act1 * a + act2 * b + offset) / (1 + a + b)
+
+                return or_gate
+
+        def other(x):
+            return self._custom_rate(j, self.state_dict(x))
+
+        return other
+
+    def _hill_factor(self, regulation, n):
+        i = self.species_index[regulation.from_gene]
+        k = float(regulation.k)
+        n = float(n)
+
+        if regulation.reg_type == RegType.ACTIVATION:
+            def activation(x):
+                ratio = (x[i] / k) ** n
+                return ratio / (1 + ratio)
+
+            return activation
+        else:
+            def repression(x):
+                return 1 / (1 + (x[i] / k) ** n)
+
+            return repression
+
+    def _compile_kernels(self):
+        linear_reactions, linear_species, linear_rates = [], [], []
+        constant_reactions, constant_rates = [], []
+        hill_reactions, hill_rates, hill_first, hill_second = [], [], [], []
+        or_reactions, or_rates, or_first, or_second = [], [], [], []
+
+        # Every regulation of a Hill reaction is one "factor": (species, K, n, is activation)
+        factor_species, factor_k, factor_n, factor_activation = [], [], [], []
+
+        def add_factor(regulation, n):
+            factor_species.append(self.species_index[regulation.from_gene])
+            factor_k.append(float(regulation.k))
+            factor_n.append(float(n))
+            factor_activation.append(regulation.reg_type == RegType.ACTIVATION)
+            return len(factor_species) - 1
+
+        self.other_reactions = []
+
+        # Where the rate and the factors of each reaction are in the kernel parameters
+        self._rate_positions = dict()
+        self._reaction_factors = dict()
+
+        for j, r in enumerate(self.reactions):
+            f = r.rate_function
+            factors_before = len(factor_species)
+
+            if isinstance(f, DegradationFormula):
+                self._rate_positions[j] = ("linear_rates", len(linear_rates))
+                linear_reactions.append(j)
+                linear_species.append(self.species_index[f.decaying_species])
+                linear_rates.append(float(f.rate))
+            elif isinstance(f, TranslationFormula):
+                self._rate_positions[j] = ("linear_rates", len(linear_rates))
+                linear_reactions.append(j)
+                linear_species.append(self.species_index[f.mrna_species])
+                linear_rates.append(float(f.rate))
+            elif isinstance(f, TranscriptionFormula):
+                regulators = f.regulators or []
+
+                if not regulators:
+                    self._rate_positions[j] = ("constant_rates", len(constant_rates))
+                    constant_reactions.append(j)
+                    constant_rates.append(float(f.rate))
+                elif len(regulators) == 1:
+                    self._rate_positions[j] = ("hill_rates", len(hill_rates))
+                    hill_reactions.append(j)
+                    hill_rates.append(float(f.rate))
+                    hill_first.append(add_factor(regulators[0], f.hill_coeff))
+                    hill_second.append(-1)
+                elif len(regulators) == 2 and f.input_gate == InputGate.AND:
+                    self._rate_positions[j] = ("hill_rates", len(hill_rates))
+                    hill_reactions.append(j)
+                    hill_rates.append(float(f.rate))
+                    hill_first.append(add_factor(regulators[0], f.hill_coeff))
+                    hill_second.append(add_factor(regulators[1], f.hill_coeff))
+                elif len(regulators) == 2 and f.input_gate == InputGate.OR:
+                    self._rate_positions[j] = ("or_rates", len(or_rates))
+                    or_reactions.append(j)
+                    or_rates.append(float(f.rate))
+                    or_first.append(add_factor(regulators[0], f.hill_coeff))
+                    or_second.append(add_factor(regulators[1], f.hill_coeff))
+                elif len(regulators) == 2:
+                    # Two regulators without a gate do not regulate (h = 1)
+                    self._rate_positions[j] = ("constant_rates", len(constant_rates))
+                    constant_reactions.append(j)
+                    constant_rates.append(float(f.rate))
+                else:
+                    # More than two regulators are not supported (h = 0)
+                    constant_reactions.append(j)
+                    constant_rates.append(0.0)
+            else:
+                self.other_reactions.append(j)
+
+            self._reaction_factors[j] = list(range(factors_before, len(factor_species)))
+
+        factor_count = len(factor_species)
+
+        self._linear_reactions = np.array(linear_reactions, dtype=np.intp)
+        self._linear_species = np.array(linear_species, dtype=np.intp)
+        self._linear_rates = np.array(linear_rates)
+
+        self._constant_reactions = np.array(constant_reactions, dtype=np.intp)
+        self._constant_rates = np.array(constant_rates)
+
+        self._factor_species = np.array(factor_species, dtype=np.intp)
+        self._factor_k = np.array(factor_k)
+        self._factor_n = np.array(factor_n)
+        self._factor_activation = np.array(factor_activation, dtype=bool)
+
+        # A missing second factor points at a padding column which is 1 for Hill
+        # reactions, so single and AND-gated regulation share one kernel
+        self._hill_reactions = np.array(hill_reactions, dtype=np.intp)
+        self._hill_rates = np.array(hill_rates)
+        self._hill_first = np.array(hill_first, dtype=np.intp)
+        self._hill_second = np.array([factor_count if i < 0 else i for i in hill_second], dtype=np.intp)
+
+        self._or_reactions = np.array(or_reactions, dtype=np.intp)
+        self._or_rates = np.array(or_rates)
+        self._or_first = np.array(or_first, dtype=np.intp)
+        self._or_second = np.array(or_second, dtype=np.intp)
+        # OR gate: (a + b) / c, (a + 1) / c, (1 + b) / c or 1 / c depending on the regulation types
+        first_act = self._factor_activation[self._or_first]
+        second_act = self._factor_activation[self._or_second]
+        self._or_first_act = first_act.astype(float)
+        self._or_second_act = second_act.astype(float)
+        self._or_offset = (~(first_act & second_act)).astype(float)
+
+        # Reaction of each factor, and how much the species read by the linear kernel and
+        # by each factor change when their own reaction fires
+        factor_reactions = np.zeros(factor_count, dtype=np.intp)
+        for j, factors in self._reaction_factors.items():
+            factor_reactions[factors] = j
+        self._factor_reactions = factor_reactions
+        self._linear_own_changes = self._stoichiometry_entries(self._linear_species, self._linear_reactions)
+        self._factor_own_changes = self._stoichiometry_entries(self._factor_species, self._factor_reactions)
+
+    def _stoichiometry_entries(self, species, reactions):
+        if not len(species):
+            return np.zeros(0)
+        return np.asarray(self.stoichiometry[species, reactions], dtype=float).ravel()
+
+    # Kinds of propensity in reaction_table()
+    CONSTANT, LINEAR, HILL, OR_GATE, OTHER = range(5)
+
+    def reaction_table(self):
+        """
+        Return the propensity of every reaction as plain arrays, for kernels compiled
+        outside Python. Each reaction has a kind, a rate and either the species of its
+        linear term or its first and second Hill factor (-1 when there is none). Every
+        factor has a species, K, Hill coefficient and whether it activates.
+        :returns Tuple[np.ndarray, ...] of kinds, rates, species, first factors, second
+            factors, and factor species, K, Hill coefficients and activations
+        """
+
+        kinds = np.full(self.reaction_count, self.OTHER, dtype=np.int64)
+        rates = np.zeros(self.reaction_count)
+        species = np.full(self.reaction_count, -1, dtype=np.int64)
+        first = np.full(self.reaction_count, -1, dtype=np.int64)
+        second = np.full(self.reaction_count, -1, dtype=np.int64)
+
+        kinds[self._constant_reactions] = self.CONSTANT
+        rates[self._constant_reactions] = self._constant_rates
+
+        kinds[self._linear_reactions] = self.LINEAR
+        rates[self._linear_reactions] = self._linear_rates
+        species[self._linear_reactions] = self._linear_species
+
+        factor_count = len(self._factor_species)
+
+        kinds[self._hill_reactions] = self.HILL
+        rates[self._hill_reactions] = self._hill_rates
+        first[self._hill_reactions] = self._hill_first
+        second[self._hill_reactions] = np.where(self._hill_second == factor_count, -1, self._hill_second)
+
+        kinds[self._or_reactions] = self.OR_GATE
+        rates[self._or_reactions] = self._or_rates
+        first[self._or_reactions] = self._or_first
+        second[self._or_reactions] = self._or_second
+
+        return (kinds, rates, species, first, second,
+                self._factor_species.astype(np.int64), self._factor_k, self._factor_n, self._factor_activation)
+
+    def species_orders(self):
+        """
+        Return, for each species, a bound on how strongly propensities respond to it: a
+        relative change of e in the species changes any propensity by at most about
+        order * e. Degradation and translation are first order in their species, Hill
+        terms are of the order of their Hill coefficient and other formulae are assumed
+        to be at most second order. Species which no propensity reads get 0.
+        :returns np.ndarray of species orders
+        """
+
+        orders = np.zeros(self.species_count)
+
+        for species in self.reads:
+            orders[species] = np.maximum(orders[species], 1)
+
+        if self._factor_species.size:
+            np.maximum.at(orders, self._factor_species, self._factor_n)
+
+        for j in self.other_reactions:
+            orders[self.reads[j]] = np.maximum(orders[self.reads[j]], 2)
+
+        return orders
+
+    def initial_state(self):
+        """
+        Return the initial species counts of the network as an integer state vector
+        :returns np.ndarray of species counts
+        """
+
+        return np.rint(self.initial_values).astype(np.int64)
+
+    def state_dict(self, x):
+        """
+        Return the given state vector labelled with species names
+        :param np.ndarray x: state vector
+        :returns Dict[str, float] of network state
+        """
+
+        if isinstance(x, np.ndarray):
+            x = x.tolist()
+        return dict(zip(self.species_names, x))
+
+    def kernel_parameters(self):
+        """
+        Return the rate parameters of the propensity kernels, which propensities() can
+        take in place of those of the network, e.g. with a row for each of a batch of
+        parameter sets
+        :returns Dict[str, np.ndarray] of the rates of each kernel and the K and Hill
+            coefficient of each Hill factor
+        """
+
+        return {"linear_rates": self._linear_rates.copy(), "constant_rates": self._constant_rates.copy(),
+                "hill_rates": self._hill_rates.copy(), "or_rates": self._or_rates.copy(),
+                "factor_k": self._factor_k.copy(), "factor_n": self._factor_n.copy()}
+
+    def parameter_positions(self, name, reaction_name, regulator=None):
+        """
+        Return where a parameter of a reaction is in the kernel parameters
+        :param str name: "rate", "hill_coeff" or "k"
+        :param str reaction_name: name of the reaction
+        :param str regulator: regulating species, for the K of its regulation
+        :returns List[Tuple[str, int]] of kernel parameters and positions, empty if the
+            parameter has no effect on the propensity
+        """
+
+        if reaction_name not in self.reaction_names:
+            raise ValueError("No reaction named " + str(reaction_name))
+
+        j = self.reaction_names.index(reaction_name)
+        if j in self.other_reactions:
+            raise ValueError("Parameters of custom formulae are not compiled, in reaction " + reaction_name)
+
+        factors = self._reaction_factors[j]
+
+        if name == "rate":
+            return [self._rate_positions[j]] if j in self._rate_positions else []
+        elif name == "hill_coeff":
+            return [("factor_n", f) for f in factors]
+        elif name == "k":
+            positions = [("factor_k", f) for f in factors if self.species_names[self._factor_species[f]] == regulator]
+            if not positions:
+                raise ValueError("Reaction " + reaction_name + " is not regulated by " + str(regulator))
+            return positions
+        else:
+            raise ValueError("Unknown parameter " + str(name) + ", expected rate, hill_coeff or k")
+
+    def propensities(self, x, parameters=None):
+        """
+        Return the propensity of every reaction in the given state. The state can also
+        be a (batch x species) matrix, in which case a (batch x reactions) matrix is returned.
+        :param np.ndarray x: state vector
+        :param Dict[str, np.ndarray] parameters: kernel parameters to use instead of those
+            of the network, see kernel_parameters(), with a row for each state of a batch
+        :returns np.ndarray of reaction propensities
+        """
+
+        x = np.asarray(x, dtype=float)
+        a = np.zeros(x.shape[:-1] + (self.reaction_count,))
+        self._kernel_propensities(a, x[..., self._linear_species], x[..., self._factor_species], parameters)
+
+        if self.other_reactions:
+            if x.ndim == 1:
+                state = self.state_dict(x)
+                for j in self.other_reactions:
+                    a[j] = self._custom_rate(j, state)
+            else:
+                flat_x = x.reshape(-1, self.species_count)
+                flat_a = a.reshape(-1, self.reaction_count)
+                for row, values in zip(flat_a, flat_x):
+                    state = self.state_dict(values)
+                    for j in self.other_reactions:
+                        row[j] = self._custom_rate(j, state)
+
+        return a
+
+    def propensities_along(self, x, steps):
+        """
+        Return, for every reaction j, its propensity in the state x + steps[j] * S[:, j],
+        i.e. after moving the given number of firings along its own stoichiometry column.
+        Each reaction is evaluated at its own state only, reading the species of its
+        kernel, so a batch costs about as much as propensities(). Shifted values are
+        clipped at zero.
+        :param np.ndarray x: (batch x species) states
+        :param np.ndarray steps: (batch x reactions) number of firings of each reaction
+        :returns np.ndarray of (batch x reactions) propensities
+        """
+
+        x = np.asarray(x, dtype=float)
+        steps = np.asarray(steps, dtype=float)
+        a = np.zeros(steps.shape)
+
+        def shifted(reactions, species, changes):
+            return np.maximum(x[..., species] + steps[..., reactions] * changes, 0.0)
+
+        self._kernel_propensities(a, shifted(self._linear_reactions, self._linear_species, self._linear_own_changes),
+                                  shifted(self._factor_reactions, self._factor_species, self._factor_own_changes))
+
+        if self.other_reactions:
+            flat_x = x.reshape(-1, self.species_count)
+            flat_steps = steps.reshape(-1, self.reaction_count)
+            flat_a = a.reshape(-1, self.reaction_count)
+            for row, values, row_steps in zip(flat_a, flat_x, flat_steps):
+                for j in self.other_reactions:
+                    state = values.copy()
+                    for i, change in self.changes[j]:
+                        state[i] += row_steps[j] * change
+                    row[j] = self._custom_rate(j, self.state_dict(np.maximum(state, 0.0)))
+
+        return a
+
+    def _kernel_propensities(self, a, linear_values, factor_values, parameters=None):
+        """
+        Set the propensities of the reactions with vectorised kernels, from the values of
+        the species read by the linear kernel and by each Hill factor
+        """
+
+        p = parameters or {}
+        linear_rates = p.get("linear_rates", self._linear_rates)
+        constant_rates = p.get("constant_rates", self._constant_rates)
+        hill_rates = p.get("hill_rates", self._hill_rates)
+        or_rates = p.get("or_rates", self._or_rates)
+        factor_k = p.get("factor_k", self._factor_k)
+        factor_n = p.get("factor_n", self._factor_n)
+
+        if self._linear_reactions.size:
+            a[..., self._linear_reactions] = linear_rates * linear_values
+
+        if self._constant_reactions.size:
+            a[..., self._constant_reactions] = constant_rates
+
+        if self._factor_species.size:
+            ratio = (factor_values / factor_k) ** factor_n
+
+            if self._hill_reactions.size:
+                h = np.where(self._factor_activation, ratio / (1 + ratio), 1 / (1 + ratio))
+                h = np.concatenate((h, np.ones(ratio.shape[:-1] + (1,))), axis=-1)
+                a[..., self._hill_reactions] = \
+                    hill_rates * h[..., self._hill_first] * h[..., self._hill_second]
+
+            if self._or_reactions.size:
+                one = ratio[..., self._or_first]
+                two = ratio[..., self._or_second]
+                numerator = self._or_first_act * one + self._or_second_act * two + self._or_offset
+                a[..., self._or_reactions] = or_rates * numerator / (1 + one + two)
+
+    def _compile_custom_formula(self, j):
+        """
+        Return a custom formula and its derivatives with respect to the species it reads,
+        compiled from its AST, or None if it cannot be differentiated. The rate and the
+        derivatives come from the same expression, so they always agree.
+        :param int j: index of the reaction
+        :returns Tuple[Dict[str, float], Dict[str, float], float, code, List[Tuple[int, code]]]
+            of the symbols and parameters of the formula, its time multiplier, the compiled
+            formula and the compiled derivative of each species
+        """
+
+        try:
+            from models.formulae.custom_formula import CustomFormula
+            from simulation.symbolic_derivative import FUNCTIONS, compile_formula
+        except ImportError:
+            return None
+
+        f = self.reactions[j].rate_function
+        if not isinstance(f, CustomFormula):
+            return None
+
+        try:
+            formula, derivatives = compile_formula(f.get_formula_string(),
+                                                   [self.species_names[i] for i in self.reads[j]])
+        except ValueError:
+            return None
+
+        symbols = dict(FUNCTIONS)
+        symbols.update(getattr(f.net, "symbols", None) or {})
+
+        return (symbols, dict(f.parameters or {}), float(f.time_multiplier), formula,
+                [(self.species_index[s], d) for s, d in derivatives.items()])
+
+    def _symbolic_formula(self, j):
+        if j not in self._symbolic_formulae:
+            self._symbolic_formulae[j] = self._compile_custom_formula(j)
+        return self._symbolic_formulae[j]
+
+    @staticmethod
+    def _namespace(symbolic, state):
+        # Same precedence as helper.evaluate_ast: symbols, then species, then parameters
+        symbols, parameters = symbolic[0], symbolic[1]
+        namespace = dict(symbols)
+        namespace.update(state)
+        namespace.update(parameters)
+        return namespace
+
+    def _custom_rate(self, j, state):
+        """
+        Return the rate of a reaction without a vectorised kernel, from its compiled
+        formula when it has one
+        :param int j: index of the reaction
+        :param Dict[str, float] state: network state
+        """
+
+        symbolic = self._symbolic_formula(j)
+        if symbolic is None:
+            return self.reactions[j].rate(state)
+
+        return eval(symbolic[3], self._namespace(symbolic, state)) / symbolic[2]
+
+    def _propensity_jacobian_entries(self, x, step):
+        """
+        Return the nonzero derivatives of the propensities as (reaction, species, value)
+        triplets, where a pair can appear more than once and has to be summed
+        :returns Tuple[np.ndarray, np.ndarray, np.ndarray] of reactions, species and values
+        """
+
+        rows, columns, values = [], [], []
+
+        def add(reactions, species, derivatives):
+            rows.append(reactions)
+            columns.append(species)
+            values.append(derivatives)
+
+        if self._linear_reactions.size:
+            add(self._linear_reactions, self._linear_species, self._linear_rates)
+
+        if self._factor_species.size:
+            factor_values = x[self._factor_species]
+            ratio = (factor_values / self._factor_k) ** self._factor_n
+            d_ratio = self._factor_n / self._factor_k * (factor_values / self._factor_k) ** (self._factor_n - 1)
+
+            if self._hill_reactions.size:
+                h = np.where(self._factor_activation, ratio / (1 + ratio), 1 / (1 + ratio))
+                d_h = np.where(self._factor_activation, 1.0, -1.0) / (1 + ratio) ** 2 * d_ratio
+                h = np.append(h, 1.0)
+                d_h = np.append(d_h, 0.0)
+
+                first, second = self._hill_first, self._hill_second
+                add(self._hill_reactions, self._factor_species[first], self._hill_rates * d_h[first] * h[second])
+                padded = second < len(self._factor_species)
+                add(self._hill_reactions[padded], self._factor_species[second[padded]],
+                    (self._hill_rates * h[first] * d_h[second])[padded])
+
+            if self._or_reactions.size:
+                one = ratio[self._or_first]
+                two = ratio[self._or_second]
+                numerator = self._or_first_act * one + self._or_second_act * two + self._or_offset
+                denominator = 1 + one + two
+
+                for factors, act in ((self._or_first, self._or_first_act), (self._or_second, self._or_second_act)):
+                    d_a = self._or_rates * (act * denominator - numerator) / denominator ** 2
+                    add(self._or_reactions, self._factor_species[factors], d_a * d_ratio[factors])
+
+        if self.other_reactions:
+            state = self.state_dict(x)
+
+        for j in self.other_reactions:
+            symbolic = self._symbolic_formula(j)
+
+            if symbolic is not None:
+                namespace = self._namespace(symbolic, state)
+                for i, d in symbolic[4]:
+                    add([j], [i], [eval(d, namespace) / symbolic[2]])
+                continue
+
+            reaction = self.reactions[j]
+            for i in self.reads[j]:
+                h = step * max(abs(x[i]), 1.0)
+                up, down = x.copy(), x.copy()
+                up[i] += h
+                down[i] -= h
+                add([j], [i], [(reaction.rate(self.state_dict(up)) - reaction.rate(self.state_dict(down))) / (2 * h)])
+
+        if not rows:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp), np.zeros(0)
+
+        return (np.concatenate(rows).astype(np.intp), np.concatenate(columns).astype(np.intp),
+                np.concatenate(values).astype(float))
+
+    def propensity_jacobian(self, x, step=1e-6, sparse_output=False):
+        """
+        Return the derivatives of the propensity of every reaction with respect to every
+        species in the given state. Degradation, translation and Hill terms of
+        transcription are differentiated analytically, custom formulae symbolically from
+        their AST and other formulae by central differences with a step relative to the
+        species value.
+        :param np.ndarray x: state vector
+        :param float step: relative step of the central differences
+        :param bool sparse_output: return a sparse matrix rather than a dense array
+        :returns np.ndarray or scipy.sparse.csr_matrix of (reactions x species) derivatives
+        """
+
+        x = np.asarray(x, dtype=float)
+        rows, columns, values = self._propensity_jacobian_entries(x, step)
+        shape = (self.reaction_count, self.species_count)
+
+        if sparse_output:
+            # Converting to CSR sums the derivatives of a pair which appears twice
+            return sparse.csr_matrix((values, (rows, columns)), shape=shape)
+
+        jacobian = np.zeros(shape)
+        np.add.at(jacobian, (rows, columns), values)
+        return jacobian
+
+    def jacobian(self, x, sparse_output=False):
+        """
+        Return the Jacobian of the deterministic rate equations dx/dt = S a(x), which is
+        the stoichiometry times the propensity Jacobian
+        :param np.ndarray x: state vector
+        :param bool sparse_output: return a sparse matrix rather than a dense array
+        :returns np.ndarray or scipy.sparse.csr_matrix of (species x species) derivatives
+        """
+
+        if sparse_output:
+            return (self.stoichiometry @ self.propensity_jacobian(x, sparse_output=True)).tocsr()
+        return self.stoichiometry @ self.propensity_jacobian(x)
+
+    def jacobian_sparsity(self):
+        """
+        Return which entries of the Jacobian of the rate equations can be nonzero: those
+        of a species changed by a reaction which reads the other species
+        :returns scipy.sparse.csr_matrix of the (species x species) pattern
+        """
+
+        rows = [j for j, species in enumerate(self.reads) for _ in species]
+        columns = [i for species in self.reads for i in species]
+        reads = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)),
+                                  shape=(self.reaction_count, self.species_count))
+
+        pattern = (abs(self.stoichiometry) @ reads).tocsr()
+        pattern.data[:] = 1
+        return pattern
@@ -0,0 +1,165 @@
+from math import frexp, ldexp
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import EventRecorder
+
+
+class PropensityGroups:
+    """
+    Reactions grouped by the power of two their propensity falls into: group g holds
+    the reactions with propensities in [2^(g-1), 2^g). Moving a reaction between
+    groups is O(1), and the number of groups only depends on the range of
+    propensities, not on the number of reactions.
+    :param List[float] propensities: initial propensity of each reaction
+    """
+
+    def __init__(self, propensities):
+        self.propensities = [0.0] * len(propensities)
+        self.members = dict()  # of Dict[int, List[int]]: group -> reactions in the group
+        self.sums = dict()  # of Dict[int, float]: group -> total propensity of the group
+        self.group_of = [None] * len(propensities)
+        self.slot_of = [0] * len(propensities)
+
+        for j, a in enumerate(propensities):
+            self.update(j, a)
+
+    def total(self):
+        return sum(self.sums.values())
+
+    def update(self, j, a):
+        """
+        Change the propensity of a reaction, moving it to another group if necessary
+        :param int j: reaction index
+        :param float a: new propensity
+        """
+
+        old_group = self.group_of[j]
+        new_group = frexp(a)[1] if a > 0 else None
+
+        if old_group == new_group:
+            if new_group is not None:
+                self.sums[new_group] += a - self.propensities[j]
+            self.propensities[j] = a
+            return
+
+        if old_group is not None:
+            self._remove(j, old_group)
+
+        self.propensities[j] = a
+        self.group_of[j] = new_group
+
+        if new_group is not None:
+            members = self.members.setdefault(new_group, [])
+            self.slot_of[j] = len(members)
+            members.append(j)
+            self.sums[new_group] = self.sums.get(new_group, 0.0) + a
+
+    def _remove(self, j, group):
+        members = self.members[group]
+
+        # Swap with the last member so removal is O(1)
+        slot = self.slot_of[j]
+        moved = members.pop()
+        if moved != j:
+            members[slot] = moved
+            self.slot_of[moved] = slot
+
+        if members:
+            self.sums[group] -= self.propensities[j]
+        else:
+            del self.members[group]
+            del self.sums[group]
+
+    def pick(self, a0, rng):
+        """
+        Pick a reaction with probability proportional to its propensity: first a group
+        by linear search over the group sums (composition), then a member of the group
+        uniformly, accepted with probability a_j / 2^g (rejection)
+        :param float a0: total propensity
+        :param RandomStream rng: source of random numbers
+        :returns int of picked reaction index
+        """
+
+        uniform = rng.uniform
+        r = uniform() * a0
+        group = None
+        for group, s in self.sums.items():
+            if r < s:
+                break
+            r -= s
+
+        members = self.members[group]
+        bound = ldexp(1.0, group)
+        n = len(members)
+
+        while True:
+            j = members[int(uniform() * n)]
+            if uniform() * bound < self.propensities[j]:
+                return j
+
+
+class CompositionRejectionSimulator:
+    """
+    Composition-rejection variant of the direct method for very large reaction sets.
+    Reactions are kept in propensity groups by power of two, so picking a reaction
+    takes constant time on average, and after each event only the reactions in the
+    dependency graph of the fired reaction are moved between groups.
+
+    Source: Slepoy, A., Thompson, A. P. & Plimpton, S. J. (2008) A constant-time kinetic
+        Monte Carlo algorithm for simulation of large biochemical reaction networks.
+        J. Chem. Phys. 128, 205101
+    """
+
+    """
+    Performs a composition-rejection simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every event by default
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    @staticmethod
+    def simulate(net, sim, rng=None, recorder=None):
+        rng = RandomStream.of(rng)
+        recorder = recorder or EventRecorder()
+        compiled = CompiledNetwork(net)
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+
+        x = compiled.initial_state().tolist()
+        t = sim.start_time
+        groups = PropensityGroups([max(f(x), 0.0) for f in functions])
+
+        recorder.start(compiled.species_names, sim, t, x, changes)
+        advance, record = recorder.advance, recorder.record
+
+        while True:
+            a0 = groups.total()
+            if a0 <= 0:
+                break
+
+            t = t + rng.exponential(a0)
+            if t > sim.end_time:
+                break
+
+            advance(t, x)
+            j = groups.pick(a0, rng)
+
+            for i, change in changes[j]:
+                x[i] += change
+            for k in dependents[j]:
+                groups.update(k, max(functions[k](x), 0.0))
+
+            record(t, x, j)
+
+        return recorder.finish(sim.end_time, x)
+
+    @staticmethod
+    def visualise(results, sim):
+        GillespieSimulator.visualise(results, sim)
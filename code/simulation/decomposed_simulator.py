@@ -0,0 +1,136 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from models.network import Network
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.compiled_network import CompiledNetwork
+from simulation.ode_simulator import OdeSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import GridRecorder
+from structured_results import StructuredResults
+
+
+def _simulate_ode(net, sim):
+    return OdeSimulator.simulate(net, sim)
+
+
+def _simulate_ssa(simulator, net, sim, seed_sequence):
+    # GillespieSimulator modifies the network it simulates
+    return simulator.simulate(copy.deepcopy(net), sim, RandomStream(seed_sequence), GridRecorder()).values
+
+
+class DecomposedSimulator:
+    """
+    Splits a network into its independent modules and simulates them separately, in
+    parallel, merging the results. Two species are in the same module when a reaction
+    changes or reads both of them, either as a reactant, product, regulator or a name
+    in a custom rate formula, so the modules are the connected components of the
+    species-reaction-regulation graph. Simulating modules separately is exact, and for
+    stochastic simulation it also keeps every module's propensity sums small.
+    :param int processes: number of worker processes, None for one per core,
+        1 to run in this process
+    :param int seed: seed of stochastic simulations, None for a random one
+    """
+
+    def __init__(self, processes=None, seed=None):
+        self.processes = processes
+        self.seed = seed
+
+    @staticmethod
+    def components(net):
+        """
+        Return the independent modules of a network, each with the species, in the
+        same order, and the reactions of one connected component. Reactions which
+        neither change nor read any species are dropped.
+        :param Network net: network to split
+        :returns List[Network] of modules
+        """
+
+        compiled = CompiledNetwork(net)
+        rows, cols = [], []
+
+        for j in range(compiled.reaction_count):
+            species = sorted({i for i, _ in compiled.changes[j]} | set(compiled.reads[j]))
+            # Joining every species of a reaction to the first one is enough for connectivity
+            rows += [species[0]] * len(species) if species else []
+            cols += species
+
+        graph = sparse.coo_matrix((np.ones(len(rows)), (rows, cols)),
+                                  shape=(compiled.species_count, compiled.species_count))
+        count, labels = connected_components(graph, directed=False)
+
+        modules = [Network() for _ in range(count)]
+        for module in modules:
+            module.symbols = net.symbols
+
+        for s, label in zip(compiled.species_names, labels):
+            modules[label].species[s] = net.species[s]
+
+        for j, r in enumerate(compiled.reactions):
+            species = [i for i, _ in compiled.changes[j]] + compiled.reads[j]
+            if species:
+                modules[labels[species[0]]].reactions.append(r)
+
+        return modules
+
+    def _map(self, function, *arguments):
+        """
+        Return the results of the function applied to every tuple of the given arguments,
+        in order, computed in parallel unless processes is 1
+        """
+
+        if self.processes == 1:
+            return [function(*a) for a in zip(*arguments)]
+
+        with ProcessPoolExecutor(max_workers=self.processes or os.cpu_count() or 1) as pool:
+            return list(pool.map(function, *arguments))
+
+    @staticmethod
+    def _merge(net, modules, results, time_space):
+        """
+        Return the results of the modules as the results of the whole network
+        """
+
+        merged = np.empty((len(time_space), len(net.species)))
+        index = {s: i for i, s in enumerate(net.species)}
+
+        for module, values in zip(modules, results):
+            merged[:, [index[s] for s in module.species]] = values
+
+        return StructuredResults(merged, list(net.species.keys()), time_space)
+
+    """
+    Solve the ODEs of every module of the network
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :returns StructuredResults of the whole network
+    """
+
+    def ode(self, net, sim):
+        modules = self.components(net)
+        results = self._map(_simulate_ode, modules, [sim] * len(modules))
+        return self._merge(net, modules, results, sim.generate_time_space())
+
+    """
+    Simulate one stochastic trajectory of every module of the network, sampled on the
+    time space of the simulation settings
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any simulator: simulator class with a simulate(net, sim, rng, recorder) method
+    :returns StructuredResults of the whole network
+    """
+
+    def ssa(self, net, sim, simulator=CompiledGillespieSimulator):
+        time_space = sim.generate_time_space()
+        if len(time_space) == 0:
+            raise ValueError("Decomposed simulation needs a time grid, set the precision of the simulation settings")
+
+        modules = self.components(net)
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(len(modules))
+        results = self._map(_simulate_ssa, [simulator] * len(modules), modules, [sim] * len(modules), seed_sequences)
+        return self._merge(net, modules, results, time_space)
@@ -0,0 +1,202 @@
+import copy
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.compiled_network import CompiledNetwork
+from simulation.random_stream import RandomStream
+from simulation.streaming_statistics import RunningMoments, StreamingQuantiles
+from simulation.trajectory_recorder import GridRecorder
+from structured_results import StructuredResults
+
+
+# Simulator, network and settings of the trajectories of this worker process
+_worker = dict()
+
+
+def _prepare(simulator, net):
+    """
+    Return the network to hand to the simulator for every trajectory: compiled once
+    when the simulator takes a CompiledNetwork, otherwise the network itself
+    """
+
+    if getattr(simulator, "TAKES_COMPILED_NETWORK", False):
+        return CompiledNetwork(net)
+    return net
+
+
+def _start_worker(simulator, net, sim):
+    """
+    Set up a worker process once, before it runs any chunk
+    """
+
+    _worker.update(simulator=simulator, net=_prepare(simulator, net), sim=sim)
+
+
+def _run_worker_chunk(seed_sequences):
+    """
+    Run a chunk in a worker set up by _start_worker. Module level, so that it can be
+    sent to worker processes.
+    """
+
+    return _run_chunk(_worker["simulator"], _worker["net"], _worker["sim"], seed_sequences)
+
+
+def _run_chunk(simulator, net, sim, seed_sequences):
+    """
+    Run one trajectory per given seed, each recorded only on the time grid.
+    :param Any simulator: simulator class
+    :param Any net: Network, or CompiledNetwork when the simulator takes one
+    :returns np.ndarray of (trajectories x time x species) values
+    """
+
+    time_space = sim.generate_time_space()
+    compiled = isinstance(net, CompiledNetwork)
+    species_names = net.species_names if compiled else list(net.species.keys())
+    chunk = np.empty((len(seed_sequences), len(time_space), len(species_names)))
+
+    for n, seed_sequence in enumerate(seed_sequences):
+        # GillespieSimulator modifies the network it simulates, a CompiledNetwork is left as it is
+        model = net if compiled else copy.deepcopy(net)
+        trajectory = simulator.simulate(model, sim, RandomStream(seed_sequence), GridRecorder())
+        chunk[n] = trajectory.values
+
+    return chunk
+
+
+class EnsembleResults:
+    """
+    Aggregates of an ensemble of stochastic trajectories on a shared time grid
+    :param List[str] species_names: species in the order of the last axis of all arrays
+    :param np.ndarray time_space: time grid of the results
+    :param List[float] quantiles: quantiles to estimate
+    :param bool keep_trajectories: whether to keep every trajectory, or only the aggregates
+    """
+
+    def __init__(self, species_names, time_space, quantiles, keep_trajectories):
+        shape = (len(time_space), len(species_names))
+
+        self.species_names = species_names
+        self.time_space = time_space
+        self.moments = RunningMoments(shape)
+        self.quantiles = {p: StreamingQuantiles(p, shape) for p in quantiles}
+        self._chunks = [] if keep_trajectories else None
+
+    def add(self, chunk):
+        """
+        Add a (trajectories x time x species) chunk of trajectories to the aggregates
+        :param np.ndarray chunk: trajectories sampled on the time grid
+        """
+
+        self.moments.add_all(chunk)
+        for q in self.quantiles.values():
+            q.add_all(chunk)
+
+        if self._chunks is not None:
+            self._chunks.append(chunk)
+
+    @property
+    def count(self):
+        return self.moments.count
+
+    @property
+    def mean(self):
+        return self.moments.mean
+
+    @property
+    def variance(self):
+        return self.moments.variance
+
+    def quantile(self, p):
+        return self.quantiles[p].value
+
+    @property
+    def trajectories(self):
+        """
+        Return every trajectory
+        :returns np.ndarray of (trajectories x time x species) values, None if not kept
+        """
+
+        if self._chunks is None:
+            return None
+        if not self._chunks:
+            return np.empty((0, len(self.time_space), len(self.species_names)))
+        return np.concatenate(self._chunks)
+
+    def structured_mean(self):
+        """
+        Return the ensemble mean in the format of deterministic results
+        :returns StructuredResults of the mean of each species
+        """
+
+        return StructuredResults(self.mean, self.species_names, self.time_space)
+
+
+class EnsembleRunner:
+    """
+    Runs many independent stochastic trajectories of a network across a pool of
+    processes. Every trajectory draws from its own random stream, spawned from one
+    seed, and is recorded only on the time grid of the simulation settings.
+    The aggregates are updated as chunks of trajectories come back.
+    :param Any simulator: simulator class with a simulate(net, sim, rng, recorder) method,
+        given the network compiled once per process when its TAKES_COMPILED_NETWORK is set
+    :param int processes: number of worker processes, None for one per core,
+        1 to run in this process
+    :param int seed: seed of the ensemble, None for a random one
+    :param List[float] quantiles: quantiles to estimate for each species and time
+    :param bool keep_trajectories: whether to keep every trajectory in the results
+    :param int chunk_size: trajectories per task sent to a worker, None to pick one
+    """
+
+    def __init__(self, simulator=CompiledGillespieSimulator, processes=None, seed=None,
+                 quantiles=(0.05, 0.5, 0.95), keep_trajectories=True, chunk_size=None):
+        self.simulator = simulator
+        self.processes = processes
+        self.seed = seed
+        self.quantiles = list(quantiles)
+        self.keep_trajectories = keep_trajectories
+        self.chunk_size = chunk_size
+
+    def _chunks(self, seed_sequences, workers):
+        # A few chunks per worker keeps the workers busy until the end without
+        # paying the cost of sending every trajectory separately
+        size = self.chunk_size or max(1, len(seed_sequences) // (4 * workers))
+        return [seed_sequences[i:i + size] for i in range(0, len(seed_sequences), size)]
+
+    """
+    Run the given number of trajectories of the network
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation, its time space is the shared time grid
+    :param int trajectories: number of trajectories
+    :returns EnsembleResults of the ensemble
+    """
+
+    def run(self, net, sim, trajectories):
+        time_space = sim.generate_time_space()
+        if len(time_space) == 0:
+            raise ValueError("Ensembles need a time grid, set the precision of the simulation settings")
+
+        results = EnsembleResults(list(net.species.keys()), time_space,
+                                  self.quantiles, self.keep_trajectories)
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(trajectories)
+
+        if self.processes == 1:
+            model = _prepare(self.simulator, net)
+            for chunk in self._chunks(seed_sequences, 1):
+                results.add(_run_chunk(self.simulator, model, sim, chunk))
+            return results
+
+        workers = self.processes or os.cpu_count() or 1
+
+        # Each worker receives the network and compiles it once, the tasks only carry seeds
+        with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker,
+                                 initargs=(self.simulator, net, sim)) as pool:
+            futures = [pool.submit(_run_worker_chunk, chunk) for chunk in self._chunks(seed_sequences, workers)]
+
+            # Aggregate in submission order, so that a seed always gives the same results
+            for future in futures:
+                results.add(future.result())
+
+        return results
@@ -0,0 +1,231 @@
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.trajectory_recorder import EventRecorder, SampledTrajectory
+
+EVENT_DTYPE = np.dtype([("time", "<f8"), ("reaction", "<i4")])
+
+HEADER_FILE = "header.json"
+CHUNK_FILE = "events-{:06d}.bin"
+
+
+class EventLogRecorder(EventRecorder):
+    """
+    Records a trajectory as an event log: the initial state, then only the time and
+    index of each fired reaction, 12 bytes per event. Events are written to disk in
+    chunk files of a fixed number of events, so memory is bounded by the chunk size.
+
+    The log is a directory holding a JSON header, which pins the species order, the
+    initial state and the changes of every reaction in order, and the binary chunk
+    files of (float64 time, int32 reaction index) records. Only simulators which fire
+    one reaction per event can be logged, so tau-leaping cannot.
+
+    The directory has to be empty or missing, unless overwrite is set, in which case
+    the header and chunk files of an existing log in it are deleted when the
+    simulation starts. Other files are never touched.
+    :param str path: directory of the log, created if it does not exist
+    :param int chunk_events: number of events in each chunk file
+    :param bool overwrite: replace an existing log in the directory
+    """
+
+    def __init__(self, path, chunk_events=65536, overwrite=False):
+        self.path = path
+        self.chunk_events = chunk_events
+        self.overwrite = overwrite
+
+    @staticmethod
+    def _is_log_file(name):
+        return name == HEADER_FILE or (name.startswith("events-") and name.endswith(".bin"))
+
+    def start(self, species_names, sim, t, x, changes=None):
+        if changes is None:
+            raise ValueError("Event logs need the changes of every reaction of the simulated network")
+
+        os.makedirs(self.path, exist_ok=True)
+        existing = os.listdir(self.path)
+        if existing and not (self.overwrite and all(self._is_log_file(name) for name in existing)):
+            raise ValueError("The event log directory " + self.path + " is not empty" +
+                             ("" if self.overwrite else ", set overwrite to replace a log in it"))
+
+        for name in existing:
+            os.remove(os.path.join(self.path, name))
+
+        self.species_names = species_names
+        self.changes = changes
+        rows = [i for c in changes for i, _ in c]
+        columns = [j for j, c in enumerate(changes) for _ in c]
+        values = [change for c in changes for _, change in c]
+        self._stoichiometry = sparse.csc_matrix((values, (rows, columns)), dtype=np.int64,
+                                                shape=(len(species_names), len(changes)))
+
+        self.header = {
+            "species": list(species_names),
+            "changes": [[[int(i), int(change)] for i, change in c] for c in changes],
+            "initial_state": [int(v) for v in x],
+            "start_time": float(t),
+            "end_time": None,
+            "event_dtype": EVENT_DTYPE.descr,
+            "chunk_events": self.chunk_events,
+            "chunks": 0,
+            "events": 0,
+        }
+        self._write_header()
+
+        self._buffer = np.empty(self.chunk_events, dtype=EVENT_DTYPE)
+        self._size = 0
+
+    def _write_header(self):
+        with open(os.path.join(self.path, HEADER_FILE), "w") as f:
+            json.dump(self.header, f)
+
+    def _flush(self):
+        if self._size:
+            self._buffer[:self._size].tofile(os.path.join(self.path, CHUNK_FILE.format(self.header["chunks"])))
+            self.header["chunks"] += 1
+            self.header["events"] += self._size
+            self._size = 0
+
+    def record(self, t, x, j=None):
+        if j is None:
+            raise ValueError("Event logs need the index of every fired reaction")
+
+        self._buffer[self._size] = (t, j)
+        self._size += 1
+
+        if self._size == self.chunk_events:
+            self._flush()
+
+    def record_events(self, times, reactions, x):
+        start = 0
+        while start < len(times):
+            take = min(len(times) - start, self.chunk_events - self._size)
+            self._buffer["time"][self._size:self._size + take] = times[start:start + take]
+            self._buffer["reaction"][self._size:self._size + take] = reactions[start:start + take]
+            self._size += take
+            start += take
+
+            if self._size == self.chunk_events:
+                self._flush()
+
+        if len(reactions):
+            fired = self._stoichiometry @ np.bincount(reactions, minlength=len(self.changes))
+            for i, change in enumerate(fired.tolist()):
+                x[i] += change
+
+    def finish(self, t, x):
+        """
+        :returns EventLog of the recorded events
+        """
+
+        self._flush()
+        self.header["end_time"] = float(t)
+        self._write_header()
+        return EventLog(self.path)
+
+
+class EventLog:
+    """
+    An event log written by EventLogRecorder. States are reconstructed from the
+    initial state by adding up the stoichiometry columns of the fired reactions, one
+    chunk at a time, so logs much larger than memory can be replayed.
+    :param str path: directory of the log
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, HEADER_FILE)) as f:
+            self.header = json.load(f)
+
+        self.species_names = self.header["species"]
+        self.initial_state = np.array(self.header["initial_state"], dtype=np.int64)
+        self.start_time = self.header["start_time"]
+        self.end_time = self.header["end_time"]
+
+        changes = self.header["changes"]
+        rows = [i for c in changes for i, _ in c]
+        columns = [j for j, c in enumerate(changes) for _ in c]
+        values = [change for c in changes for _, change in c]
+        self.stoichiometry = sparse.csc_matrix((values, (rows, columns)),
+                                               shape=(len(self.species_names), len(changes)), dtype=np.int64)
+
+    def __len__(self):
+        return self.header["events"]
+
+    @property
+    def reaction_count(self):
+        return self.stoichiometry.shape[1]
+
+    def check(self, net):
+        """
+        Raise a ValueError unless the log was recorded from a network with the same
+        species and reactions in the same order as the given one
+        :param Network net: network to compare with
+        """
+
+        compiled = CompiledNetwork(net)
+        if compiled.species_names != self.species_names:
+            raise ValueError("The species of the network do not match the event log")
+        if [[list(change) for change in c] for c in compiled.changes] != self.header["changes"]:
+            raise ValueError("The reactions of the network do not match the event log")
+
+    def chunks(self):
+        """
+        Iterate over the chunks of the log, each loaded as it is reached
+        :returns Iterator[np.ndarray] of arrays of (time, reaction) records
+        """
+
+        for n in range(self.header["chunks"]):
+            yield np.fromfile(os.path.join(self.path, CHUNK_FILE.format(n)), dtype=EVENT_DTYPE)
+
+    def _apply(self, x, reactions):
+        """
+        Add the changes of the given fired reactions to the state vector x
+        """
+
+        if len(reactions):
+            x += self.stoichiometry @ np.bincount(reactions, minlength=self.reaction_count)
+
+    def resample(self, time_space):
+        """
+        Reconstruct the state at each point of a time grid, taking the state after the
+        last event at or before the point (sample-and-hold)
+        :param np.ndarray time_space: increasing time grid
+        :returns SampledTrajectory of the states on the grid
+        """
+
+        time_space = np.asarray(time_space, dtype=float)
+        values = np.empty((len(time_space), len(self.species_names)))
+        x = self.initial_state.copy()
+        n = 0
+
+        for chunk in self.chunks():
+            times, reactions = chunk["time"], chunk["reaction"]
+            start = 0
+
+            # Grid points before the end of the chunk are final once its events up to them are applied
+            for end in np.searchsorted(times, time_space[n:], side="right"):
+                if end == len(times):
+                    break
+                self._apply(x, reactions[start:end])
+                start = end
+                values[n] = x
+                n += 1
+
+            self._apply(x, reactions[start:])
+
+        values[n:] = x
+        return SampledTrajectory(time_space, values, self.species_names)
+
+    def state_at(self, t):
+        """
+        Reconstruct the state after the last event at or before the given time
+        :param float t: time
+        :returns Dict[str, int] of network state
+        """
+
+        values = self.resample([t]).values[0]
+        return dict(zip(self.species_names, values.astype(np.int64).tolist()))
@@ -0,0 +1,229 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import expm_multiply
+
+from simulation.compiled_network import CompiledNetwork
+
+
+class FspResults:
+    """
+    Probability distribution of the states of a network over time, on the projection
+    the finite state projection ended with
+    :param List[str] species_names: species in the order of the columns of states
+    :param np.ndarray time_space: time of each distribution
+    :param np.ndarray bounds: largest count of each species in the projection
+    :param np.ndarray probabilities: (time x states) probability of every state
+    :param np.ndarray errors: bound on the probability lost out of the projection, at each time
+    """
+
+    def __init__(self, species_names, time_space, bounds, probabilities, errors):
+        self.species_names = species_names
+        self.time_space = time_space
+        self.bounds = bounds
+        self.probabilities = probabilities
+        self.errors = errors
+        self.states = FiniteStateProjection.enumerate_states(bounds)
+
+    @property
+    def error(self):
+        """
+        Return the truncation error at the end of the simulation: the true distribution
+        is at most this far from the computed one in L1 norm
+        """
+
+        return self.errors[-1]
+
+    def marginal(self, species):
+        """
+        Return the distribution of the count of one species
+        :param str species: species name
+        :returns np.ndarray of (time x count) probabilities, counts from 0 to the bound
+        """
+
+        i = self.species_names.index(species)
+        marginal = np.zeros((len(self.time_space), self.bounds[i] + 1))
+        for t, p in enumerate(self.probabilities):
+            marginal[t] = np.bincount(self.states[:, i], weights=p, minlength=self.bounds[i] + 1)
+
+        return marginal
+
+    @property
+    def mean(self):
+        """
+        Return the mean of each species, conditional on the state being in the projection
+        :returns np.ndarray of (time x species) means
+        """
+
+        return (self.probabilities @ self.states) / self.probabilities.sum(axis=1)[:, np.newaxis]
+
+    @property
+    def variance(self):
+        second = (self.probabilities @ self.states ** 2) / self.probabilities.sum(axis=1)[:, np.newaxis]
+        return second - self.mean ** 2
+
+
+class FiniteStateProjection:
+    """
+    Solves the chemical master equation of a small network on a finite projection of
+    its state space: every species count is bounded, and probability flowing out of
+    the projection is collected in sink states. The generator of the projected master
+    equation is a sparse matrix, and the distribution is propagated with the Krylov
+    method of scipy's expm_multiply.
+
+    The mass in the sinks bounds the error of the distribution. Whenever it exceeds
+    the tolerance, the bounds of the species through which probability left are grown
+    and the step is repeated from the last accepted distribution.
+
+    Source: Munsky, B. & Khammash, M. (2006) The finite state projection algorithm for
+        the solution of the chemical master equation. J. Chem. Phys. 124, 044104
+
+    :param float tolerance: largest acceptable truncation error
+    :param Dict[str, int] bounds: initial largest count of each species, None to start from twice the initial state
+    :param float growth: factor by which bounds grow when the error is too large
+    :param int max_states: largest number of states in the projection
+    """
+
+    def __init__(self, tolerance=1e-4, bounds=None, growth=1.5, max_states=10 ** 6):
+        self.tolerance = tolerance
+        self.bounds = bounds
+        self.growth = growth
+        self.max_states = max_states
+
+    @staticmethod
+    def enumerate_states(bounds):
+        """
+        Return every state with counts between 0 and the bounds, in the order of their index
+        :param np.ndarray bounds: largest count of each species
+        :returns np.ndarray of (states x species) counts
+        """
+
+        return np.array(np.unravel_index(np.arange(np.prod(bounds + 1)), bounds + 1)).T
+
+    @staticmethod
+    def _generator(compiled, bounds):
+        """
+        Return the generator of the projected master equation. Columns are source states
+        and rows target states; after the projected states come one sink per species,
+        which collects the probability leaving the projection through the species'
+        bound, and one sink for transitions to negative counts.
+        :returns scipy.sparse.csc_matrix of the generator
+        """
+
+        states = FiniteStateProjection.enumerate_states(bounds)
+        n = len(states)
+        a = np.maximum(compiled.propensities(states), 0.0)
+        changes = compiled.stoichiometry.T.toarray()
+
+        rows, cols, data = [], [], []
+        source = np.arange(n)
+
+        for j in range(compiled.reaction_count):
+            moving = a[:, j] > 0
+            if not moving.any():
+                continue
+
+            targets = states[moving] + changes[j]
+            over = targets > bounds
+            under = (targets < 0).any(axis=1)
+            inside = ~over.any(axis=1) & ~under
+
+            target = np.empty(len(targets), dtype=np.intp)
+            target[inside] = np.ravel_multi_index(targets[inside].T, bounds + 1)
+            target[~inside] = n + np.argmax(over[~inside], axis=1)
+            target[under] = n + compiled.species_count
+
+            rows.append(target)
+            cols.append(source[moving])
+            data.append(a[moving, j])
+
+        rows.append(source)
+        cols.append(source)
+        data.append(-a.sum(axis=1))
+
+        size = n + compiled.species_count + 1
+        return sparse.csc_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                                 shape=(size, size))
+
+    @staticmethod
+    def _embed(p, old_bounds, new_bounds):
+        """
+        Return a distribution over the states of old_bounds as one over the states of new_bounds
+        """
+
+        embedded = np.zeros(np.prod(new_bounds + 1))
+        states = FiniteStateProjection.enumerate_states(old_bounds)
+        embedded[np.ravel_multi_index(states.T, new_bounds + 1)] = p
+        return embedded
+
+    """
+    Compute the distribution of the states of the given network at every point of the
+    time space of the simulation settings, starting from its initial state
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation, with an increasing time space of at
+        least two points
+    :returns FspResults of the distributions and their truncation errors
+    """
+
+    def run(self, net, sim):
+        time_space = sim.generate_time_space()
+        if len(time_space) < 2:
+            raise ValueError("The time space needs at least two points, not " + str(len(time_space)))
+        if np.any(np.diff(time_space) <= 0):
+            raise ValueError("The time space has to be increasing, from " + str(sim.start_time) + " to " +
+                             str(sim.end_time))
+
+        compiled = CompiledNetwork(net)
+        x0 = compiled.initial_state()
+
+        if self.bounds is None:
+            bounds = np.maximum(2 * x0, 10)
+        else:
+            bounds = np.array([self.bounds[s] for s in compiled.species_names], dtype=np.int64)
+        bounds = np.maximum(bounds, x0)
+
+        generator = self._generator(compiled, bounds)
+        p = np.zeros(generator.shape[0])
+        p[np.ravel_multi_index(x0, bounds + 1)] = 1.0
+
+        distributions = [(bounds, p[:np.prod(bounds + 1)])]
+        errors = [0.0]
+        lost = 0.0  # probability lost before the last accepted distribution
+        t = time_space[0]
+
+        for t_next in time_space[1:]:
+            while True:
+                q = expm_multiply(generator * (t_next - t), p)
+                sinks = np.maximum(q[-compiled.species_count - 1:], 0.0)
+                if lost + sinks.sum() <= self.tolerance:
+                    break
+
+                # Grow the bounds most of the probability left through, or all if it went negative
+                if sinks[:-1].any():
+                    grow = sinks[:-1] >= 0.1 * sinks[:-1].max()
+                else:
+                    grow = np.ones(compiled.species_count, dtype=bool)
+                new_bounds = np.where(grow, np.ceil(bounds * self.growth).astype(np.int64) + 1, bounds)
+                if np.prod(new_bounds + 1) > self.max_states:
+                    # Accept the step, the error report shows how much was lost
+                    break
+
+                projected = self._embed(p[:np.prod(bounds + 1)], bounds, new_bounds)
+                bounds = new_bounds
+                generator = self._generator(compiled, bounds)
+                p = np.zeros(generator.shape[0])
+                p[:len(projected)] = projected
+
+            lost += sinks.sum()
+            p = q
+            p[-compiled.species_count - 1:] = 0.0
+            t = t_next
+
+            distributions.append((bounds, p[:np.prod(bounds + 1)].copy()))
+            errors.append(lost)
+
+        probabilities = np.array([self._embed(d, b, bounds) for b, d in distributions])
+        return FspResults(compiled.species_names, time_space, bounds, probabilities, np.array(errors))
+
+    @staticmethod
+    def simulate(net, sim):
+        return FiniteStateProjection().run(net, sim)
@@ -0,0 +1,183 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from math import inf
+
+import numpy as np
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.random_stream import RandomStream
+
+
+def _first_passage_time(compiled, sim, thresholds, predicate, rng):
+    """
+    Simulate one trajectory with the direct method until the condition holds
+    :param CompiledNetwork compiled: network to simulate
+    :param SimulationSettings sim: for simulation
+    :param Dict[int, float] thresholds: key: species index, value: count the species has to reach
+    :param Callable[[Dict[str, float]], bool] predicate: condition on the network state, or None
+    :param RandomStream rng: source of random numbers
+    :returns float of the first passage time, inf if the condition did not hold before the end time
+    """
+
+    names = compiled.species_names
+    changes = compiled.changes
+    dependents = compiled.dependents
+    functions = compiled.propensity_functions
+
+    x = compiled.initial_state().tolist()
+    a = [max(f(x), 0.0) for f in functions]
+    t = sim.start_time
+
+    if any(x[i] >= v for i, v in thresholds.items()) or (predicate and predicate(dict(zip(names, x)))):
+        return t
+
+    while True:
+        cumulative = list(accumulate(a))
+        a0 = cumulative[-1] if cumulative else 0
+        if a0 <= 0:
+            return inf
+
+        t = t + rng.exponential(a0)
+        if t > sim.end_time:
+            return inf
+
+        j = rng.pick(cumulative, a0)
+        for i, change in changes[j]:
+            x[i] += change
+            if i in thresholds and x[i] >= thresholds[i]:
+                return t
+        for k in dependents[j]:
+            a[k] = max(functions[k](x), 0.0)
+
+        if predicate and predicate(dict(zip(names, x))):
+            return t
+
+
+def _run_chunk(net, sim, thresholds, predicate, seed_sequences):
+    """
+    Run one trajectory per given seed until its first passage. Module level, so that
+    it can be sent to worker processes.
+    :returns np.ndarray of first passage times
+    """
+
+    compiled = CompiledNetwork(net)
+    thresholds = {compiled.species_index[s]: v for s, v in thresholds.items()}
+
+    return np.array([_first_passage_time(compiled, sim, thresholds, predicate, RandomStream(seed_sequence))
+                     for seed_sequence in seed_sequences])
+
+
+class FirstPassageResults:
+    """
+    First passage times of an ensemble of trajectories. Trajectories which did not pass
+    before the end time are censored and have an infinite time.
+    :param np.ndarray times: first passage time of each trajectory
+    """
+
+    def __init__(self, times):
+        self.times = times
+
+    @property
+    def passed(self):
+        return np.isfinite(self.times)
+
+    @property
+    def fraction_passed(self):
+        return self.passed.mean() if len(self.times) else 0.0
+
+    def passage_times(self):
+        """
+        Return the sorted first passage times of the trajectories which passed
+        :returns np.ndarray of times
+        """
+
+        return np.sort(self.times[self.passed])
+
+    def cdf(self, time_space):
+        """
+        Return the empirical distribution function of the first passage time: the
+        fraction of all trajectories which passed by each time
+        :param np.ndarray time_space: times to evaluate the distribution at
+        :returns np.ndarray of fractions
+        """
+
+        return np.searchsorted(self.passage_times(), time_space, side="right") / max(len(self.times), 1)
+
+    def quantile(self, p):
+        """
+        Return the p-quantile of the first passage time, inf if fewer than a fraction p
+        of the trajectories passed or none did
+        :param float p: probability, between 0 and 1
+        """
+
+        if not 0 <= p <= 1:
+            raise ValueError("The probability of a quantile has to be between 0 and 1, not " + str(p))
+
+        times = self.passage_times()
+        if p > self.fraction_passed or not len(times):
+            return inf
+        return times[min(int(np.ceil(p * len(self.times))) - 1, len(times) - 1)] if p > 0 else times[0]
+
+    def mean(self):
+        """
+        Return the mean first passage time of the trajectories which passed
+        """
+
+        return self.passage_times().mean() if self.passed.any() else inf
+
+
+class FirstPassageRunner:
+    """
+    Runs an ensemble of trajectories across a pool of processes, stopping each one as
+    soon as it reaches a condition, and collects the times it took. The condition holds
+    when any species reaches its threshold, or when the predicate holds. A predicate
+    has to be a module level function to be sent to worker processes.
+    :param Dict[str, float] thresholds: key: species name, value: count the species has to reach
+    :param Callable[[Dict[str, float]], bool] predicate: condition on the network state
+    :param int processes: number of worker processes, None for one per core,
+        1 to run in this process
+    :param int seed: seed of the ensemble, None for a random one
+    :param int chunk_size: trajectories per task sent to a worker, None to pick one
+    """
+
+    def __init__(self, thresholds=None, predicate=None, processes=None, seed=None, chunk_size=None):
+        if not thresholds and predicate is None:
+            raise ValueError("A first passage needs thresholds or a predicate")
+
+        self.thresholds = dict(thresholds or {})
+        self.predicate = predicate
+        self.processes = processes
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    def _chunks(self, seed_sequences, workers):
+        size = self.chunk_size or max(1, len(seed_sequences) // (4 * workers))
+        return [seed_sequences[i:i + size] for i in range(0, len(seed_sequences), size)]
+
+    """
+    Run the given number of trajectories of the network until their first passage
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation, trajectories are censored at its end time
+    :param int trajectories: number of trajectories
+    :returns FirstPassageResults of the ensemble
+    """
+
+    def run(self, net, sim, trajectories):
+        unknown = [s for s in self.thresholds if s not in net.species]
+        if unknown:
+            raise ValueError("Unknown species in thresholds: " + ", ".join(unknown))
+
+        seed_sequences = np.random.SeedSequence(self.seed).spawn(trajectories)
+
+        if self.processes == 1:
+            chunks = [_run_chunk(net, sim, self.thresholds, self.predicate, chunk)
+                      for chunk in self._chunks(seed_sequences, 1)]
+        else:
+            workers = self.processes or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_run_chunk, net, sim, self.thresholds, self.predicate, chunk)
+                           for chunk in self._chunks(seed_sequences, workers)]
+                chunks = [future.result() for future in futures]
+
+        return FirstPassageResults(np.concatenate(chunks) if chunks else np.empty(0))
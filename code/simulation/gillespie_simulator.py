@@ -1,11 +1,12 @@
+from itertools import accumulate
 from math import *
-from random import *
 from typing import List, Tuple, Dict
-import numpy as np
 
 import matplotlib.pyplot as plt
 
 from models.network import Network
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import SampledTrajectory
 
 SimulationResults = List[Tuple[float, Dict[str, float]]]
 
@@ -27,14 +28,15 @@ class GillespieSimulator:
         return r0
 
     @staticmethod
-    def _get_delta_time(r0):
+    def _get_delta_time(r0, rng):
         """
         Calculate the time after which the next random reaction will occur
         :param float r0: sum of all reaction rates
+        :param RandomStream rng: source of random numbers
         :returns float of time for the next random reaction
         """
 
-        s1 = random()  # To pick time
+        s1 = rng.uniform()  # To pick time
         epsilon = 0.001  # To avoid division by zero
         lam = (1 / (r0 + epsilon))
         return lam * pow(e, -lam * s1)
@@ -54,30 +56,31 @@ class GillespieSimulator:
         return ret
 
     @staticmethod
-    def _get_next_state(net, r0):
+    def _get_next_state(net, r0, rng):
         """
         Return the next state of the network after a random reaction has occurred
         :param Network net: network for which to get next state
         :param float r0: total of reaction propensities
+        :param RandomStream rng: source of random numbers
         :returns next network state
         """
 
-        vj = GillespieSimulator._pick_next_reaction(net, r0)
+        vj = GillespieSimulator._pick_next_reaction(net, r0, rng)
         return GillespieSimulator._apply_change_vector(net.species, vj) if vj else net.species
 
     @staticmethod
-    def _pick_weighted_random(items, probabilities):
-        i = np.random.choice(len(items), 1, p=probabilities)
-        return items[i[0]]
+    def _pick_weighted_random(items, probabilities, rng):
+        return items[rng.pick(list(accumulate(probabilities)))]
 
     @staticmethod
-    def _pick_next_reaction(net, r0):
+    def _pick_next_reaction(net, r0, rng):
         """
         returns a Dict[str, float] representing the
         change vector of the reaction chosen randomly,
         which will happen next
         :param Network net: network for which to pick next reaction
         :param float r0: total reaction propensities
+        :param RandomStream rng: source of random numbers
         :returns Dict[str, float] of change vector of picked reaction
         """
 
@@ -89,7 +92,7 @@ class GillespieSimulator:
                 div_result = reaction.rate(net.species) / 1
             propensities.append(div_result)
 
-        random_reaction = GillespieSimulator._pick_weighted_random(net.reactions, propensities)
+        random_reaction = GillespieSimulator._pick_weighted_random(net.reactions, propensities, rng)
         return random_reaction.change_vector(net.species)
 
     """
@@ -98,32 +101,47 @@ class GillespieSimulator:
     a list of results.
     :param Network net: to simulate
     :param SimulationSettings sim: for simulation
-    :returns SimulationResults of the simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, None for every event
+    :returns SimulationResults of the simulation, or the results of the given recorder
     """
 
     @staticmethod
-    def simulate(net, sim):
+    def simulate(net, sim, rng=None, recorder=None):
+        rng = RandomStream.of(rng)
         t = 0
         results = []
 
+        if recorder is not None:
+            recorder.start(list(net.species.keys()), sim, t, list(net.species.values()))
+
         while t <= int(sim.end_time):
             r0 = GillespieSimulator._calculate_r0(net)
 
-            delta_time = GillespieSimulator._get_delta_time(r0)
+            delta_time = GillespieSimulator._get_delta_time(r0, rng)
             # Advance time
             t = t + delta_time
+
+            if recorder is not None:
+                recorder.advance(t, list(net.species.values()))
+
             # Apply one reaction chosen randomly
-            net.species = GillespieSimulator._get_next_state(net, r0)
+            net.species = GillespieSimulator._get_next_state(net, r0, rng)
 
-            results.append((t, net.species))
+            if recorder is None:
+                results.append((t, net.species))
+            else:
+                recorder.record(t, list(net.species.values()))
 
+        if recorder is not None:
+            return recorder.finish(t, list(net.species.values()))
         return results
 
     """
     Visualises a given set of Gillespie simulation results where
     simulation properties are dictated by the given simulation settings
     object
-    :param SimulationResults results: to be visualised
+    :param SimulationResults results: to be visualised, or a SampledTrajectory
     :param SimulationSettings sim: for the visualisation
     """
 
@@ -135,15 +153,20 @@ class GillespieSimulator:
         times = []
         plottings = {}
 
-        # species: (species title, species name)
-        for species in sim.plotted_species:
-            plottings[species] = []
+        if isinstance(results, SampledTrajectory):
+            times = results.times
+            for species in sim.plotted_species:
+                plottings[species] = results.species(species)
+        else:
+            # species: (species title, species name)
+            for species in sim.plotted_species:
+                plottings[species] = []
 
-        for x in results:
-            times.append(x[0])
+            for x in results:
+                times.append(x[0])
 
-            for species in sim.plotted_species:
-                plottings[species].append(x[1][species])
+                for species in sim.plotted_species:
+                    plottings[species].append(x[1][species])
 
         for species in sim.plotted_species:
             plt.plot(times, plottings[species], label=species)
@@ -0,0 +1,175 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+
+from models.network import Network
+from simulation.compiled_network import CompiledNetwork
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.ode_simulator import OdeSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import EventRecorder
+
+
+class HybridSimulator:
+    """
+    Hybrid simulation which integrates fast reactions as ODEs and fires slow reactions
+    as discrete stochastic events. A reaction is fast when it is expected to fire at
+    least fast_events times in a partition window and every species it changes has at
+    least min_copies molecules; all other reactions are slow.
+
+    The fast reactions are integrated with the right hand side of OdeSimulator, along
+    with the integral of the total slow propensity. A slow reaction fires when that
+    integral reaches an exponentially distributed target, which keeps the slow events
+    exact given the fast dynamics. The partition is re-evaluated after every slow
+    event and at the start of every window; the windows are the intervals of the time
+    space of the simulation settings. Windows without fast reactions are simulated
+    with Gillespie's direct method.
+
+    Source: Salis, H. & Kaznessis, Y. (2005) Accurate hybrid stochastic simulation of a
+        system of coupled chemical or biochemical reactions. J. Chem. Phys. 122, 054103
+
+    :param float fast_events: expected firings in a window for a reaction to be fast
+    :param float min_copies: molecules every species changed by a fast reaction must have
+    :param float rtol: relative tolerance of the ODE integration
+    :param float atol: absolute tolerance of the ODE integration
+    """
+
+    def __init__(self, fast_events=10, min_copies=100, rtol=1e-6, atol=1e-6):
+        self.fast_events = fast_events
+        self.min_copies = min_copies
+        self.rtol = rtol
+        self.atol = atol
+
+    def _partition(self, compiled, x, a, window):
+        """
+        Return a boolean mask of the fast reactions in the given state
+        :param CompiledNetwork compiled: network being simulated
+        :param np.ndarray x: current state vector
+        :param np.ndarray a: propensities in the current state
+        :param float window: length of the partition window
+        :returns np.ndarray of fast reactions
+        """
+
+        fast = a * window >= self.fast_events
+        for j in np.flatnonzero(fast):
+            if any(x[i] < self.min_copies for i, _ in compiled.changes[j]):
+                fast[j] = False
+
+        return fast
+
+    @staticmethod
+    def _fast_network(net, compiled, fast):
+        """
+        Return a network with the species of the given network and only its fast reactions
+        """
+
+        fast_net = Network()
+        fast_net.species = net.species
+        fast_net.symbols = net.symbols
+        fast_net.reactions = [r for r, is_fast in zip(compiled.reactions, fast) if is_fast]
+        return fast_net
+
+    @staticmethod
+    def _windows(sim):
+        """
+        Return the end of each partition window
+        """
+
+        time_space = sim.generate_time_space()
+        inner = time_space[(time_space > sim.start_time) & (time_space < sim.end_time)]
+        return np.append(inner, sim.end_time)
+
+    def _integrate(self, net, compiled, fast, x, t, t_end, target):
+        """
+        Integrate the fast reactions from t until t_end, or until the integral of the
+        slow propensities reaches the target
+        :returns Tuple[float, np.ndarray, bool] of the time reached, the state then and
+            whether a slow reaction fires at that time
+        """
+
+        fast_net = self._fast_network(net, compiled, fast)
+        slow_functions = [f for f, is_fast in zip(compiled.propensity_functions, fast) if not is_fast]
+
+        def dy_dt(t, y):
+            x = y[:-1]
+            slow = sum(max(f(x), 0.0) for f in slow_functions)
+            return OdeSimulator._dy_dt(x, t, fast_net) + [slow]
+
+        def slow_event(t, y):
+            return y[-1] - target
+
+        slow_event.terminal = True
+        slow_event.direction = 1
+
+        solution = solve_ivp(dy_dt, (t, t_end), np.append(x, 0.0), events=slow_event,
+                             rtol=self.rtol, atol=self.atol)
+
+        return solution.t[-1], np.maximum(solution.y[:-1, -1], 0.0), solution.status == 1
+
+    """
+    Performs a hybrid simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every event and window by default
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    def run(self, net, sim, rng=None, recorder=None):
+        rng = RandomStream.of(rng)
+        recorder = recorder or EventRecorder()
+        compiled = CompiledNetwork(net)
+
+        x = compiled.initial_state().astype(float)
+        t = sim.start_time
+        recorder.start(compiled.species_names, sim, t, x, compiled.changes)
+
+        window_start = t
+        for window_end in self._windows(sim):
+            integrated = False
+
+            while t < window_end:
+                a = np.maximum(compiled.propensities(x), 0.0)
+                fast = self._partition(compiled, x, a, window_end - window_start)
+
+                if fast.any():
+                    t, x, fires = self._integrate(net, compiled, fast, x, t, window_end, rng.exponential(1.0))
+                    integrated = True
+                    if not fires:
+                        break
+                    a = np.where(fast, 0.0, np.maximum(compiled.propensities(x), 0.0))
+                else:
+                    a0 = a.sum()
+                    if a0 <= 0:
+                        break
+
+                    # Propensities are constant until the next event
+                    t_next = t + rng.exponential(a0)
+                    if t_next > window_end:
+                        break
+                    t = t_next
+
+                recorder.advance(t, x)
+                j = rng.pick(np.cumsum(a), a.sum())
+                for i, change in compiled.changes[j]:
+                    x[i] += change
+                # Fast species change between events too, so the whole state is recorded
+                recorder.record(t, x)
+
+            if integrated:
+                # Grid points up to the end of the window see the state at its end
+                recorder.advance(np.nextafter(window_end, np.inf), x)
+                recorder.record(window_end, x)
+
+            t = window_start = window_end
+
+        return recorder.finish(sim.end_time, x)
+
+    @staticmethod
+    def simulate(net, sim, rng=None, recorder=None):
+        return HybridSimulator().run(net, sim, rng, recorder)
+
+    @staticmethod
+    def visualise(results, sim):
+        GillespieSimulator.visualise(results, sim)
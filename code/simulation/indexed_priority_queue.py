@@ -0,0 +1,79 @@
+class IndexedPriorityQueue:
+    """
+    A binary min-heap of the keys 0..n-1, ordered by a value per key. Unlike heapq, the
+    value of any key can be changed in O(log n), which is what the Next Reaction Method
+    needs to reschedule the reactions affected by an event.
+    :param List[float] values: initial value of each key
+    """
+
+    def __init__(self, values):
+        self.values = list(values)
+        self.heap = list(range(len(self.values)))
+        self.position = list(range(len(self.values)))
+
+        for i in reversed(range(len(self.heap) // 2)):
+            self._sift_down(i)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def top(self):
+        """
+        Return the key with the smallest value and its value
+        :returns Tuple[int, float] of key and value
+        """
+
+        key = self.heap[0]
+        return key, self.values[key]
+
+    def update(self, key, value):
+        """
+        Change the value of the given key and restore the heap order
+        :param int key: key to update
+        :param float value: new value of the key
+        """
+
+        old = self.values[key]
+        self.values[key] = value
+
+        if value < old:
+            self._sift_up(self.position[key])
+        elif value > old:
+            self._sift_down(self.position[key])
+
+    def _swap(self, i, j):
+        heap = self.heap
+        heap[i], heap[j] = heap[j], heap[i]
+        self.position[heap[i]] = i
+        self.position[heap[j]] = j
+
+    def _sift_up(self, i):
+        heap, values = self.heap, self.values
+
+        while i > 0:
+            parent = (i - 1) // 2
+            if values[heap[i]] < values[heap[parent]]:
+                self._swap(i, parent)
+                i = parent
+            else:
+                break
+
+    def _sift_down(self, i):
+        heap, values = self.heap, self.values
+        n = len(heap)
+
+        while True:
+            smallest = i
+            left = 2 * i + 1
+            right = left + 1
+
+            if left < n and values[heap[left]] < values[heap[smallest]]:
+                smallest = left
+            if right < n and values[heap[right]] < values[heap[smallest]]:
+                smallest = right
+
+            if smallest == i:
+                break
+
+            self._swap(i, smallest)
+            i = smallest
@@ -0,0 +1,188 @@
+from math import log
+
+import numpy as np
+
+from simulation.compiled_network import CompiledNetwork
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+CONSTANT, LINEAR, HILL, OR_GATE = (CompiledNetwork.CONSTANT, CompiledNetwork.LINEAR,
+                                   CompiledNetwork.HILL, CompiledNetwork.OR_GATE)
+
+
+def available():
+    """
+    Return whether numba can be imported, so that the native backend can be used
+    """
+
+    return njit is not None
+
+
+def supports(compiled, recorder=None):
+    """
+    Return whether every propensity of the network has a native kernel: degradation,
+    translation and transcription, but not custom formulae, and whether the recorder
+    takes batches of events
+    :param CompiledNetwork compiled: network to simulate
+    :param EventRecorder recorder: recorder of the simulation, None to check the network only
+    """
+
+    if recorder is not None and not getattr(recorder, "RECORDS_EVENT_BATCHES", False):
+        return False
+    return not compiled.other_reactions
+
+
+def _hill_factor(x, f, f_species, f_k, f_n, f_act):
+    ratio = (x[f_species[f]] / f_k[f]) ** f_n[f]
+    if f_act[f]:
+        return ratio / (1 + ratio)
+    return 1 / (1 + ratio)
+
+
+def _propensity(j, x, kinds, rates, species, first, second, f_species, f_k, f_n, f_act):
+    kind = kinds[j]
+    rate = rates[j]
+
+    if kind == CONSTANT:
+        return rate
+    if kind == LINEAR:
+        return rate * x[species[j]]
+    if kind == HILL:
+        h = rate * _hill_factor(x, first[j], f_species, f_k, f_n, f_act)
+        if second[j] >= 0:
+            h = h * _hill_factor(x, second[j], f_species, f_k, f_n, f_act)
+        return h
+
+    # OR gate
+    one, two = first[j], second[j]
+    a = (x[f_species[one]] / f_k[one]) ** f_n[one]
+    b = (x[f_species[two]] / f_k[two]) ** f_n[two]
+    act1 = 1.0 if f_act[one] else 0.0
+    act2 = 1.0 if f_act[two] else 0.0
+    offset = 0.0 if f_act[one] and f_act[two] else 1.0
+    return rate * (act1 * a + act2 * b + offset) / (1 + a + b)
+
+
+def _direct_method(x, a, t, end_time, uniforms, times, reactions, table,
+                   change_ptr, change_species, change_values, dependent_ptr, dependents):
+    """
+    Run the direct method until the end time, or until the uniforms or the event
+    buffers run out. The state, propensities and buffers are updated in place.
+    :returns Tuple[int, float, bool] of the number of events, the time reached and
+        whether the simulation has ended
+    """
+
+    kinds, rates, species, first, second, f_species, f_k, f_n, f_act = table
+    cumulative = np.empty(len(a))
+    used = 0
+    events = 0
+
+    while events < len(times) and used + 2 <= len(uniforms):
+        total = 0.0
+        for k in range(len(a)):
+            total += a[k]
+            cumulative[k] = total
+        if total <= 0:
+            return events, t, True
+
+        # 1 - u is in (0, 1], so the logarithm is always defined
+        t_next = t - log(1 - uniforms[used]) / total
+        used += 1
+        if t_next > end_time:
+            return events, t, True
+        t = t_next
+
+        r = uniforms[used] * total
+        used += 1
+        # Same choice as bisect_right on the cumulative sums
+        low, high = 0, len(a)
+        while low < high:
+            middle = (low + high) // 2
+            if r < cumulative[middle]:
+                high = middle
+            else:
+                low = middle + 1
+        j = min(low, len(a) - 1)
+
+        for p in range(change_ptr[j], change_ptr[j + 1]):
+            x[change_species[p]] += change_values[p]
+        for p in range(dependent_ptr[j], dependent_ptr[j + 1]):
+            k = dependents[p]
+            a[k] = max(_propensity(k, x, kinds, rates, species, first, second, f_species, f_k, f_n, f_act), 0.0)
+
+        times[events] = t
+        reactions[events] = j
+        events += 1
+
+    return events, t, False
+
+
+if njit is not None:
+    _hill_factor = njit(cache=True)(_hill_factor)
+    _propensity = njit(cache=True)(_propensity)
+    _direct_method = njit(cache=True)(_direct_method)
+
+
+class JitGillespieSimulator:
+    """
+    Gillespie's direct method compiled to native code with numba, including the
+    propensity kernels of degradation, translation and Hill-regulated transcription.
+    Events are produced in chunks, which the recorder takes at once. Given the same
+    random stream it picks the same events as CompiledGillespieSimulator.
+    :param int chunk_size: number of events simulated per call into native code
+    """
+
+    def __init__(self, chunk_size=8192):
+        self.chunk_size = chunk_size
+
+    """
+    Performs a Gillespie simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param CompiledNetwork compiled: to simulate
+    :param SimulationSettings sim: for simulation
+    :param RandomStream rng: source of random numbers
+    :param EventRecorder recorder: decides which states are kept
+    :returns the results of the recorder
+    """
+
+    def run(self, compiled, sim, rng, recorder):
+        if not available():
+            raise ImportError("The numba backend needs numba to be installed")
+        if not supports(compiled):
+            raise ValueError("The numba backend does not support custom rate formulae")
+        if not supports(compiled, recorder):
+            raise ValueError("The numba backend needs a recorder which takes batches of events")
+
+        table = compiled.reaction_table()
+        stoichiometry = compiled.stoichiometry
+        change_ptr = stoichiometry.indptr.astype(np.int64)
+        change_species = stoichiometry.indices.astype(np.int64)
+        change_values = stoichiometry.data.astype(np.int64)
+        dependent_ptr = np.cumsum([0] + [len(d) for d in compiled.dependents]).astype(np.int64)
+        dependents = np.array([k for d in compiled.dependents for k in d], dtype=np.int64)
+
+        x = compiled.initial_state()
+        a = np.maximum(compiled.propensities(x), 0.0)
+        t = float(sim.start_time)
+        state = x.tolist()
+
+        times = np.empty(self.chunk_size)
+        reactions = np.empty(self.chunk_size, dtype=np.int64)
+
+        recorder.start(compiled.species_names, sim, t, state, compiled.changes)
+
+        while True:
+            uniforms = rng.uniforms(2 * self.chunk_size)
+            events, t, ended = _direct_method(x, a, t, float(sim.end_time), uniforms, times, reactions, table,
+                                              change_ptr, change_species, change_values,
+                                              dependent_ptr, dependents)
+
+            recorder.record_events(times[:events], reactions[:events], state)
+            if ended:
+                break
+
+        return recorder.finish(sim.end_time, state)
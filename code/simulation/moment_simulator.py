@@ -0,0 +1,132 @@
+import numpy as np
+from scipy.integrate import odeint
+
+from simulation.compiled_network import CompiledNetwork
+from structured_results import StructuredResults
+
+
+class MomentResults:
+    """
+    Means and covariances of the species of a network over time
+    :param List[str] species_names: species in the order of the species axes
+    :param np.ndarray time_space: time of each row
+    :param np.ndarray mean: (time x species) means
+    :param np.ndarray covariance: (time x species x species) covariances
+    """
+
+    def __init__(self, species_names, time_space, mean, covariance):
+        self.species_names = species_names
+        self.time_space = time_space
+        self.mean = mean
+        self.covariance = covariance
+
+    @property
+    def variance(self):
+        return np.diagonal(self.covariance, axis1=1, axis2=2)
+
+    def structured_mean(self):
+        """
+        Return the means in the format of deterministic results
+        :returns StructuredResults of the mean of each species
+        """
+
+        return StructuredResults(self.mean, self.species_names, self.time_space)
+
+
+class MomentSimulator:
+    """
+    Integrates ODEs for the mean and covariance of the species instead of sampling
+    stochastic trajectories. With the "lna" closure (linear noise approximation) the
+    mean follows the deterministic rate equations and the covariance Σ follows
+
+        dΣ/dt = J Σ + Σ J^T + S diag(a(μ)) S^T
+
+    where J = S ∂a/∂x is the Jacobian of the drift at the mean. The "second-order"
+    closure assumes third central moments vanish (normal closure) and adds the effect
+    of the curvature of the propensities, e.g. of Hill terms, to both the mean and the
+    noise: a(μ) becomes a(μ) + tr(H Σ) / 2, where H is each propensity's Hessian.
+
+    Propensity derivatives come from CompiledNetwork.propensity_jacobian; Hessians are
+    central differences of the Jacobian.
+
+    Source: Van Kampen, N. G. (2007) Stochastic Processes in Physics and Chemistry,
+        3rd edition, chapter X; Gomez-Uribe, C. A. & Verghese, G. C. (2007) Mass
+        fluctuation kinetics. J. Chem. Phys. 126, 024109
+
+    :param str closure: "lna" or "second-order"
+    """
+
+    CLOSURES = ("lna", "second-order")
+
+    def __init__(self, closure="lna"):
+        if closure not in MomentSimulator.CLOSURES:
+            raise ValueError("Unknown closure " + str(closure) + ", expected one of " + str(MomentSimulator.CLOSURES))
+
+        self.closure = closure
+
+    @staticmethod
+    def _propensity_hessian(compiled, x, step=1e-4):
+        """
+        Return the second derivatives of every propensity by central differences of
+        the Jacobian, with a step relative to the species value
+        :returns np.ndarray of (reactions x species x species) derivatives
+        """
+
+        hessian = np.zeros((compiled.reaction_count, compiled.species_count, compiled.species_count))
+        for i in np.flatnonzero(compiled.species_orders() > 0):
+            h = step * max(abs(x[i]), 1.0)
+            up, down = x.copy(), x.copy()
+            up[i] += h
+            down[i] = max(down[i] - h, 0.0)
+            hessian[:, :, i] = (compiled.propensity_jacobian(up) - compiled.propensity_jacobian(down)) / (up[i] - down[i])
+
+        return hessian
+
+    def _dy_dt(self, y, t, compiled, stoichiometry):
+        """
+        Calculate the change in the means and covariances, packed as the means followed
+        by the flattened covariance matrix
+        """
+
+        n = compiled.species_count
+        mean = np.maximum(y[:n], 0.0)
+        covariance = y[n:].reshape(n, n)
+
+        a = compiled.propensities(mean)
+        drift = stoichiometry @ compiled.propensity_jacobian(mean)
+
+        if self.closure == "second-order":
+            hessian = self._propensity_hessian(compiled, mean)
+            a = a + 0.5 * np.einsum("jkl,kl->j", hessian, covariance)
+
+        d_mean = stoichiometry @ a
+        d_covariance = drift @ covariance + covariance @ drift.T + (stoichiometry * np.maximum(a, 0.0)) @ stoichiometry.T
+
+        return np.concatenate((d_mean, d_covariance.ravel()))
+
+    """
+    Integrate the means and covariances of the species of the given network from its
+    initial state, which is taken to be exact (zero covariance)
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :returns MomentResults on the time space of the simulation settings
+    """
+
+    def run(self, net, sim):
+        compiled = CompiledNetwork(net)
+        n = compiled.species_count
+        stoichiometry = compiled.stoichiometry.toarray().astype(float)
+        time_space = sim.generate_time_space()
+
+        y0 = np.concatenate((compiled.initial_values, np.zeros(n * n)))
+        solution = odeint(self._dy_dt, y0, time_space, (compiled, stoichiometry))
+
+        covariance = solution[:, n:].reshape(-1, n, n)
+        # Integration errors can leave the covariance slightly asymmetric
+        covariance = (covariance + covariance.transpose(0, 2, 1)) / 2
+
+        return MomentResults(compiled.species_names, time_space, solution[:, :n], covariance)
+
+    @staticmethod
+    def simulate(net, sim):
+        return MomentSimulator().run(net, sim)
@@ -0,0 +1,106 @@
+from math import inf
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.indexed_priority_queue import IndexedPriorityQueue
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import EventRecorder
+
+
+class NextReactionSimulator:
+    """
+    Gibson and Bruck's Next Reaction Method. Every reaction has a pending absolute
+    firing time kept in an indexed priority queue. After an event, only the reactions
+    in the dependency graph of the fired reaction get new propensities, and their
+    pending times are rescaled rather than redrawn, so the cost per event is
+    O(log R) in the number of reactions R instead of O(R).
+
+    Source: Gibson, M. A. & Bruck, J. (2000) Efficient Exact Stochastic Simulation of
+        Chemical Systems with Many Species and Many Channels. J. Phys. Chem. A 104, 1876-1889
+    """
+
+    @staticmethod
+    def _firing_time(t, a, rng):
+        """
+        Return an absolute firing time for a reaction with the given propensity
+        :param float t: current time
+        :param float a: propensity of the reaction
+        :param RandomStream rng: source of random numbers
+        :returns float of firing time, inf if the reaction cannot fire
+        """
+
+        if a <= 0:
+            return inf
+        return t + rng.exponential(a)
+
+    """
+    Performs a Next Reaction Method simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every event by default
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    @staticmethod
+    def simulate(net, sim, rng=None, recorder=None):
+        rng = RandomStream.of(rng)
+        recorder = recorder or EventRecorder()
+        compiled = CompiledNetwork(net)
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+        firing_time = NextReactionSimulator._firing_time
+
+        x = compiled.initial_state().tolist()
+        t = sim.start_time
+        a = [max(f(x), 0.0) for f in functions]
+
+        recorder.start(compiled.species_names, sim, t, x, changes)
+        advance, record = recorder.advance, recorder.record
+
+        if not a:
+            return recorder.finish(sim.end_time, x)
+
+        queue = IndexedPriorityQueue([firing_time(t, a_j, rng) for a_j in a])
+        times = queue.values
+
+        while True:
+            mu, t_next = queue.top()
+            if t_next > sim.end_time:
+                break
+            t = t_next
+
+            advance(t, x)
+            for i, change in changes[mu]:
+                x[i] += change
+
+            for k in dependents[mu]:
+                if k == mu:
+                    continue
+
+                a_old = a[k]
+                a_new = max(functions[k](x), 0.0)
+                a[k] = a_new
+
+                if a_new <= 0:
+                    queue.update(k, inf)
+                elif a_old > 0:
+                    # Reuse the pending random number by rescaling the time left
+                    queue.update(k, t + (a_old / a_new) * (times[k] - t))
+                else:
+                    # Waiting times are memoryless, so a fresh one is just as valid
+                    queue.update(k, firing_time(t, a_new, rng))
+
+            a[mu] = max(functions[mu](x), 0.0)
+            queue.update(mu, firing_time(t, a[mu], rng))
+
+            record(t, x, mu)
+
+        return recorder.finish(sim.end_time, x)
+
+    @staticmethod
+    def visualise(results, sim):
+        GillespieSimulator.visualise(results, sim)
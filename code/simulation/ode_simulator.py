@@ -1,11 +1,42 @@
 import matplotlib.pyplot as plt
-from scipy.integrate import odeint
+import numpy as np
+from scipy.integrate import BDF, RK45, odeint, solve_ivp
 
+from simulation.compiled_network import CompiledNetwork
 from structured_results import StructuredResults
 
 
+class OdeResults:
+    """
+    Results of a deterministic simulation and the work the integrator did for them
+    :param np.ndarray results: (time x species) values on the time space of the settings
+    :param str method: integrator which was used, the one picked when the method was "auto"
+    :param int nfev: number of right hand side evaluations
+    :param int njev: number of Jacobian evaluations
+    :param int nlu: number of LU decompositions, 0 if unknown
+    :param Any sol: continuous solution of solve_ivp when dense output was asked for
+    :param float last_step: size of the last step of the integrator, 0 if unknown
+    """
+
+    def __init__(self, results, method, nfev, njev, nlu=0, sol=None, last_step=0.0):
+        self.results = results
+        self.method = method
+        self.nfev = nfev
+        self.njev = njev
+        self.nlu = nlu
+        self.sol = sol
+        self.last_step = last_step
+
+
 class OdeSimulator:
 
+    JACOBIANS = (None, "dense", "sparse")
+
+    # The "auto" method probes the first PROBE_FRACTION of the integration, with at
+    # most PROBE_EVALUATIONS right hand side evaluations for each candidate method
+    PROBE_FRACTION = 0.05
+    PROBE_EVALUATIONS = 500
+
     @staticmethod
     def _dy_dt(y, t, net):
         """
@@ -34,19 +65,171 @@ class OdeSimulator:
 
         return list(changes.values())
 
+    @staticmethod
+    def _compiled_dy_dt(y, t, compiled, stoichiometry):
+        """
+        Calculate the change in the values of species like _dy_dt, with the vectorised
+        rate kernels of the compiled network
+
+        :param np.ndarray y: Values in the order of the species of the network
+        :param int t: Not used
+        :param CompiledNetwork compiled: The compiled network
+        :param scipy.sparse.csr_matrix stoichiometry: Stoichiometry of the network as floats
+        """
+
+        return stoichiometry @ compiled.propensities(y)
+
+    @staticmethod
+    def _compiled_jacobian(y, t, compiled, stoichiometry):
+        """
+        Calculate the analytic Jacobian of _compiled_dy_dt, see CompiledNetwork.jacobian
+
+        :param np.ndarray y: Values in the order of the species of the network
+        :param int t: Not used
+        :param CompiledNetwork compiled: The compiled network
+        :param scipy.sparse.csr_matrix stoichiometry: Not used
+        """
+
+        return compiled.jacobian(y)
+
+    @staticmethod
+    def _probe_method(fun, jac, time_space, y0, solver):
+        """
+        Return the cheaper of a non-stiff (RK45) and a stiff (BDF) method, by stepping
+        both over a short prefix of the integration and comparing the right hand side,
+        Jacobian and LU evaluations each needs per unit of time advanced
+        """
+
+        t0, t_end = time_space[0], time_space[-1]
+        if t_end <= t0:
+            return "LSODA"
+
+        t_bound = t0 + OdeSimulator.PROBE_FRACTION * (t_end - t0)
+        options = solver.integrator_options("RK45")
+
+        best, best_cost = "LSODA", np.inf
+        for method, integrator in (("RK45", RK45(fun, t0, y0, t_bound, **options)),
+                                   ("BDF", BDF(fun, t0, y0, t_bound, jac=jac, **options))):
+            while integrator.status == "running" and integrator.nfev < OdeSimulator.PROBE_EVALUATIONS:
+                integrator.step()
+
+            if integrator.status == "failed" or integrator.t <= t0:
+                continue
+
+            cost = (integrator.nfev + integrator.njev + integrator.nlu) / (integrator.t - t0)
+            if cost < best_cost:
+                best, best_cost = method, cost
+
+        return best
+
     """
-    Simulate class network and return results
-    :returns np.ndarray of simulation results
+    Simulate class network and return results along with the solver statistics
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation, its solver settings choose the integrator
+    :param bool|CompiledNetwork compiled: lower the network into arrays once and use the
+        vectorised right hand side, rather than evaluating every reaction on a dictionary
+        of species, or the network already lowered
+    :param str jacobian: analytic Jacobian of the compiled right hand side, "dense" or
+        "sparse", or None to let the integrator estimate it by finite differences (with
+        the sparsity pattern of the network for BDF and Radau). odeint cannot use a sparse
+        Jacobian, choose a solve_ivp method for "sparse".
+    :param np.ndarray y0: initial state, None for the species values of the network
+    :param np.ndarray time_space: times of the results, None for those of the settings
+    :param float first_step: size of the first step, 0 to let the integrator choose it.
+        When given, the size of the last step is kept in the results.
+    :returns OdeResults of the simulation
     """
     @staticmethod
-    def simulate(net, sim):
-        # Build the initial state
-        y0 = [net.species[key] for key in net.species]
+    def solve(net, sim, compiled=False, jacobian=None, y0=None, time_space=None, first_step=None):
+        if jacobian not in OdeSimulator.JACOBIANS:
+            raise ValueError("Unknown Jacobian " + str(jacobian) + ", expected one of " +
+                             str(OdeSimulator.JACOBIANS))
+        if jacobian and not compiled:
+            raise ValueError("The " + jacobian + " Jacobian needs the compiled right hand side")
+        if jacobian == "sparse" and sim.solver.method == "odeint":
+            raise ValueError("odeint cannot use a sparse Jacobian, choose BDF, Radau or LSODA, "
+                             "or a dense Jacobian")
 
-        # solve the ODEs
-        solution = odeint(OdeSimulator._dy_dt, y0, sim.generate_time_space(), (net,))
+        # Build the initial state
+        if y0 is None:
+            y0 = np.array([net.species[key] for key in net.species], dtype=float)
+        if time_space is None:
+            time_space = sim.generate_time_space()
+        solver = sim.solver
+        method = solver.method
+
+        if compiled:
+            compiled_net = compiled if isinstance(compiled, CompiledNetwork) else CompiledNetwork(net)
+            stoichiometry = compiled_net.stoichiometry.tocsr().astype(float)
+            args = (compiled_net, stoichiometry)
+            dy_dt = OdeSimulator._compiled_dy_dt
+            sparsity = compiled_net.jacobian_sparsity()
+        else:
+            args = (net,)
+            dy_dt = OdeSimulator._dy_dt
+            sparsity = None
+
+        if method == "odeint":
+            # solve the ODEs
+            solution, info = odeint(dy_dt, y0, time_space, args,
+                                    Dfun=OdeSimulator._compiled_jacobian if jacobian else None,
+                                    full_output=True, h0=first_step or 0.0, **solver.integrator_options())
+            return OdeResults(solution, method, int(info["nfe"][-1]) if len(info["nfe"]) else 0,
+                              int(info["nje"][-1]) if len(info["nje"]) else 0,
+                              last_step=float(info["hu"][-1]) if len(info["hu"]) else 0.0)
+
+        def fun(t, y):
+            return dy_dt(y, t, *args)
+
+        if jacobian == "sparse":
+            def jac(t, y):
+                return compiled_net.jacobian(y, sparse_output=True)
+        elif jacobian == "dense":
+            def jac(t, y):
+                return compiled_net.jacobian(y)
+        else:
+            jac = None
+
+        if method == "auto":
+            method = OdeSimulator._probe_method(fun, jac, time_space, y0, solver)
+
+        options = solver.integrator_options(method)
+        if method in ("BDF", "Radau", "LSODA"):
+            # LSODA only takes a dense Jacobian
+            if method == "LSODA" and jacobian == "sparse":
+                options["jac"] = lambda t, y: compiled_net.jacobian(y)
+            elif jac is not None:
+                options["jac"] = jac
+            elif sparsity is not None and method != "LSODA":
+                options["jac_sparsity"] = sparsity
+        if first_step:
+            options["first_step"] = first_step
+
+        # The steps of the integrator are only kept in the continuous solution
+        solution = solve_ivp(fun, (time_space[0], time_space[-1]), y0, method=method, t_eval=time_space,
+                             dense_output=solver.dense_output or first_step is not None, **options)
+        if not solution.success:
+            raise RuntimeError("Integration with " + method + " failed: " + solution.message)
+
+        last_step = 0.0
+        if first_step is not None and len(solution.sol.ts) > 1:
+            last_step = float(abs(solution.sol.ts[-1] - solution.sol.ts[-2]))
+
+        return OdeResults(solution.y.T, method, solution.nfev, solution.njev, solution.nlu,
+                          solution.sol if solver.dense_output else None, last_step)
 
-        return solution
+    """
+    Simulate class network and return results
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param bool compiled: lower the network into arrays once and use the vectorised
+        right hand side, rather than evaluating every reaction on a dictionary of species
+    :param str jacobian: Jacobian of the compiled right hand side, see solve()
+    :returns np.ndarray of simulation results
+    """
+    @staticmethod
+    def simulate(net, sim, compiled=False, jacobian=None):
+        return OdeSimulator.solve(net, sim, compiled, jacobian).results
 
     """
     Visualise given results
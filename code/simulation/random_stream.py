@@ -0,0 +1,94 @@
+from bisect import bisect_right
+from math import log
+
+import numpy as np
+
+
+class RandomStream:
+    """
+    Source of random numbers for the stochastic simulators, backed by a
+    numpy.random.Generator. Uniforms are drawn from the generator in large blocks and
+    handed out one at a time, which is much cheaper than a generator call per event.
+    :param Any seed: int seed, np.random.SeedSequence, np.random.Generator, or None
+        for a random seed
+    :param int block_size: number of uniforms drawn from the generator at once
+    """
+
+    def __init__(self, seed=None, block_size=4096):
+        if isinstance(seed, np.random.Generator):
+            self.generator = seed
+        else:
+            self.generator = np.random.default_rng(seed)
+
+        self.block_size = block_size
+        self._block = []
+        self._next = 0
+
+    @staticmethod
+    def of(rng):
+        """
+        Return the given random stream, or a new one seeded by the given value
+        :param Any rng: RandomStream, or anything RandomStream accepts as a seed
+        :returns RandomStream
+        """
+
+        return rng if isinstance(rng, RandomStream) else RandomStream(rng)
+
+    def uniform(self):
+        """
+        Return a uniform random number in [0, 1)
+        :returns float
+        """
+
+        if self._next == len(self._block):
+            self._block = self.generator.random(self.block_size).tolist()
+            self._next = 0
+
+        u = self._block[self._next]
+        self._next += 1
+        return u
+
+    def uniforms(self, n):
+        """
+        Return the next n uniform random numbers in [0, 1) at once, the same numbers n
+        calls to uniform() would return
+        :param int n: number of uniforms
+        :returns np.ndarray of uniforms
+        """
+
+        out = np.empty(n)
+        filled = 0
+        while filled < n:
+            if self._next == len(self._block):
+                self._block = self.generator.random(self.block_size).tolist()
+                self._next = 0
+
+            take = min(n - filled, len(self._block) - self._next)
+            out[filled:filled + take] = self._block[self._next:self._next + take]
+            self._next += take
+            filled += take
+
+        return out
+
+    def exponential(self, rate):
+        """
+        Return an exponentially distributed waiting time
+        :param float rate: rate of the distribution, must be positive
+        :returns float
+        """
+
+        # 1 - u is in (0, 1], so the logarithm is always defined
+        return -log(1 - self.uniform()) / rate
+
+    def pick(self, cumulative, total=None):
+        """
+        Pick an index with probability proportional to its weight, by binary search
+        in the cumulative sum of the weights
+        :param List[float] cumulative: cumulative sum of the weights
+        :param float total: the last element of cumulative, if already known
+        :returns int of the picked index
+        """
+
+        if total is None:
+            total = cumulative[-1]
+        return min(bisect_right(cumulative, self.uniform() * total), len(cumulative) - 1)
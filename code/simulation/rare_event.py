@@ -0,0 +1,274 @@
+from itertools import accumulate
+from math import exp, log, sqrt
+
+import numpy as np
+from scipy.stats import norm
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.random_stream import RandomStream
+
+
+class RareEventEstimate:
+    """
+    Estimate of the probability of a rare event
+    :param float probability: unbiased estimate of the probability
+    :param float standard_error: standard error of the estimate
+    :param int samples: number of independent samples the estimate is the mean of
+    :param int events: number of reaction events simulated for the estimate
+    """
+
+    def __init__(self, probability, standard_error, samples, events):
+        self.probability = probability
+        self.standard_error = standard_error
+        self.samples = samples
+        self.events = events
+
+    def confidence_interval(self, level=0.95):
+        """
+        Return a normal approximation confidence interval of the probability
+        :param float level: confidence level
+        :returns Tuple[float, float] of the lower and upper bound
+        """
+
+        half_width = norm.ppf(0.5 + level / 2) * self.standard_error
+        return max(self.probability - half_width, 0.0), min(self.probability + half_width, 1.0)
+
+    @staticmethod
+    def of_samples(samples, events):
+        """
+        Return the estimate given by the mean of independent unbiased samples
+        :param List[float] samples: independent unbiased estimates
+        :param int events: number of reaction events simulated for all of them
+        """
+
+        samples = np.asarray(samples, dtype=float)
+        error = samples.std(ddof=1) / sqrt(len(samples)) if len(samples) > 1 else float("inf")
+        return RareEventEstimate(float(samples.mean()), float(error), len(samples), events)
+
+
+class WeightedSimulator:
+    """
+    Weighted stochastic simulation: the direct method with the choice of the next
+    reaction biased towards the rare event, and every trajectory weighted by its
+    likelihood ratio to the unbiased process. Waiting times are not biased. The
+    probability that the reaction coordinate reaches the target before the end time
+    is the mean of the weights of the trajectories which reach it.
+
+    Source: Kuwahara, H. & Mura, I. (2008) An efficient and exact stochastic simulation
+        method to analyze rare events in biochemical systems. J. Chem. Phys. 129, 165101
+
+    :param Callable[[Dict[str, float]], float] coordinate: reaction coordinate of a network state
+    :param float target: the event happens when the coordinate reaches this value
+    :param Dict[str, float] biases: key: reaction name, value: factor its propensity is multiplied by when choosing
+    :param int samples: number of weighted trajectories
+    """
+
+    def __init__(self, coordinate, target, biases, samples=10000):
+        for name, factor in biases.items():
+            if not factor > 0:
+                raise ValueError("The bias of reaction " + str(name) + " has to be positive, not " + str(factor))
+
+        self.coordinate = coordinate
+        self.target = target
+        self.biases = biases
+        self.samples = samples
+
+    def _trajectory(self, compiled, bias, sim, rng):
+        """
+        Simulate one biased trajectory
+        :returns Tuple[float, int] of the weight of the trajectory if it reaches the target,
+            otherwise 0, and the number of events simulated
+        """
+
+        names = compiled.species_names
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+
+        x = compiled.initial_state().tolist()
+        a = [max(f(x), 0.0) for f in functions]
+        b = [a_j * bias_j for a_j, bias_j in zip(a, bias)]
+        t = sim.start_time
+        weight = 1.0
+        events = 0
+
+        while self.coordinate(dict(zip(names, x))) < self.target:
+            a0 = sum(a)
+            cumulative = list(accumulate(b))
+            b0 = cumulative[-1] if cumulative else 0
+            if a0 <= 0 or b0 <= 0:
+                return 0.0, events
+
+            t = t + rng.exponential(a0)
+            if t > sim.end_time:
+                return 0.0, events
+
+            j = rng.pick(cumulative, b0)
+            weight *= (a[j] / a0) / (b[j] / b0)
+            events += 1
+
+            for i, change in changes[j]:
+                x[i] += change
+            for k in dependents[j]:
+                a[k] = max(functions[k](x), 0.0)
+                b[k] = a[k] * bias[k]
+
+        return weight, events
+
+    """
+    Estimate the probability that the reaction coordinate reaches the target within
+    the interval of the simulation settings
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :returns RareEventEstimate of the probability
+    """
+
+    def run(self, net, sim, rng=None):
+        rng = RandomStream.of(rng)
+        compiled = CompiledNetwork(net)
+        unknown = sorted(set(self.biases) - set(compiled.reaction_names))
+        if unknown:
+            raise ValueError("No reactions named " + ", ".join(unknown) + " to bias")
+        bias = [float(self.biases.get(name, 1.0)) for name in compiled.reaction_names]
+
+        weights = []
+        events = 0
+        for _ in range(self.samples):
+            weight, n = self._trajectory(compiled, bias, sim, rng)
+            weights.append(weight)
+            events += n
+
+        return RareEventEstimate.of_samples(weights, events)
+
+
+class MultilevelSplitting:
+    """
+    Adaptive multilevel splitting. A set of replicas is simulated, each scored by the
+    highest value of the reaction coordinate it reached before the end time. At every
+    iteration the replicas with the lowest score are killed and replaced by copies of
+    surviving replicas, branched off at the first point where the survivor went above
+    that score, until every replica reaches the target. The probability is the product
+    of the surviving fractions. The estimate is unbiased, and independent repetitions
+    of the algorithm give its confidence interval.
+
+    Source: Cérou, F. & Guyader, A. (2007) Adaptive multilevel splitting for rare event
+        analysis. Stoch. Anal. Appl. 25, 417-443; Bréhier, C.-E., Gazeau, M., Goudenège, L.,
+        Lelièvre, T. & Rousset, M. (2016) Unbiasedness of some generalized adaptive
+        multilevel splitting algorithms. Ann. Appl. Probab. 26, 3559-3601
+
+    :param Callable[[Dict[str, float]], float] coordinate: reaction coordinate of a network state
+    :param float target: the event happens when the coordinate reaches this value
+    :param int replicas: number of replicas
+    :param int repetitions: number of independent runs of the algorithm
+    """
+
+    def __init__(self, coordinate, target, replicas=100, repetitions=10):
+        self.coordinate = coordinate
+        self.target = target
+        self.replicas = replicas
+        self.repetitions = repetitions
+
+    def _path(self, compiled, x, t, end_time, rng):
+        """
+        Simulate from state x at time t until the end time or until the coordinate
+        reaches the target, keeping only the points where the coordinate goes above
+        its previous maximum
+        :returns Tuple[List[Tuple[float, float, List[int]]], int] of the (score, time,
+            state) points and the number of events simulated
+        """
+
+        names = compiled.species_names
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+
+        x = list(x)
+        a = [max(f(x), 0.0) for f in functions]
+        score = self.coordinate(dict(zip(names, x)))
+        points = [(score, t, list(x))]
+        events = 0
+
+        while score < self.target:
+            cumulative = list(accumulate(a))
+            a0 = cumulative[-1] if cumulative else 0
+            if a0 <= 0:
+                break
+
+            t = t + rng.exponential(a0)
+            if t > end_time:
+                break
+
+            j = rng.pick(cumulative, a0)
+            events += 1
+
+            for i, change in changes[j]:
+                x[i] += change
+            for k in dependents[j]:
+                a[k] = max(functions[k](x), 0.0)
+
+            value = self.coordinate(dict(zip(names, x)))
+            if value > score:
+                score = value
+                points.append((score, t, list(x)))
+
+        return points, events
+
+    def _estimate(self, compiled, sim, rng):
+        """
+        Run the algorithm once
+        :returns Tuple[float, int] of the estimate and the number of events simulated
+        """
+
+        x0 = compiled.initial_state().tolist()
+        paths, events = [], 0
+        for _ in range(self.replicas):
+            path, n = self._path(compiled, x0, sim.start_time, sim.end_time, rng)
+            paths.append(path)
+            events += n
+
+        log_probability = 0.0
+
+        while True:
+            scores = [path[-1][0] for path in paths]
+            level = min(scores)
+            if level >= self.target:
+                return exp(log_probability), events
+
+            killed = [i for i, s in enumerate(scores) if s <= level]
+            survivors = [i for i, s in enumerate(scores) if s > level]
+            if not survivors:
+                return 0.0, events
+
+            log_probability += log(1 - len(killed) / self.replicas)
+
+            for i in killed:
+                parent = paths[survivors[int(rng.uniform() * len(survivors))]]
+                branch = next(n for n, point in enumerate(parent) if point[0] > level)
+                _, t, x = parent[branch]
+
+                path, n = self._path(compiled, x, t, sim.end_time, rng)
+                paths[i] = parent[:branch] + path
+                events += n
+
+    """
+    Estimate the probability that the reaction coordinate reaches the target within
+    the interval of the simulation settings
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :returns RareEventEstimate of the probability
+    """
+
+    def run(self, net, sim, rng=None):
+        rng = RandomStream.of(rng)
+        compiled = CompiledNetwork(net)
+
+        estimates = []
+        events = 0
+        for _ in range(self.repetitions):
+            estimate, n = self._estimate(compiled, sim, rng)
+            estimates.append(estimate)
+            events += n
+
+        return RareEventEstimate.of_samples(estimates, events)
@@ -0,0 +1,260 @@
+import os
+import pickle
+from copy import copy
+from itertools import accumulate
+from time import perf_counter
+
+import numpy as np
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.ode_simulator import OdeSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import EventRecorder
+
+
+def save_checkpoint(path, state):
+    """
+    Write a checkpoint atomically: a preempted write leaves the previous checkpoint intact
+    :param str path: checkpoint file
+    :param Dict[str, Any] state: simulator state
+    """
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary, path)
+
+
+def load_checkpoint(path):
+    """
+    Read a checkpoint written by save_checkpoint
+    :param str path: checkpoint file
+    :returns Dict[str, Any] of simulator state
+    """
+
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class ResumableGillespieSimulator:
+    """
+    Gillespie's direct method over a CompiledNetwork, like CompiledGillespieSimulator,
+    which periodically saves its whole state to a checkpoint file: the state vector,
+    the propensities, the time, the random stream and the recorder with the output
+    written so far. A run resumed from a checkpoint continues exactly as the original
+    run would have, and a finished run can be resumed with a later end time to extend
+    it without redoing the finished part.
+
+    The waiting time which first overshoots the end time is kept in the checkpoint and
+    becomes the next event when the run is extended, so an extended run gives the same
+    trajectory as one simulated to the later end time in one go.
+    :param str path: checkpoint file
+    :param float every: seconds of wall time between two checkpoints
+    """
+
+    def __init__(self, path, every=60.0):
+        self.path = path
+        self.every = every
+
+    def _save(self, compiled, state):
+        state["species_names"] = compiled.species_names
+        state["changes"] = compiled.changes
+        save_checkpoint(self.path, state)
+
+    def _run(self, compiled, sim, state):
+        changes = compiled.changes
+        dependents = compiled.dependents
+        functions = compiled.propensity_functions
+
+        x, a, t, pending = state["x"], state["a"], state["t"], state["pending"]
+        rng, recorder = state["rng"], state["recorder"]
+        advance, record = recorder.advance, recorder.record
+
+        events = 0
+        next_save = perf_counter() + self.every
+
+        while True:
+            cumulative = list(accumulate(a))
+            a0 = cumulative[-1] if cumulative else 0
+            if a0 <= 0:
+                pending = None
+                break
+
+            if pending is None:
+                t_next = t + rng.exponential(a0)
+            else:
+                t_next, pending = pending, None
+            if t_next > sim.end_time:
+                pending = t_next
+                break
+            t = t_next
+
+            advance(t, x)
+            j = rng.pick(cumulative, a0)
+
+            for i, change in changes[j]:
+                x[i] += change
+            for k in dependents[j]:
+                a[k] = max(functions[k](x), 0.0)
+
+            record(t, x, j)
+
+            events += 1
+            if events % 1024 == 0 and perf_counter() >= next_save:
+                state.update(t=t, pending=None)
+                self._save(compiled, state)
+                next_save = perf_counter() + self.every
+
+        state.update(t=t, pending=pending)
+        # Saved before finish(), which may complete the output in place
+        self._save(compiled, state)
+        return recorder.finish(sim.end_time, x)
+
+    """
+    Performs a Gillespie simulation of the given network in the given
+    interval (dictated by the simulation setting given), saving checkpoints as it goes.
+    The given network is not modified.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every event by default
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    def simulate(self, net, sim, rng=None, recorder=None):
+        recorder = recorder or EventRecorder()
+        compiled = CompiledNetwork(net)
+
+        x = compiled.initial_state()
+        state = {
+            "x": x.tolist(),
+            "a": np.maximum(compiled.propensities(x), 0.0).tolist(),
+            "t": sim.start_time,
+            "pending": None,
+            "rng": RandomStream.of(rng),
+            "recorder": recorder,
+        }
+        recorder.start(compiled.species_names, sim, sim.start_time, state["x"], compiled.changes)
+
+        return self._run(compiled, sim, state)
+
+    """
+    Continue the simulation saved in the checkpoint file until the end time of the
+    given simulation settings, which may be later than the one it was started with
+    :param Network net: the simulated network, used to rebuild the propensity functions
+    :param SimulationSettings sim: for simulation
+    :returns SimulationResults of the whole simulation, or the results of its recorder
+    """
+
+    def resume(self, net, sim):
+        compiled = CompiledNetwork(net)
+        state = load_checkpoint(self.path)
+
+        if state["species_names"] != compiled.species_names or state["changes"] != compiled.changes:
+            raise ValueError("The network does not match the checkpoint")
+
+        state["recorder"].extend(sim)
+        return self._run(compiled, sim, state)
+
+
+class ResumableOdeSimulator:
+    """
+    Solves the ODEs of a network like OdeSimulator, in segments of a few points of the
+    time space, saving the solution so far, the last state of the integrator and its
+    last step size to a checkpoint file between segments. Each segment is integrated by
+    OdeSimulator.solve with the compiled right hand side, its dense Jacobian and the
+    solver settings of the simulation, and starts with the step size the previous one
+    ended with. The method picked for "auto" by the first segment is kept for the
+    others. A resumed run integrates the same segments
+    from the same states, so it gives exactly the results of an uninterrupted run. A
+    finished run can be resumed with a longer time space to extend it; the extension
+    matches a single longer run exactly when the shorter run ended on a segment boundary.
+    :param str path: checkpoint file
+    :param int segment: number of time space intervals integrated in one segment
+    :param float every: seconds of wall time between two checkpoints
+    """
+
+    def __init__(self, path, segment=10, every=60.0):
+        self.path = path
+        self.segment = segment
+        self.every = every
+
+    @staticmethod
+    def _segment_settings(sim, method):
+        """
+        Return the simulation settings with the method an "auto" run has picked
+        """
+
+        if sim.solver.method != "auto" or method is None:
+            return sim
+
+        solver = copy(sim.solver)
+        solver.method = method
+        segment_sim = copy(sim)
+        segment_sim.solver = solver
+        return segment_sim
+
+    def _run(self, net, sim, state):
+        time_space = sim.generate_time_space()
+        done = len(state["rows"])
+
+        if len(time_space) < done or not np.allclose(time_space[:done], state["times"], rtol=1e-12, atol=0):
+            raise ValueError("The time space does not extend the one of the checkpoint")
+
+        compiled = CompiledNetwork(net)
+        next_save = perf_counter() + self.every
+
+        while done < len(time_space):
+            times = time_space[done - 1:done + self.segment]
+            segment_sim = self._segment_settings(sim, state.get("method"))
+            solution = OdeSimulator.solve(net, segment_sim, compiled, "dense", state["rows"][-1], times,
+                                          state["step"])
+
+            state["rows"].extend(solution.results[1:])
+            state["step"] = solution.last_step
+            state["method"] = solution.method
+            done = len(state["rows"])
+            state["times"] = time_space[:done]
+
+            if perf_counter() >= next_save:
+                save_checkpoint(self.path, state)
+                next_save = perf_counter() + self.every
+
+        save_checkpoint(self.path, state)
+        return np.array(state["rows"])
+
+    """
+    Simulate the network, saving checkpoints as it goes
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :returns np.ndarray of simulation results
+    """
+
+    def simulate(self, net, sim):
+        time_space = sim.generate_time_space()
+        y0 = np.array([net.species[key] for key in net.species], dtype=float)
+
+        state = {
+            "species_names": list(net.species.keys()),
+            "rows": [y0] if len(time_space) else [],
+            "times": time_space[:1],
+            "step": 0.0,
+            "method": None,
+        }
+        return self._run(net, sim, state)
+
+    """
+    Continue the integration saved in the checkpoint file until the end of the time
+    space of the given simulation settings, which has to start with the time space
+    solved so far
+    :param Network net: the simulated network
+    :param SimulationSettings sim: for simulation
+    :returns np.ndarray of simulation results
+    """
+
+    def resume(self, net, sim):
+        state = load_checkpoint(self.path)
+        if state["species_names"] != list(net.species.keys()):
+            raise ValueError("The network does not match the checkpoint")
+
+        return self._run(net, sim, state)
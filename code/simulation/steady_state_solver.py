@@ -0,0 +1,191 @@
+import numpy as np
+from scipy.integrate import odeint
+from scipy.optimize import root
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.ode_simulator import OdeSimulator
+
+
+class SteadyState:
+    """
+    A fixed point of the rate equations of a network
+    :param List[str] species_names: species in the order of the values
+    :param np.ndarray values: value of each species at the fixed point
+    :param float residual: largest absolute rate of change left at the fixed point
+    :param np.ndarray eigenvalues: eigenvalues of the Jacobian at the fixed point
+    :param str method: "newton" or "pseudo-transient", whichever found the fixed point
+    """
+
+    def __init__(self, species_names, values, residual, eigenvalues, method):
+        self.species_names = species_names
+        self.values = values
+        self.residual = residual
+        self.eigenvalues = eigenvalues
+        self.method = method
+
+    @property
+    def stable(self):
+        """
+        Whether small perturbations decay, i.e. every eigenvalue has a negative real part
+        """
+
+        return bool(np.all(self.eigenvalues.real < 0))
+
+    def as_dict(self):
+        return dict(zip(self.species_names, self.values.tolist()))
+
+
+class SteadyStateSolver:
+    """
+    Finds the steady state of a network directly instead of integrating until it is
+    reached. The network is integrated for a short transient from its initial state,
+    which is then refined by a trust-region Newton method (MINPACK's hybrid method)
+    on dx/dt = 0. If that fails or leaves the non-negative orthant, pseudo-transient
+    continuation takes implicit Euler steps, starting at the time scale of the fastest
+    decay and growing at least geometrically as the rate of change shrinks. A step which
+    changes any species by more than its own value (or 1) is retried with half the
+    length, so the steps follow the dynamics into the basin of the attracting fixed
+    point instead of jumping to another one.
+
+    The last fixed point is kept and, for a network with the same species, used as the
+    starting point instead of the transient, so a scan over neighbouring parameter sets
+    starts each solve next to its answer.
+
+    Source: Kelley, C. T. & Keyes, D. E. (1998) Convergence analysis of pseudo-transient
+        continuation. SIAM J. Numer. Anal. 35(2), 508-523
+
+    :param float transient: duration of the transient integrated before the first solve
+    :param float tolerance: largest rate of change accepted at a fixed point, relative to
+        the largest species value (absolute below 1)
+    :param str jacobian: "analytic" for CompiledNetwork.jacobian, or None for finite differences
+    :param bool warm_start: start from the last fixed point when the species match
+    """
+
+    JACOBIANS = ("analytic", None)
+
+    # Pseudo-transient continuation, INITIAL_STEP is used when no species decays
+    INITIAL_STEP = 1e-2
+    MAX_STEP = 1e8
+    MAX_ITERATIONS = 500
+    MAX_CHANGE = 1.0
+
+    def __init__(self, transient=10.0, tolerance=1e-8, jacobian="analytic", warm_start=True):
+        if jacobian not in SteadyStateSolver.JACOBIANS:
+            raise ValueError("Unknown Jacobian " + str(jacobian) + ", expected one of " +
+                             str(SteadyStateSolver.JACOBIANS))
+
+        self.transient = transient
+        self.tolerance = tolerance
+        self.jacobian = jacobian
+        self.warm_start = warm_start
+        self.last = None
+
+    def _jacobian_function(self, compiled, fun):
+        if self.jacobian == "analytic":
+            return compiled.jacobian
+
+        def finite_differences(x):
+            f = fun(x)
+            jacobian = np.empty((len(x), len(x)))
+            for i in range(len(x)):
+                h = 1e-7 * max(abs(x[i]), 1.0)
+                step = x.copy()
+                step[i] += h
+                jacobian[:, i] = (fun(step) - f) / h
+            return jacobian
+
+        return finite_differences
+
+    def _initial_guess(self, compiled, stoichiometry):
+        if self.warm_start and self.last is not None and self.last.species_names == compiled.species_names:
+            return self.last.values.copy()
+
+        y0 = compiled.initial_values
+        if self.transient <= 0:
+            return y0.copy()
+
+        return odeint(OdeSimulator._compiled_dy_dt, y0, [0, self.transient], (compiled, stoichiometry),
+                      Dfun=OdeSimulator._compiled_jacobian if self.jacobian else None)[-1]
+
+    def _converged(self, f, x):
+        return np.max(np.abs(f), initial=0.0) <= self.tolerance * max(1.0, np.max(np.abs(x), initial=0.0))
+
+    def _accept(self, fun, x):
+        return x is not None and np.all(np.isfinite(x)) and np.all(x >= -self.tolerance) and \
+            self._converged(fun(x), x)
+
+    def _newton(self, fun, jac, x0):
+        solution = root(fun, x0, jac=jac, method="hybr", options={"xtol": 1e-12})
+        return solution.x if solution.success else None
+
+    def _pseudo_transient(self, fun, jac, x0):
+        """
+        Return the fixed point reached by implicit Euler steps (I / dt - J) dx = f(x),
+        with dt growing by the ratio of successive residuals, at least doubling, or None
+        if none is reached
+        """
+
+        x = x0.copy()
+        f = fun(x)
+        j = jac(x)
+        residual = np.linalg.norm(f)
+        identity = np.eye(len(x))
+
+        # The fastest decay sets the time scale of the first step
+        rate = np.max(np.abs(np.diag(j)), initial=0.0)
+        dt = 1.0 / rate if rate > 0 else self.INITIAL_STEP
+
+        for _ in range(self.MAX_ITERATIONS):
+            if self._converged(f, x):
+                return x
+
+            try:
+                dx = np.linalg.solve(identity / dt - j, f)
+            except np.linalg.LinAlgError:
+                return None
+
+            # Concentrations stay non-negative
+            new_x = np.maximum(x + dx, 0.0)
+            new_f = fun(new_x)
+            new_residual = np.linalg.norm(new_f)
+            if not np.isfinite(new_residual) or \
+                    np.max(np.abs(new_x - x) / np.maximum(np.abs(x), 1.0), initial=0.0) > self.MAX_CHANGE:
+                dt /= 2
+                continue
+
+            x, f, j = new_x, new_f, jac(new_x)
+            dt = min(dt * max(2.0, residual / max(new_residual, 1e-300)), self.MAX_STEP)
+            residual = new_residual
+
+        return x if self._converged(f, x) else None
+
+    """
+    Find the steady state of the given network with its current parameters
+    :param Network net: network to solve
+    :returns SteadyState of the network
+    """
+
+    def solve(self, net):
+        compiled = CompiledNetwork(net)
+        stoichiometry = compiled.stoichiometry.tocsr().astype(float)
+
+        def fun(x):
+            return OdeSimulator._compiled_dy_dt(x, 0, compiled, stoichiometry)
+
+        jac = self._jacobian_function(compiled, fun)
+        x0 = self._initial_guess(compiled, stoichiometry)
+
+        x, method = self._newton(fun, jac, x0), "newton"
+        if not self._accept(fun, x):
+            # Newton refines the end of the continuation, and finds no root if it ran away
+            x, method = self._pseudo_transient(fun, jac, x0), "pseudo-transient"
+            x = self._newton(fun, jac, x) if x is not None else None
+        if not self._accept(fun, x):
+            raise RuntimeError("No steady state found within a rate of change of " + str(self.tolerance))
+
+        x = np.maximum(x, 0.0)
+        eigenvalues = np.linalg.eigvals(jac(x)) if len(x) else np.zeros(0)
+        self.last = SteadyState(compiled.species_names, x, float(np.max(np.abs(fun(x)), initial=0.0)),
+                                eigenvalues, method)
+
+        return self.last
@@ -0,0 +1,132 @@
+import numpy as np
+
+
+class RunningMoments:
+    """
+    Mean and variance of a stream of equally shaped arrays, updated one array at a time
+    with Welford's algorithm, so the samples themselves never have to be kept.
+    :param Tuple[int] shape: shape of each sample
+    """
+
+    def __init__(self, shape):
+        self.count = 0
+        self.mean = np.zeros(shape)
+        self._m2 = np.zeros(shape)
+
+    def add(self, sample):
+        """
+        Add one sample to the statistics
+        :param np.ndarray sample: sample of the given shape
+        """
+
+        self.count += 1
+        delta = sample - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (sample - self.mean)
+
+    def add_all(self, samples):
+        """
+        Add a stack of samples along the first axis
+        :param np.ndarray samples: (n x shape) samples
+        """
+
+        for sample in samples:
+            self.add(sample)
+
+    @property
+    def variance(self):
+        """
+        Return the unbiased sample variance, NaN until there are two samples
+        :returns np.ndarray of variances
+        """
+
+        if self.count < 2:
+            return np.full(self.mean.shape, np.nan)
+        return self._m2 / (self.count - 1)
+
+
+class StreamingQuantiles:
+    """
+    Estimates of a quantile of a stream of equally shaped arrays, kept independently for
+    every element with the P-square algorithm. Memory is five markers per element,
+    regardless of the number of samples.
+
+    Source: Jain, R. & Chlamtac, I. (1985) The P2 algorithm for dynamic calculation of
+        quantiles and histograms without storing observations. Commun. ACM 28, 1076-1085
+
+    :param float p: quantile to estimate, between 0 and 1
+    :param Tuple[int] shape: shape of each sample
+    """
+
+    def __init__(self, p, shape):
+        self.p = p
+        self.count = 0
+        self._heights = np.zeros((5,) + tuple(shape))
+        self._positions = np.tile(np.arange(1.0, 6.0).reshape((5,) + (1,) * len(shape)), (1,) + tuple(shape))
+        self._desired = np.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]).reshape((5,) + (1,) * len(shape))
+        self._desired = self._desired * np.ones(shape)
+        self._increments = np.array([0, p / 2, p, (1 + p) / 2, 1]).reshape((5,) + (1,) * len(shape))
+
+    def add(self, sample):
+        """
+        Add one sample to the estimates
+        :param np.ndarray sample: sample of the given shape
+        """
+
+        sample = np.asarray(sample, dtype=float)
+
+        if self.count < 5:
+            self._heights[self.count] = sample
+            self.count += 1
+            if self.count == 5:
+                self._heights.sort(axis=0)
+            return
+
+        self.count += 1
+        q, n = self._heights, self._positions
+
+        # Find the cell k with q[k] <= x < q[k + 1], extending the extreme markers if needed
+        np.minimum(q[0], sample, out=q[0])
+        np.maximum(q[4], sample, out=q[4])
+        k = np.clip((sample[np.newaxis] >= q[1:4]).sum(axis=0), 0, 3)
+
+        n += np.arange(5).reshape((5,) + (1,) * sample.ndim) > k
+        self._desired += self._increments
+
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            up = (d >= 1) & (n[i + 1] - n[i] > 1)
+            down = (d <= -1) & (n[i - 1] - n[i] < -1)
+            move = up | down
+            if not move.any():
+                continue
+
+            s = np.where(up, 1.0, -1.0)
+            parabolic = q[i] + s / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + s) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - s) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+            neighbour_q = np.where(up, q[i + 1], q[i - 1])
+            neighbour_n = np.where(up, n[i + 1], n[i - 1])
+            linear = q[i] + s * (neighbour_q - q[i]) / (neighbour_n - n[i])
+
+            use_parabolic = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = np.where(move, np.where(use_parabolic, parabolic, linear), q[i])
+            n[i] = np.where(move, n[i] + s, n[i])
+
+    def add_all(self, samples):
+        for sample in samples:
+            self.add(sample)
+
+    @property
+    def value(self):
+        """
+        Return the current estimate of the quantile
+        :returns np.ndarray of estimates
+        """
+
+        if self.count == 0:
+            return np.full(self._heights.shape[1:], np.nan)
+        if self.count < 5:
+            return np.quantile(self._heights[:self.count], self.p, axis=0)
+        return self._heights[2].copy()
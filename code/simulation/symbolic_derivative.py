@@ -0,0 +1,199 @@
+import math
+
+"""
+Symbolic differentiation of rate formulae parsed into libsbml ASTs. Expressions are
+built as Python source, so that a formula and its derivatives are compiled once from
+the same AST and then evaluated like helper.evaluate_ast_as_string evaluates a formula.
+Only the operators and functions of rate laws are supported, anything else raises
+ValueError.
+"""
+
+# Functions available to compiled expressions, next to the species and parameters
+FUNCTIONS = {"exp": math.exp, "log": math.log, "sqrt": math.sqrt, "pi": math.pi, "e": math.e}
+
+
+def _ast():
+    import libsbml
+    return libsbml
+
+
+def _is_zero(expression):
+    return expression == "0"
+
+
+def _add(a, b):
+    if _is_zero(a):
+        return b
+    if _is_zero(b):
+        return a
+    return "({} + {})".format(a, b)
+
+
+def _subtract(a, b):
+    if _is_zero(b):
+        return a
+    if _is_zero(a):
+        return "(-{})".format(b)
+    return "({} - {})".format(a, b)
+
+
+def _multiply(a, b):
+    if _is_zero(a) or _is_zero(b):
+        return "0"
+    if a == "1":
+        return b
+    if b == "1":
+        return a
+    return "({} * {})".format(a, b)
+
+
+def _divide(a, b):
+    if _is_zero(a):
+        return "0"
+    if b == "1":
+        return a
+    return "({} / {})".format(a, b)
+
+
+def _children(node):
+    return [node.getChild(i) for i in range(node.getNumChildren())]
+
+
+def to_expression(node):
+    """
+    Return the given AST as a Python expression
+    :param libsbml.ASTNode node: to convert
+    :returns str of the expression
+    """
+
+    libsbml = _ast()
+    node_type = node.getType()
+    children = [to_expression(c) for c in _children(node)]
+
+    if node.isNumber():
+        return repr(float(node.getValue()))
+    elif node_type == libsbml.AST_NAME:
+        return node.getName()
+    elif node_type == libsbml.AST_CONSTANT_E:
+        return "e"
+    elif node_type == libsbml.AST_CONSTANT_PI:
+        return "pi"
+    elif node_type == libsbml.AST_PLUS:
+        return "(" + " + ".join(children) + ")" if children else "0"
+    elif node_type == libsbml.AST_MINUS:
+        return "(-{})".format(children[0]) if len(children) == 1 else "({} - {})".format(*children)
+    elif node_type == libsbml.AST_TIMES:
+        return "(" + " * ".join(children) + ")" if children else "1"
+    elif node_type == libsbml.AST_DIVIDE:
+        return "({} / {})".format(*children)
+    elif node_type in (libsbml.AST_POWER, libsbml.AST_FUNCTION_POWER):
+        return "({} ** {})".format(*children)
+    elif node_type == libsbml.AST_FUNCTION_EXP:
+        return "exp({})".format(children[0])
+    elif node_type == libsbml.AST_FUNCTION_LN:
+        return "log({})".format(children[0])
+    elif node_type == libsbml.AST_FUNCTION_LOG:
+        # The first child is the base, 10 when the formula gives none
+        return "log({}, {})".format(children[-1], children[0]) if len(children) == 2 else \
+            "log({}, 10)".format(children[0])
+    elif node_type == libsbml.AST_FUNCTION_ROOT:
+        # The first child is the degree, 2 when the formula gives none
+        return "({} ** (1 / {}))".format(children[-1], children[0]) if len(children) == 2 else \
+            "sqrt({})".format(children[0])
+    else:
+        raise ValueError("Cannot differentiate node type: {}".format(node_type))
+
+
+def differentiate(node, name):
+    """
+    Return the derivative of the given AST with respect to the given name, as a
+    Python expression
+    :param libsbml.ASTNode node: to differentiate
+    :param str name: variable of the derivative
+    :returns str of the derivative, "0" if the AST does not depend on the name
+    """
+
+    libsbml = _ast()
+    node_type = node.getType()
+    children = _children(node)
+
+    if node.isNumber() or node_type in (libsbml.AST_CONSTANT_E, libsbml.AST_CONSTANT_PI):
+        return "0"
+    elif node_type == libsbml.AST_NAME:
+        return "1" if node.getName() == name else "0"
+    elif node_type == libsbml.AST_PLUS:
+        result = "0"
+        for c in children:
+            result = _add(result, differentiate(c, name))
+        return result
+    elif node_type == libsbml.AST_MINUS:
+        if len(children) == 1:
+            return _subtract("0", differentiate(children[0], name))
+        return _subtract(differentiate(children[0], name), differentiate(children[1], name))
+    elif node_type == libsbml.AST_TIMES:
+        # Product rule: the sum of the products with one factor differentiated in each
+        factors = [to_expression(c) for c in children]
+        result = "0"
+        for i, c in enumerate(children):
+            term = differentiate(c, name)
+            for k, f in enumerate(factors):
+                if k != i:
+                    term = _multiply(term, f)
+            result = _add(result, term)
+        return result
+    elif node_type == libsbml.AST_DIVIDE:
+        u, v = (to_expression(c) for c in children)
+        du, dv = (differentiate(c, name) for c in children)
+        return _subtract(_divide(du, v), _divide(_multiply(u, dv), "({} ** 2)".format(v)))
+    elif node_type in (libsbml.AST_POWER, libsbml.AST_FUNCTION_POWER):
+        u, v = (to_expression(c) for c in children)
+        du, dv = (differentiate(c, name) for c in children)
+        if _is_zero(dv):
+            return _multiply(_multiply(v, "({} ** ({} - 1))".format(u, v)), du)
+        # d(u^v) = u^v (v' ln u + v u' / u)
+        return _multiply("({} ** {})".format(u, v),
+                         _add(_multiply(dv, "log({})".format(u)), _divide(_multiply(v, du), u)))
+    elif node_type == libsbml.AST_FUNCTION_EXP:
+        return _multiply(to_expression(node), differentiate(children[0], name))
+    elif node_type == libsbml.AST_FUNCTION_LN:
+        return _divide(differentiate(children[0], name), to_expression(children[0]))
+    elif node_type in (libsbml.AST_FUNCTION_LOG, libsbml.AST_FUNCTION_ROOT):
+        base = to_expression(children[0]) if len(children) == 2 else None
+        if base is not None and not _is_zero(differentiate(children[0], name)):
+            raise ValueError("Cannot differentiate a log or root with a variable base")
+
+        u = to_expression(children[-1])
+        du = differentiate(children[-1], name)
+        if node_type == libsbml.AST_FUNCTION_LOG:
+            return _divide(du, _multiply(u, "log({})".format(base or "10")))
+        degree = base or "2"
+        return _multiply("((1 / {}) * {} ** (1 / {} - 1))".format(degree, u, degree), du)
+    else:
+        raise ValueError("Cannot differentiate node type: {}".format(node_type))
+
+
+def compile_formula(formula_string, names):
+    """
+    Return a formula and its derivatives with respect to each of the given names, all
+    compiled from the same expression
+    :param str formula_string: formula in the L3 syntax of libsbml
+    :param List[str] names: variables of the derivatives
+    :returns Tuple[code, Dict[str, code]] of the formula and the derivatives which are not
+        identically zero, to be evaluated with eval() in a namespace of values and FUNCTIONS
+    """
+
+    from libsbml import parseL3Formula
+
+    ast = parseL3Formula(formula_string)
+    if ast is None:
+        raise ValueError("Cannot parse formula: {}".format(formula_string))
+
+    formula = compile(to_expression(ast), "<formula>", "eval")
+
+    derivatives = dict()
+    for name in names:
+        expression = differentiate(ast, name)
+        if not _is_zero(expression):
+            derivatives[name] = compile(expression, "<derivative of {}>".format(name), "eval")
+
+    return formula, derivatives
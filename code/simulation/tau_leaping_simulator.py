@@ -0,0 +1,176 @@
+import numpy as np
+
+from simulation.compiled_network import CompiledNetwork
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.random_stream import RandomStream
+from simulation.trajectory_recorder import EventRecorder
+
+
+class TauLeapingSimulator:
+    """
+    Explicit tau-leaping with the adaptive step size selection of Cao, Gillespie and
+    Petzold. Each leap fires every non-critical reaction a Poisson distributed number
+    of times, and the step size is chosen so that no propensity is expected to change
+    by more than a fraction epsilon of itself.
+
+    A reaction is critical when it is at most n_critical firings away from exhausting
+    one of its reactants. Critical reactions never fire more than once per leap, and
+    when the leap would be too short to pay off, the simulator falls back to exact
+    SSA steps.
+
+    Source: Cao, Y., Gillespie, D. T. & Petzold, L. R. (2006) Efficient step size
+        selection for the tau-leaping simulation method. J. Chem. Phys. 124, 044109
+
+    :param float epsilon: error control parameter, the allowed relative change of propensities per leap
+    :param int n_critical: reactions this many firings away from exhausting a reactant are critical
+    :param float ssa_threshold: fall back to SSA when the leap is shorter than this many mean SSA steps
+    :param int ssa_steps: the number of exact SSA steps to take when falling back
+    """
+
+    def __init__(self, epsilon=0.03, n_critical=10, ssa_threshold=10, ssa_steps=100):
+        self.epsilon = epsilon
+        self.n_critical = n_critical
+        self.ssa_threshold = ssa_threshold
+        self.ssa_steps = ssa_steps
+
+    def _leap_size(self, compiled, x, a, non_critical, orders):
+        """
+        Return the largest leap which keeps the expected change and the standard deviation
+        of every species below max(epsilon * x_i / g_i, 1), where g_i is the species' order
+        :param CompiledNetwork compiled: network being simulated
+        :param np.ndarray x: current state vector
+        :param np.ndarray a: propensities in the current state
+        :param np.ndarray non_critical: boolean mask of non-critical reactions
+        :param np.ndarray orders: order of each species, see CompiledNetwork.species_orders
+        :returns float of leap size, inf if no species limits it
+        """
+
+        rates = np.where(non_critical, a, 0.0)
+        mu = compiled.stoichiometry @ rates
+        sigma2 = self._stoichiometry_squared @ rates
+
+        bound = np.maximum(self.epsilon * x / np.maximum(orders, 1), 1.0)
+        limited = orders > 0
+
+        with np.errstate(divide="ignore"):
+            by_mean = np.where(limited & (mu != 0), bound / np.abs(mu), np.inf)
+            by_variance = np.where(limited & (sigma2 > 0), bound ** 2 / sigma2, np.inf)
+
+        return min(by_mean.min(initial=np.inf), by_variance.min(initial=np.inf))
+
+    def _critical(self, x, a):
+        """
+        Return a boolean mask of the reactions which can fire and are at most n_critical
+        firings away from using up one of their reactants
+        :param np.ndarray x: current state vector
+        :param np.ndarray a: propensities in the current state
+        :returns np.ndarray of critical reactions
+        """
+
+        firings_left = np.full(a.shape, np.inf)
+        np.minimum.at(firings_left, self._reactant_reactions,
+                      np.floor(x[self._reactant_species] / self._reactant_counts))
+        return (a > 0) & (firings_left < self.n_critical)
+
+    def _ssa_steps(self, compiled, x, t, end_time, recorder, rng):
+        """
+        Take up to ssa_steps exact direct method steps, recording every event
+        :returns float of the time reached
+        """
+
+        for _ in range(self.ssa_steps):
+            a = np.maximum(compiled.propensities(x), 0.0)
+            a0 = a.sum()
+            if a0 <= 0:
+                return end_time
+
+            t_next = t + rng.exponential(a0)
+            if t_next > end_time:
+                return end_time
+            t = t_next
+
+            recorder.advance(t, x)
+            j = rng.pick(np.cumsum(a), a0)
+            for i, change in compiled.changes[j]:
+                x[i] += change
+            recorder.record(t, x, j)
+
+        return t
+
+    def _compile(self, net):
+        compiled = CompiledNetwork(net)
+        stoichiometry = compiled.stoichiometry.tocoo()
+        self._stoichiometry_squared = compiled.stoichiometry.multiply(compiled.stoichiometry).tocsc()
+
+        reactants = stoichiometry.data < 0
+        self._reactant_species = stoichiometry.row[reactants]
+        self._reactant_reactions = stoichiometry.col[reactants]
+        self._reactant_counts = -stoichiometry.data[reactants]
+
+        return compiled
+
+    """
+    Performs a tau-leaping simulation of the given network in the given
+    interval (dictated by the simulation setting given) and returns
+    a list of results. The given network is not modified.
+    :param Network net: to simulate
+    :param SimulationSettings sim: for simulation
+    :param Any rng: RandomStream or seed for the random numbers, None for a random seed
+    :param EventRecorder recorder: decides which states are kept, every leap by default
+    :returns SimulationResults of the simulation, or the results of the given recorder
+    """
+
+    def run(self, net, sim, rng=None, recorder=None):
+        rng = RandomStream.of(rng)
+        recorder = recorder or EventRecorder()
+        compiled = self._compile(net)
+        orders = compiled.species_orders()
+
+        x = compiled.initial_state()
+        t = sim.start_time
+        recorder.start(compiled.species_names, sim, t, x, compiled.changes)
+
+        while t < sim.end_time:
+            a = np.maximum(compiled.propensities(x), 0.0)
+            a0 = a.sum()
+            if a0 <= 0:
+                break
+
+            critical = self._critical(x, a)
+            leap = self._leap_size(compiled, x, a, ~critical, orders)
+
+            if leap < self.ssa_threshold / a0:
+                t = self._ssa_steps(compiled, x, t, sim.end_time, recorder, rng)
+                continue
+
+            a0_critical = a[critical].sum()
+            critical_leap = rng.exponential(a0_critical) if a0_critical > 0 else np.inf
+
+            while True:
+                tau = min(leap, critical_leap, sim.end_time - t)
+
+                firings = rng.generator.poisson(np.where(critical, 0.0, a) * tau)
+                if critical_leap <= min(leap, sim.end_time - t):
+                    firings[rng.pick(np.cumsum(np.where(critical, a, 0.0)), a0_critical)] += 1
+
+                new_x = x + compiled.stoichiometry @ firings
+                if (new_x >= 0).all():
+                    break
+
+                # Too many firings drove a species negative, retry with half the step
+                leap = tau / 2
+
+            t = t + tau
+            recorder.advance(t, x)
+            x = new_x
+            recorder.record(t, x)
+
+        return recorder.finish(sim.end_time, x)
+
+    @staticmethod
+    def simulate(net, sim, rng=None, recorder=None):
+        return TauLeapingSimulator().run(net, sim, rng, recorder)
+
+    @staticmethod
+    def visualise(results, sim):
+        GillespieSimulator.visualise(results, sim)
@@ -0,0 +1,525 @@
+import numpy as np
+from scipy import sparse
+
+
+class SampledTrajectory:
+    """
+    States of a stochastic simulation at a sequence of times, stored as one array
+    :param np.ndarray times: time of each sample
+    :param np.ndarray values: (time x species) values
+    :param List[str] species_names: species in the order of the columns of values
+    """
+
+    def __init__(self, times, values, species_names):
+        self.times = times
+        self.values = values
+        self.species_names = species_names
+
+    def __len__(self):
+        return len(self.times)
+
+    def species(self, name):
+        """
+        Return the values of one species at every sample
+        :param str name: species name
+        :returns np.ndarray of values
+        """
+
+        return self.values[:, self.species_names.index(name)]
+
+
+class EventRecorder:
+    """
+    Records the state after every event as a (time, Dict[str, float]) tuple, which is
+    the SimulationResults format of GillespieSimulator. Memory grows with the number
+    of events.
+
+    All recorders are driven the same way by the simulators: start() with the initial
+    state, then for every event advance() with the state before it and record() with
+    the state after it, and finally finish() which returns the results. Simulators
+    which run outside Python call record_events() with batches of events instead of
+    advance() and record(), which needs the changes given to start().
+    """
+
+    # Whether record_events() works, recorders which do not keep the changes given to
+    # start() have to set this to False
+    RECORDS_EVENT_BATCHES = True
+
+    def start(self, species_names, sim, t, x, changes=None):
+        """
+        :param List[str] species_names: species in the order of the state vector
+        :param SimulationSettings sim: settings of the simulation being recorded
+        :param float t: start time
+        :param Sequence[float] x: initial state vector
+        :param List[List[Tuple[int, int]]] changes: (species index, change) pairs of each
+            reaction, see CompiledNetwork.changes, None if unknown
+        """
+
+        self.species_names = species_names
+        self.changes = changes
+        self._state = self._state_dict(x)
+        self.results = [(t, self._state)]
+
+    def _state_dict(self, x):
+        if isinstance(x, np.ndarray):
+            x = x.tolist()
+        return dict(zip(self.species_names, x))
+
+    def advance(self, t, x):
+        """
+        Called before the event at time t, with the state which held until then
+        :param float t: time of the next event
+        :param Sequence[float] x: current state vector
+        """
+
+        pass
+
+    def record(self, t, x, j=None):
+        """
+        Called after the event at time t
+        :param float t: time of the event
+        :param Sequence[float] x: state vector after the event
+        :param int j: index of the fired reaction, None if several reactions fired
+        """
+
+        if j is None or self.changes is None:
+            self._state = self._state_dict(x)
+        else:
+            # Only a couple of species change, so copying the last state is
+            # cheaper than building a new dictionary from the state vector
+            self._state = self._state.copy()
+            for i, _ in self.changes[j]:
+                self._state[self.species_names[i]] = x[i]
+
+        self.results.append((t, self._state))
+
+    def record_events(self, times, reactions, x):
+        """
+        Called with a chunk of events at once by simulators which run outside Python,
+        in place of advance() and record() for every event
+        :param np.ndarray times: time of each event
+        :param np.ndarray reactions: index of the reaction fired at each event
+        :param List[int] x: state vector before the first event, updated in place to
+            the state after the last one
+        """
+
+        changes = self.changes
+        for t, j in zip(times.tolist(), reactions.tolist()):
+            self.advance(t, x)
+            for i, change in changes[j]:
+                x[i] += change
+            self.record(t, x, j)
+
+    def finish(self, t, x):
+        """
+        Called when the simulation ends
+        :param float t: end time
+        :param Sequence[float] x: final state vector
+        :returns the recorded results
+        """
+
+        return self.results
+
+    def extend(self, sim):
+        """
+        Called when a simulation is resumed with new settings, e.g. a later end time
+        :param SimulationSettings sim: settings the simulation continues with
+        """
+
+        pass
+
+
+class GridRecorder(EventRecorder):
+    """
+    Records the state only at the points of the time space of the simulation settings,
+    each point taking the state after the last event at or before it (sample-and-hold).
+    The output is preallocated, so memory is bounded by the time space rather than the
+    number of events.
+    """
+
+    def start(self, species_names, sim, t, x, changes=None):
+        self.species_names = species_names
+        self.changes = changes
+        self._stoichiometry = None
+        self.time_space = sim.generate_time_space()
+        if len(self.time_space) == 0:
+            raise ValueError("Grid output needs a time grid, set the precision of the simulation settings")
+
+        self.values = np.empty((len(self.time_space), len(species_names)))
+        self._next = 0
+        self._next_time = self.time_space[0]
+
+    def advance(self, t, x):
+        if t > self._next_time:
+            self._fill_until(t, x)
+
+    def _fill_until(self, t, x):
+        """
+        Set every grid point before time t to the given state
+        """
+
+        end = int(np.searchsorted(self.time_space, t, side="left"))
+        if end > self._next:
+            self.values[self._next:end] = x
+            self._next = end
+
+        self._next_time = self.time_space[self._next] if self._next < len(self.time_space) else np.inf
+
+    def record(self, t, x, j=None):
+        pass
+
+    def record_events(self, times, reactions, x):
+        if not len(times):
+            return
+
+        if self._stoichiometry is None:
+            rows = [i for c in self.changes for i, _ in c]
+            columns = [j for j, c in enumerate(self.changes) for _ in c]
+            values = [change for c in self.changes for _, change in c]
+            self._stoichiometry = sparse.csc_matrix((values, (rows, columns)), dtype=np.int64,
+                                                    shape=(len(self.species_names), len(self.changes)))
+
+        def fired(j):
+            return self._stoichiometry @ np.bincount(j, minlength=len(self.changes))
+
+        state = np.array(x)
+        start = 0
+
+        # Grid points before the last event of the chunk see only events of the chunk
+        for end in np.searchsorted(times, self.time_space[self._next:], side="right"):
+            if end == len(times):
+                break
+            state += fired(reactions[start:end])
+            start = end
+            self.values[self._next] = state
+            self._next += 1
+
+        state += fired(reactions[start:])
+        x[:] = state.tolist()
+        self._next_time = self.time_space[self._next] if self._next < len(self.time_space) else np.inf
+
+    def extend(self, sim):
+        """
+        Continue on the time space of the given settings, which has to start with the
+        grid points filled so far
+        :param SimulationSettings sim: settings the simulation continues with
+        """
+
+        time_space = sim.generate_time_space()
+        filled = self.time_space[:self._next]
+        if len(time_space) < self._next or not np.allclose(time_space[:self._next], filled, rtol=1e-12, atol=0):
+            raise ValueError("The new time space does not extend the grid recorded so far")
+
+        values = np.empty((len(time_space), len(self.species_names)))
+        values[:self._next] = self.values[:self._next]
+        self.time_space = time_space
+        self.values = values
+        self._next_time = time_space[self._next] if self._next < len(time_space) else np.inf
+
+    def finish(self, t, x):
+        """
+        :returns SampledTrajectory of the states on the time grid
+        """
+
+        self._fill_until(np.inf, x)
+        return SampledTrajectory(self.time_space, self.values, self.species_names)
+
+
+class EveryKthEventRecorder(EventRecorder):
+    """
+    Records the state after every k-th event, as well as the initial and final states.
+    :param int k: record one event in every k
+    """
+
+    def __init__(self, k):
+        self.k = k
+
+    def start(self, species_names, sim, t, x, changes=None):
+        self.species_names = species_names
+        self.changes = changes
+        self._count = 0
+        self._times = [t]
+        self._values = [np.array(x, dtype=float)]
+        self._last_time = t
+
+    def record(self, t, x, j=None):
+        self._count += 1
+        self._last_time = t
+
+        if self._count == self.k:
+            self._count = 0
+            self._times.append(t)
+            self._values.append(np.array(x, dtype=float))
+
+    def finish(self, t, x):
+        """
+        :returns SampledTrajectory of the recorded events
+        """
+
+        if self._count:
+            self._times.append(self._last_time)
+            self._values.append(np.array(x, dtype=float))
+
+        return SampledTrajectory(np.array(self._times), np.array(self._values), self.species_names)
+
+
+class ChunkedEventRecorder(EventRecorder):
+    """
+    Records the state after every event into fixed size chunks, for streaming a
+    simulation. Full chunks are handed over with take(), so memory stays bounded by
+    the chunk size however long the simulation runs.
+    :param int chunk_size: number of states in each chunk
+    """
+
+    def __init__(self, chunk_size=1024):
+        self.chunk_size = chunk_size
+
+    def start(self, species_names, sim, t, x, changes=None):
+        self.species_names = species_names
+        self.changes = changes
+        self.chunks = []
+        self._new_chunk()
+        self._append(t, x)
+
+    def _new_chunk(self):
+        self._times = np.empty(self.chunk_size)
+        self._values = np.empty((self.chunk_size, len(self.species_names)))
+        self._size = 0
+
+    def _append(self, t, x):
+        self._times[self._size] = t
+        self._values[self._size] = x
+        self._size += 1
+
+        if self._size == self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._size:
+            self.chunks.append(SampledTrajectory(self._times[:self._size], self._values[:self._size],
+                                                 self.species_names))
+            self._new_chunk()
+
+    def record(self, t, x, j=None):
+        self._append(t, x)
+
+    def take(self):
+        """
+        Return the chunks completed since the last call
+        :returns List[SampledTrajectory] of chunks
+        """
+
+        chunks = self.chunks
+        self.chunks = []
+        return chunks
+
+    def finish(self, t, x):
+        """
+        :returns List[SampledTrajectory] of the chunks not taken yet, including the last partial one
+        """
+
+        self._flush()
+        return self.take()
+
+
+class ChunkedGridRecorder(ChunkedEventRecorder):
+    """
+    Records the state at the points of the time space of the simulation settings
+    (sample-and-hold) into fixed size chunks, for streaming a simulation.
+    :param int chunk_size: number of grid points in each chunk
+    """
+
+    def start(self, species_names, sim, t, x, changes=None):
+        self.species_names = species_names
+        self.changes = changes
+        self.chunks = []
+        self.time_space = sim.generate_time_space()
+        if len(self.time_space) == 0:
+            raise ValueError("Grid output needs a time grid, set the precision of the simulation settings")
+
+        self._next = 0
+        self._next_time = self.time_space[0]
+        self._new_chunk()
+
+    def advance(self, t, x):
+        while t > self._next_time:
+            self._append(self._next_time, x)
+            self._next += 1
+            self._next_time = self.time_space[self._next] if self._next < len(self.time_space) else np.inf
+
+    def record(self, t, x, j=None):
+        pass
+
+    def finish(self, t, x):
+        self.advance(np.inf, x)
+        return super().finish(t, x)
+
+
+class TimeAverageStatistics:
+    """
+    Time-weighted statistics of a stochastic trajectory
+    :param List[str] species_names: species in the order of the species axes
+    :param float duration: length of time the statistics cover
+    :param np.ndarray sums: integral of each species over time
+    :param np.ndarray squares: integral of the square of each species over time
+    :param List[np.ndarray] histograms: time spent at each count, per species
+    :param np.ndarray lag_products: (lags x species) mean products of samples lag apart, None if not estimated
+    :param np.ndarray sample_mean: mean of the samples the lag products come from
+    :param float lag_spacing: time between two lags
+    """
+
+    def __init__(self, species_names, duration, sums, squares, histograms, lag_products, sample_mean, lag_spacing):
+        self.species_names = species_names
+        self.duration = duration
+        self.sums = sums
+        self.squares = squares
+        self.histograms = histograms
+        self.lag_products = lag_products
+        self.sample_mean = sample_mean
+        self.lag_spacing = lag_spacing
+
+    @property
+    def mean(self):
+        return self.sums / self.duration
+
+    @property
+    def variance(self):
+        return self.squares / self.duration - self.mean ** 2
+
+    def histogram(self, name):
+        """
+        Return the fraction of time a species spent at each count
+        :param str name: species name
+        :returns np.ndarray of fractions, indexed by count
+        """
+
+        return self.histograms[self.species_names.index(name)] / self.duration
+
+    def autocorrelation(self):
+        """
+        Return the autocorrelation of each species at each lag, the first lag being 0
+        :returns np.ndarray of (lags x species) autocorrelations, None if not estimated
+        """
+
+        if self.lag_products is None:
+            return None
+
+        covariance = self.lag_products - self.sample_mean ** 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return covariance / covariance[0]
+
+
+class StatisticsRecorder(EventRecorder):
+    """
+    Keeps no trajectory, only time-weighted means, variances and per-species histograms
+    of the counts, and optionally autocorrelations, accumulated as events happen.
+    Memory is bounded by species x (largest count + lags) however long the simulation.
+
+    A species' statistics are only updated when it changes, with the time it held its
+    previous value, so the cost per event does not grow with the number of species.
+    Autocorrelations are estimated from samples of the trajectory every lag_spacing,
+    keeping the last lags samples.
+    :param float burn_in: time after the start of the simulation before accumulating
+    :param int lags: number of lags to estimate the autocorrelation at, 0 for none
+    :param float lag_spacing: time between two lags
+    """
+
+    def __init__(self, burn_in=0.0, lags=0, lag_spacing=1.0):
+        self.burn_in = burn_in
+        self.lags = lags
+        self.lag_spacing = lag_spacing
+
+    def start(self, species_names, sim, t, x, changes=None):
+        count = len(species_names)
+
+        self.species_names = species_names
+        self.changes = changes
+        self._x = [int(v) for v in x]
+        self._start = t + self.burn_in
+        self._since = [self._start] * count
+        self._sums = [0.0] * count
+        self._squares = [0.0] * count
+        self._histograms = [np.zeros(max(v, 0) + 1) for v in self._x]
+
+        if self.lags:
+            self._samples = np.zeros((self.lags + 1, count))
+            self._sample_count = 0
+            self._sample_sums = np.zeros(count)
+            self._products = np.zeros((self.lags + 1, count))
+            self._next_sample = self._start
+
+    def _hold(self, i, t):
+        """
+        Account for species i holding its value from when it last changed until time t
+        """
+
+        dt = t - self._since[i]
+        if dt <= 0:
+            return
+
+        v = self._x[i]
+        self._sums[i] += v * dt
+        self._squares[i] += v * v * dt
+
+        histogram = self._histograms[i]
+        if v >= len(histogram):
+            grown = np.zeros(max(v + 1, 2 * len(histogram)))
+            grown[:len(histogram)] = histogram
+            histogram = self._histograms[i] = grown
+        histogram[v] += dt
+
+        self._since[i] = t
+
+    def _sample(self, t):
+        """
+        Take samples at every sampling time before t, for the autocorrelation
+        """
+
+        x = np.array(self._x, dtype=float)
+        while self._next_sample < t:
+            # Row k holds the sample taken k samples ago
+            self._samples = np.roll(self._samples, 1, axis=0)
+            self._samples[0] = x
+            self._sample_count += 1
+            self._sample_sums += x
+
+            filled = min(self._sample_count, self.lags + 1)
+            self._products[:filled] += x * self._samples[:filled]
+            self._next_sample += self.lag_spacing
+
+    def advance(self, t, x):
+        if self.lags and t > self._next_sample:
+            self._sample(t)
+
+    def record(self, t, x, j=None):
+        changed = range(len(self._x)) if j is None or self.changes is None else [i for i, _ in self.changes[j]]
+
+        for i in changed:
+            if t > self._start:
+                self._hold(i, t)
+            self._x[i] = int(x[i])
+
+    def finish(self, t, x):
+        """
+        :returns TimeAverageStatistics of the trajectory after the burn-in
+        """
+
+        if self.lags:
+            self._sample(np.nextafter(t, np.inf))
+
+        for i in range(len(self._x)):
+            self._hold(i, t)
+
+        duration = t - self._start
+        if duration <= 0:
+            raise ValueError("The burn-in covers the whole simulation")
+
+        lag_products = sample_mean = None
+        if self.lags:
+            # Lag k has one product less for every one of the first k samples
+            counts = np.maximum(self._sample_count - np.arange(self.lags + 1), 1)
+            lag_products = self._products / counts[:, np.newaxis]
+            sample_mean = self._sample_sums / max(self._sample_count, 1)
+
+        return TimeAverageStatistics(self.species_names, duration, np.array(self._sums), np.array(self._squares),
+                                     self._histograms, lag_products, sample_mean, self.lag_spacing)
@@ -0,0 +1,84 @@
+import copy
+import time
+
+from models.simulation_settings import SimulationSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.compiled_network import CompiledNetwork
+from simulation.composition_rejection_simulator import CompositionRejectionSimulator
+from simulation.gillespie_simulator import GillespieSimulator
+from simulation.next_reaction_simulator import NextReactionSimulator
+from simulation.random_stream import RandomStream
+from test import get_synthetic_network
+
+"""
+Scaling benchmark of the stochastic simulators on synthetic networks of growing size.
+Prints the average wall clock time per event for each simulator and network size.
+The times include compiling the network and recording the state after every event.
+"""
+
+REACTION_COUNTS = [100, 1000, 5000, 10000, 50000]
+EVENTS = 2000
+
+# GillespieSimulator evaluates every propensity several times per event, so it gets
+# fewer events to keep the benchmark short on the largest networks
+LEGACY_EVENTS = 20
+
+
+def legacy_time_per_event(net, events):
+    """
+    Return the average time per event of GillespieSimulator. Its simulate() truncates the
+    end time to whole seconds, which is millions of events on the larger networks, so
+    this times the body of its loop directly.
+    :param Network net: network to simulate
+    :param int events: number of events to simulate
+    :returns float of seconds per event
+    """
+
+    net = copy.deepcopy(net)
+    rng = RandomStream()
+
+    start = time.perf_counter()
+    for _ in range(events):
+        r0 = GillespieSimulator._calculate_r0(net)
+        GillespieSimulator._get_delta_time(r0, rng)
+        net.species = GillespieSimulator._get_next_state(net, r0, rng)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / events
+
+
+def time_per_event(simulator, net, events):
+    """
+    Return the average time per event of a run which is long enough for roughly the
+    given number of events
+    :param Any simulator: simulator class with a simulate(net, sim) method
+    :param Network net: network to simulate
+    :param int events: approximate number of events to simulate
+    :returns float of seconds per event
+    """
+
+    compiled = CompiledNetwork(net)
+    a0 = compiled.propensities(compiled.initial_state()).sum()
+    sim = SimulationSettings(0, events / a0, 0, [])
+
+    start = time.perf_counter()
+    results = simulator.simulate(net, sim)
+    elapsed = time.perf_counter() - start
+
+    return elapsed / max(len(results), 1)
+
+
+if __name__ == '__main__':
+    simulators = [CompiledGillespieSimulator, NextReactionSimulator, CompositionRejectionSimulator]
+
+    print("{:>10} {:>30} {:>15}".format("reactions", "simulator", "us/event"))
+
+    for reactions in REACTION_COUNTS:
+        net = get_synthetic_network(reactions // 4)
+
+        t = legacy_time_per_event(net, LEGACY_EVENTS)
+        print("{:>10} {:>30} {:>15.1f}".format(reactions, GillespieSimulator.__name__, t * 1e6))
+
+        for simulator in simulators:
+            t = time_per_event(simulator, net, EVENTS)
+            print("{:>10} {:>30} {:>15.1f}".format(reactions, simulator.__name__, t * 1e6))
@@ -0,0 +1,81 @@
+from functools import lru_cache
+
+import numpy as np
+
+from models.simulation_settings import SimulationSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.trajectory_recorder import GridRecorder
+from test import get_test_network1
+
+"""
+Checks shared by the tests of the stochastic simulators. Samples are compared with
+exact moments, or with compiled direct method samples, within a few standard errors,
+with fixed seeds so that every run of the tests draws the same samples.
+"""
+
+# Stationary means and variances of test.get_gene_expression_network()
+GENE_EXPRESSION_MEAN = np.array([10.0, 50.0])
+GENE_EXPRESSION_VARIANCE = np.array([10.0, 50.0 * (1 + 1 / 0.7)])
+
+# Long enough for the variances of the gene expression network to relax, 12 / (2 gp)
+GENE_EXPRESSION_SIM = SimulationSettings(0, 30, 2, [])
+
+NETWORK1_SIM = SimulationSettings(0, 5, 2, [])
+
+# Seeds of the compiled direct method references, apart from those of the tested samples
+REFERENCE_SEED = 10 ** 6
+REFERENCE_SEEDS = 200
+
+
+def final_states(simulator, net, sim, seeds):
+    """
+    Return the last grid sample of a trajectory per seed
+    :param Any simulator: simulator class with a simulate(net, sim, rng, recorder) method
+    :returns np.ndarray of (seeds x species) values
+    """
+
+    return np.array([simulator.simulate(net, sim, seed, GridRecorder()).values[-1] for seed in seeds])
+
+
+def _assert_close(samples, mean, variance, mean_error, sd_error, sigmas):
+    assert np.all(np.abs(samples.mean(axis=0) - mean) <= sigmas * mean_error), \
+        "means {} differ from {}".format(samples.mean(axis=0), mean)
+    np.testing.assert_allclose(samples.std(axis=0, ddof=1), np.sqrt(variance), rtol=sigmas * sd_error)
+
+
+def assert_moments(samples, mean, variance, sigmas=4.0):
+    """
+    Assert that independent samples have the given means and standard deviations,
+    within the given number of standard errors of their estimates
+    :param np.ndarray samples: (samples x species) values
+    """
+
+    samples = np.asarray(samples, dtype=float)
+    # The relative standard error of a sample standard deviation is about 1 / sqrt(2 (n - 1))
+    _assert_close(samples, mean, variance, np.sqrt(np.asarray(variance) / len(samples)),
+                  np.sqrt(1 / (2 * (len(samples) - 1))), sigmas)
+
+
+@lru_cache(maxsize=None)
+def network1_reference():
+    """
+    Return the means and variances of test network 1 at the end of NETWORK1_SIM, over
+    compiled direct method trajectories
+    :returns Tuple[np.ndarray, np.ndarray] of means and variances
+    """
+
+    samples = final_states(CompiledGillespieSimulator, get_test_network1(), NETWORK1_SIM,
+                           range(REFERENCE_SEED, REFERENCE_SEED + REFERENCE_SEEDS))
+    return samples.mean(axis=0), samples.var(axis=0, ddof=1)
+
+
+def assert_matches_network1_reference(samples, sigmas=4.0):
+    """
+    Assert that samples of test network 1 at the end of NETWORK1_SIM have the means and
+    standard deviations of the compiled direct method, allowing for the error of both
+    """
+
+    samples = np.asarray(samples, dtype=float)
+    mean, variance = network1_reference()
+    _assert_close(samples, mean, variance, np.sqrt(variance / len(samples) + variance / REFERENCE_SEEDS),
+                  np.sqrt(1 / (2 * (len(samples) - 1)) + 1 / (2 * (REFERENCE_SEEDS - 1))), sigmas)
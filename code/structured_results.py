@@ -37,6 +37,16 @@ class StructuredResults:
     :returns Dict[str, np.ndarray] of key: species name, value: unstructured result
     """
 
+    """
+    Return the structured results of a stochastic trajectory sampled on a time grid
+    :param SampledTrajectory trajectory: e.g. from a simulation with a GridRecorder
+    :returns StructuredResults of the trajectory
+    """
+
+    @staticmethod
+    def from_sampled(trajectory):
+        return StructuredResults(trajectory.values, trajectory.species_names, trajectory.times)
+
     @staticmethod
     def label_results(results, labels):
         labeled_results = dict()
@@ -1,4 +1,5 @@
 from math import log, e
+from random import Random
 
 from constraint_satisfaction.constraint import Constraint
 from constraint_satisfaction.constraint_satisfaction import ConstraintSatisfaction
@@ -310,6 +311,43 @@ def get_large_network():
     return net
 
 
+def get_synthetic_network(genes, seed=0):
+    """
+    Return a random network of the given number of genes. Each gene has four reactions:
+    transcription regulated by the protein of another random gene, translation and the
+    degradation of its mRNA and protein.
+    :param int genes: number of genes
+    :param int seed: seed for the random choices
+    """
+
+    rand = Random(seed)
+
+    species = dict()
+    for g in range(genes):
+        species["m" + str(g)] = rand.randrange(0, 50)
+        species["p" + str(g)] = rand.randrange(0, 200)
+
+    reactions = []
+    for g in range(genes):
+        mrna = "m" + str(g)
+        protein = "p" + str(g)
+        regulator = "p" + str(rand.randrange(genes))
+        reg_type = rand.choice([RegType.ACTIVATION, RegType.REPRESSION])
+
+        trans = TranscriptionFormula(rand.uniform(1, 30), mrna)
+        trans.set_regulation(2, [Regulation(regulator, mrna, reg_type, 40)])
+
+        reactions += [Reaction(mrna + "_trans", [], [mrna], trans),
+                      Reaction(protein + "_translation", [], [protein], TranslationFormula(rand.uniform(0.5, 10), mrna)),
+                      Reaction(mrna + "_deg", [mrna], [], DegradationFormula(rand.uniform(0.01, 0.1), mrna)),
+                      Reaction(protein + "_deg", [protein], [], DegradationFormula(rand.uniform(0.01, 0.1), protein))]
+
+    net = Network()
+    net.species = species
+    net.reactions = reactions
+    return net
+
+
 def get_test_network4():
     species = {"X": 1, "Y": 1, "Z": 1}
 
@@ -373,6 +411,27 @@ def get_test_network5():
     return net5
 
 
+def get_gene_expression_network():
+    """
+    Return a network of one constitutive gene, whose counts relax to a distribution with
+    known moments: the mRNA is Poisson with mean k / gm, the protein has mean
+    b k / (gm gp) and variance mean * (1 + b / (gm + gp)), where k = 5, gm = 0.5, b = 1
+    and gp = 0.2. It starts at the stationary means.
+    """
+
+    species = {"m": 10, "p": 50}
+
+    reactions = [Reaction("m_trans", [], ["m"], TranscriptionFormula(5, "m")),
+                 Reaction("m_deg", ["m"], [], DegradationFormula(0.5, "m")),
+                 Reaction("p_translation", [], ["p"], TranslationFormula(1, "m")),
+                 Reaction("p_deg", ["p"], [], DegradationFormula(0.2, "p"))]
+
+    net = Network()
+    net.species = species
+    net.reactions = reactions
+    return net
+
+
 def get_constraints1():
     c = Constraint("X", lambda v: v - 40, (20, 40))
     c.pretty_print = "X" + "<=" + str(40) + " for time: " + str(20) + "s - " + str(40) + "s"
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation.batch_gillespie_simulator import BatchGillespieSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, \
+    NETWORK1_SIM, assert_matches_network1_reference, assert_moments
+from test import get_gene_expression_network, get_test_network1, get_test_network2
+
+"""
+Trajectories advanced in lockstep are independent direct method trajectories, sampled
+onto the time grid.
+"""
+
+
+def test_stationary_moments():
+    results = BatchGillespieSimulator.simulate(get_gene_expression_network(), GENE_EXPRESSION_SIM, 500, 0)
+    assert results.shape == (500, 2, 2)
+    np.testing.assert_array_equal(results[:, 0], np.tile([10, 50], (500, 1)))
+    assert_moments(results[:, -1], GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+
+def test_matches_direct_method():
+    assert_matches_network1_reference(BatchGillespieSimulator.simulate(get_test_network1(), NETWORK1_SIM, 200, 0)[:, -1])
+
+
+def test_seed_gives_the_same_batch():
+    sim = SimulationSettings(0, 10, 11, [])
+    first = BatchGillespieSimulator.simulate(get_test_network2(), sim, 20, 5)
+    np.testing.assert_array_equal(BatchGillespieSimulator.simulate(get_test_network2(), sim, 20, 5), first)
+
+    # Without degradation every count only grows
+    assert np.all(np.diff(first, axis=1) >= 0)
+
+
+def test_batches_need_a_time_grid():
+    with pytest.raises(ValueError):
+        BatchGillespieSimulator.simulate(get_test_network1(), SimulationSettings(0, 10, 0, []), 10)
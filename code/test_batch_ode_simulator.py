@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings, SolverSettings
+from simulation.batch_ode_simulator import BatchOdeSimulator
+from simulation.ode_simulator import OdeSimulator
+from test import get_test_network1
+
+"""
+Integrating many parameter sets as one stacked system has to give every candidate the
+trajectory it gets when OdeSimulator integrates it on its own.
+"""
+
+COLUMNS = [("rate", "x_deg"), ("rate", "y_trans"), ("hill_coeff", "z_trans"), ("k", "y_trans", "px"),
+           ("initial", "x")]
+
+VALUES = np.array([[0.01, 60, 2, 40, 100],
+                   [0.05, 30, 1, 10, 0],
+                   [0.002, 90, 3, 80, 250]])
+
+
+def _candidate_network(values):
+    net = get_test_network1()
+    net.get_reaction_by_name("x_deg").rate_function.rate = values[0]
+
+    y_trans = net.get_reaction_by_name("y_trans").rate_function
+    y_trans.rate = values[1]
+    y_trans.regulators[0].k = values[3]
+
+    net.get_reaction_by_name("z_trans").rate_function.hill_coeff = values[2]
+    net.species["x"] = values[4]
+    return net
+
+
+@pytest.mark.parametrize("method", ["odeint", "BDF", "LSODA", "RK45"])
+@pytest.mark.parametrize("chunk_size", [None, 2])
+def test_batch_matches_independent_runs(method, chunk_size):
+    sim = SimulationSettings(0, 200, 51, [], SolverSettings(method))
+    results = BatchOdeSimulator(chunk_size).simulate(get_test_network1(), sim, COLUMNS, VALUES)
+    assert results.shape == (len(VALUES), 51, 6)
+
+    for candidate, values in zip(results, VALUES):
+        expected = OdeSimulator.simulate(_candidate_network(values), SimulationSettings(0, 200, 51, []))
+        np.testing.assert_allclose(candidate, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_unknown_columns_raise():
+    sim = SimulationSettings(0, 10, 11, [])
+
+    with pytest.raises(ValueError):
+        BatchOdeSimulator().simulate(get_test_network1(), sim, [("initial", "w")], [[1]])
+    with pytest.raises(ValueError):
+        BatchOdeSimulator().simulate(get_test_network1(), sim, [("k", "y_trans", "pz")], [[1]])
+    with pytest.raises(ValueError):
+        BatchOdeSimulator().simulate(get_test_network1(), sim, COLUMNS[:2], VALUES)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from simulation.composition_rejection_simulator import CompositionRejectionSimulator, PropensityGroups
+from simulation.random_stream import RandomStream
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, \
+    NETWORK1_SIM, assert_matches_network1_reference, assert_moments, final_states
+from test import get_gene_expression_network, get_test_network1
+
+"""
+Composition-rejection picks reactions with the probabilities of the direct method,
+however their propensities are spread over the groups.
+"""
+
+
+def test_groups_follow_updates():
+    rng = np.random.default_rng(0)
+    propensities = list(rng.uniform(0, 100, 50))
+    groups = PropensityGroups(propensities)
+
+    for _ in range(1000):
+        j = int(rng.integers(50))
+        # Spread over many powers of two, with some reactions switched off
+        propensities[j] = 0.0 if rng.uniform() < 0.1 else float(10 ** rng.uniform(-3, 3))
+        groups.update(j, propensities[j])
+
+    assert np.isclose(groups.total(), sum(propensities))
+    for group, members in groups.members.items():
+        assert all(groups.group_of[j] == group for j in members)
+        assert np.isclose(groups.sums[group], sum(propensities[j] for j in members))
+    assert sorted(j for members in groups.members.values() for j in members) == \
+        [j for j, a in enumerate(propensities) if a > 0]
+
+
+def test_pick_frequencies():
+    propensities = [0.5, 3.0, 0.0, 10.0, 0.01, 7.5, 40.0]
+    groups = PropensityGroups(propensities)
+    rng = RandomStream(0)
+
+    draws = 20000
+    counts = np.bincount([groups.pick(groups.total(), rng) for _ in range(draws)], minlength=len(propensities))
+    expected = draws * np.array(propensities) / sum(propensities)
+    assert counts[2] == 0
+    assert np.all(np.abs(counts - expected) <= 4 * np.sqrt(expected) + 1)
+
+
+def test_stationary_moments():
+    samples = final_states(CompositionRejectionSimulator, get_gene_expression_network(), GENE_EXPRESSION_SIM,
+                           range(300))
+    assert_moments(samples, GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+
+def test_matches_direct_method():
+    assert_matches_network1_reference(final_states(CompositionRejectionSimulator, get_test_network1(),
+                                                   NETWORK1_SIM, range(100)))
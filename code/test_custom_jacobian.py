@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+from scipy.integrate import odeint
+
+pytest.importorskip("libsbml")
+pytest.importorskip("PyQt5")
+
+from models.formulae.custom_formula import CustomFormula
+from models.formulae.degradation_formula import DegradationFormula
+from models.network import Network
+from models.reaction import Reaction
+from models.simulation_settings import SimulationSettings, SolverSettings
+from simulation.compiled_network import CompiledNetwork
+from simulation.ode_simulator import OdeSimulator
+
+"""
+The analytic Jacobian of a network with custom formulae has to be the derivative of
+the right hand side the integrators see. Custom formulae here use n-ary sums and
+products, unary minus, powers and ln, written in the Python syntax which the
+dictionary based right hand side also evaluates. Every production saturates and A and
+C degrade, so the network stays bounded.
+"""
+
+SIM = SimulationSettings(0, 100, 50, [])
+
+# Compiled right hand side with BDF at tight tolerances
+REFERENCE_SOLVER = SolverSettings("BDF", rtol=1e-10, atol=1e-10)
+
+STATES = [np.array([5.0, 2.0, 3.0]), np.array([40.0, 0.5, 12.0]), np.array([1.0, 30.0, 0.2])]
+
+
+def get_custom_network():
+    net = Network()
+    net.species = {"A": 5, "B": 2, "C": 3}
+    net.symbols = {"vmax": 2.0}
+
+    net.reactions = [
+        Reaction("c_production", [], ["C"], CustomFormula("kd*B*C*C/(1 + C*C) + 0.1*A/(A+1)", {"kd": 0.02}, net, 1)),
+        Reaction("a_to_b", ["A"], ["B"], CustomFormula("vmax*A**2/(K**2 + A**2) - 0.01*B", {"K": 10}, net, 2)),
+        Reaction("a_production", [], ["A"], CustomFormula("1.5 + -0.01*B*C/(1 + B*C) + ln(1 + C)", {}, net, 1)),
+        Reaction("a_deg", ["A"], [], DegradationFormula(0.05, "A")),
+        Reaction("c_deg", ["C"], [], DegradationFormula(0.1, "C")),
+    ]
+
+    return net
+
+
+def _finite_difference_jacobian(fun, x, step=1e-6):
+    jacobian = np.empty((len(x), len(x)))
+    for i in range(len(x)):
+        h = step * max(abs(x[i]), 1.0)
+        up, down = x.copy(), x.copy()
+        up[i] += h
+        down[i] -= h
+        jacobian[:, i] = (fun(up) - fun(down)) / (2 * h)
+    return jacobian
+
+
+@pytest.mark.parametrize("x", STATES)
+def test_compiled_rates_match_formulae(x):
+    net = get_custom_network()
+    compiled = CompiledNetwork(net)
+    state = compiled.state_dict(x)
+
+    expected = [r.rate(state) for r in net.reactions]
+    np.testing.assert_allclose(compiled.propensities(x), expected, rtol=1e-12)
+    np.testing.assert_allclose([f(x) for f in compiled.propensity_functions], expected, rtol=1e-12)
+
+
+@pytest.mark.parametrize("x", STATES)
+def test_analytic_jacobian_matches_finite_differences(x):
+    net = get_custom_network()
+    compiled = CompiledNetwork(net)
+    stoichiometry = compiled.stoichiometry.tocsr().astype(float)
+
+    def compiled_rhs(y):
+        return OdeSimulator._compiled_dy_dt(y, 0, compiled, stoichiometry)
+
+    def legacy_rhs(y):
+        return np.array(OdeSimulator._dy_dt(y, 0, net))
+
+    analytic = compiled.jacobian(x)
+    np.testing.assert_allclose(analytic, _finite_difference_jacobian(compiled_rhs, x), rtol=1e-5, atol=1e-8)
+    np.testing.assert_allclose(analytic, _finite_difference_jacobian(legacy_rhs, x), rtol=1e-5, atol=1e-8)
+    np.testing.assert_allclose(compiled.jacobian(x, sparse_output=True).toarray(), analytic, rtol=1e-12)
+
+
+def _reference(net):
+    return OdeSimulator.simulate(net, SimulationSettings(0, 100, 50, [], REFERENCE_SOLVER), True, "dense")
+
+
+def test_default_simulation_is_the_dictionary_based_odeint():
+    net = get_custom_network()
+    y0 = np.array(list(net.species.values()), dtype=float)
+
+    results = OdeSimulator.simulate(net, SIM)
+    np.testing.assert_array_equal(results, odeint(OdeSimulator._dy_dt, y0, SIM.generate_time_space(), (net,)))
+    assert np.all(np.isfinite(results))
+    np.testing.assert_allclose(results, _reference(net), rtol=1e-6, atol=1e-8)
+
+
+def test_sparse_jacobian_needs_a_solve_ivp_method():
+    net = get_custom_network()
+
+    bdf = SimulationSettings(0, 100, 50, [], SolverSettings("BDF", rtol=1e-8, atol=1e-8))
+
+    with pytest.raises(ValueError):
+        OdeSimulator.simulate(net, SIM, compiled=True, jacobian="sparse")
+    with pytest.raises(ValueError):
+        OdeSimulator.simulate(net, bdf, jacobian="sparse")
+
+    results = OdeSimulator.simulate(net, bdf, True, "sparse")
+    assert np.all(np.isfinite(results))
+    np.testing.assert_allclose(results, _reference(net), rtol=1e-5, atol=1e-7)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from models.formulae.degradation_formula import DegradationFormula
+from models.network import Network
+from models.reaction import Reaction
+from models.simulation_settings import SimulationSettings
+from simulation.decomposed_simulator import DecomposedSimulator
+from simulation.next_reaction_simulator import NextReactionSimulator
+from simulation.ode_simulator import OdeSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, assert_moments
+from test import get_gene_expression_network, get_large_network, get_test_network1
+
+"""
+Simulating the independent modules of a network separately is exact: the merged
+results have to be those of the whole network, in the order of its species.
+"""
+
+
+def get_disjoint_network():
+    # Test network 1 and the gene expression network side by side, their species interleaved
+    gene_expression, network1 = get_gene_expression_network(), get_test_network1()
+    net = Network()
+    net.species = {"px": network1.species["px"], "m": gene_expression.species["m"]}
+    net.species.update(network1.species)
+    net.species["p"] = gene_expression.species["p"]
+    net.reactions = network1.reactions + gene_expression.reactions
+    return net
+
+
+def test_components():
+    modules = DecomposedSimulator.components(get_disjoint_network())
+    assert [list(module.species) for module in modules] == [["px", "py", "pz", "x", "y", "z"], ["m", "p"]]
+    assert [r.name for r in modules[1].reactions] == ["m_trans", "m_deg", "p_translation", "p_deg"]
+    assert len(modules[0].reactions) == len(get_test_network1().reactions)
+
+    assert [len(module.species) for module in DecomposedSimulator.components(get_large_network())] == [16, 6, 4]
+    assert len(DecomposedSimulator.components(get_test_network1())) == 1
+
+
+@pytest.mark.parametrize("network", [get_disjoint_network, get_large_network], ids=lambda n: n.__name__)
+def test_ode_matches_the_whole_network(network):
+    sim = SimulationSettings(0, 100, 101, [])
+    results = DecomposedSimulator(processes=1).ode(network(), sim)
+
+    whole = OdeSimulator.simulate(network(), sim)
+    for i, species in enumerate(network().species):
+        np.testing.assert_allclose(results.species[species], whole[:, i], rtol=1e-5, atol=1e-6)
+
+
+def test_moments_of_every_module():
+    # The gene expression network with a decaying species beside it, which is binomial
+    net = get_gene_expression_network()
+    net.species["r"] = 1000
+    net.reactions.append(Reaction("r_deg", ["r"], [], DegradationFormula(0.1, "r")))
+    assert len(DecomposedSimulator.components(net)) == 2
+
+    samples = np.array([[DecomposedSimulator(1, seed).ssa(net, GENE_EXPRESSION_SIM).species[s][-1]
+                         for s in ("m", "p", "r")] for seed in range(200)])
+    survival = np.exp(-0.1 * GENE_EXPRESSION_SIM.end_time)
+    assert_moments(samples, np.append(GENE_EXPRESSION_MEAN, 1000 * survival),
+                   np.append(GENE_EXPRESSION_VARIANCE, 1000 * survival * (1 - survival)))
+
+
+def test_workers_give_the_results_of_one_process():
+    sim = SimulationSettings(0, 10, 11, [])
+    single = DecomposedSimulator(1, 3).ssa(get_large_network(), sim, NextReactionSimulator)
+    pool = DecomposedSimulator(2, 3).ssa(get_large_network(), sim, NextReactionSimulator)
+
+    assert list(pool.species) == list(get_large_network().species)
+    for species in single.species:
+        np.testing.assert_array_equal(pool.species[species], single.species[species])
+
+
+def test_stochastic_simulation_needs_a_time_grid():
+    with pytest.raises(ValueError):
+        DecomposedSimulator(1, 0).ssa(get_disjoint_network(), SimulationSettings(0, 10, 0, []))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation.ensemble_runner import EnsembleRunner
+from simulation.gillespie_simulator import GillespieSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE, assert_moments
+from test import get_gene_expression_network
+
+"""
+An ensemble has the moments of its trajectories, and a seed gives the same ensemble
+whether it runs in this process or across worker processes.
+"""
+
+SIM = SimulationSettings(0, 30, 7, [])
+
+
+def test_stationary_moments():
+    results = EnsembleRunner(processes=1, seed=0).run(get_gene_expression_network(), SIM, 300)
+
+    assert results.count == 300
+    assert results.trajectories.shape == (300, 7, 2)
+    assert_moments(results.trajectories[:, -1], GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+    np.testing.assert_allclose(results.mean, results.trajectories.mean(axis=0))
+    np.testing.assert_allclose(results.variance, results.trajectories.var(axis=0, ddof=1), rtol=1e-10)
+    assert np.all(results.quantile(0.05) <= results.quantile(0.5))
+    assert np.all(results.quantile(0.5) <= results.quantile(0.95))
+
+
+def test_workers_give_the_ensemble_of_one_process():
+    net = get_gene_expression_network()
+    local = EnsembleRunner(processes=1, seed=3, chunk_size=7).run(net, SIM, 40)
+    pooled = EnsembleRunner(processes=2, seed=3, chunk_size=7).run(net, SIM, 40)
+
+    np.testing.assert_array_equal(pooled.trajectories, local.trajectories)
+    np.testing.assert_array_equal(pooled.mean, local.mean)
+
+
+def test_simulators_without_compiled_networks():
+    # GillespieSimulator changes the network it simulates, every trajectory gets a copy
+    net = get_gene_expression_network()
+    results = EnsembleRunner(GillespieSimulator, processes=1, seed=0, keep_trajectories=False).run(net, SIM, 20)
+
+    assert results.trajectories is None
+    assert results.count == 20
+    assert net.species == get_gene_expression_network().species
+    assert np.all(np.isfinite(results.mean))
+
+
+def test_ensembles_need_a_time_grid():
+    with pytest.raises(ValueError):
+        EnsembleRunner(processes=1).run(get_gene_expression_network(), SimulationSettings(0, 30, 0, []), 10)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.event_log import EventLog, EventLogRecorder
+from simulation.trajectory_recorder import EventRecorder, GridRecorder
+from test import get_test_network1, get_test_network2
+
+"""
+Replaying an event log has to reconstruct exactly the states the simulation went
+through, across chunk boundaries.
+"""
+
+SIM = SimulationSettings(0, 20, 101, [])
+
+
+def test_replay_matches_the_recorded_states(tmp_path):
+    net = get_test_network1()
+    log = CompiledGillespieSimulator.simulate(net, SIM, 6, EventLogRecorder(str(tmp_path), chunk_events=100))
+    events = CompiledGillespieSimulator.simulate(net, SIM, 6, EventRecorder())
+
+    assert len(log) == len(events) - 1
+    assert log.header["chunks"] == len(list(log.chunks())) == int(np.ceil(len(log) / 100))
+    assert (log.start_time, log.end_time) == (SIM.start_time, SIM.end_time)
+
+    times = np.concatenate([chunk["time"] for chunk in log.chunks()])
+    np.testing.assert_array_equal(times, [t for t, _ in events[1:]])
+    for n in range(0, len(events), 37):
+        assert log.state_at(events[n][0]) == events[n][1]
+
+    grid = CompiledGillespieSimulator.simulate(net, SIM, 6, GridRecorder())
+    np.testing.assert_array_equal(log.resample(SIM.generate_time_space()).values, grid.values)
+    assert EventLog(str(tmp_path)).state_at(SIM.end_time) == events[-1][1]
+
+
+def test_check_compares_the_network(tmp_path):
+    log = CompiledGillespieSimulator.simulate(get_test_network1(), SIM, 0, EventLogRecorder(str(tmp_path)))
+    log.check(get_test_network1())
+
+    with pytest.raises(ValueError):
+        log.check(get_test_network2())
+
+
+def test_existing_logs_are_only_overwritten_on_request(tmp_path):
+    net = get_test_network2()
+    CompiledGillespieSimulator.simulate(net, SIM, 0, EventLogRecorder(str(tmp_path), chunk_events=10))
+
+    with pytest.raises(ValueError):
+        CompiledGillespieSimulator.simulate(net, SIM, 1, EventLogRecorder(str(tmp_path)))
+
+    log = CompiledGillespieSimulator.simulate(net, SIM, 1, EventLogRecorder(str(tmp_path), overwrite=True))
+    assert log.header["chunks"] == 1
+
+    (tmp_path / "notes.txt").write_text("kept")
+    with pytest.raises(ValueError):
+        CompiledGillespieSimulator.simulate(net, SIM, 1, EventLogRecorder(str(tmp_path), overwrite=True))
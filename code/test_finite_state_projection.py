@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from scipy.stats import poisson
+
+from models.simulation_settings import SimulationSettings
+from simulation.finite_state_projection import FiniteStateProjection
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE
+from test import get_gene_expression_network
+
+"""
+The finite state projection solves the master equation up to its truncation error,
+which it has to bound: distributions are compared with exact ones, not sampled.
+"""
+
+
+def get_birth_death_network():
+    # The mRNA of the gene expression network on its own, from zero
+    net = get_gene_expression_network()
+    net.species = {"m": 0}
+    net.reactions = [net.get_reaction_by_name("m_trans"), net.get_reaction_by_name("m_deg")]
+    return net
+
+
+def test_marginal_is_poisson():
+    sim = SimulationSettings(0, 10, 11, [])
+    results = FiniteStateProjection(tolerance=1e-6).run(get_birth_death_network(), sim)
+    assert results.species_names == ["m"]
+
+    # From zero, the count is Poisson with mean k / g (1 - exp(-g t))
+    marginal = results.marginal("m")
+    for t, distribution in zip(sim.generate_time_space(), marginal):
+        exact = poisson.pmf(np.arange(len(distribution)), 10 * (1 - np.exp(-0.5 * t)))
+        assert np.abs(distribution - exact).sum() <= 1e-6 + 1e-8
+    np.testing.assert_allclose(results.mean[:, 0], 10 * (1 - np.exp(-0.5 * sim.generate_time_space())), atol=1e-5)
+
+
+def test_bounds_grow_until_the_error_is_within_tolerance():
+    results = FiniteStateProjection(tolerance=1e-4, bounds={"m": 5, "p": 5}).run(get_gene_expression_network(),
+                                                                              GENE_EXPRESSION_SIM)
+
+    assert results.bounds[0] > 20 and results.bounds[1] > 100
+    assert results.errors[0] == 0 and np.all(np.diff(results.errors) >= 0)
+    assert results.error <= 1e-4
+    assert np.all(results.probabilities >= -1e-12)
+    assert abs(results.probabilities[-1].sum() - 1) <= results.error + 1e-8
+
+
+def test_stationary_moments():
+    results = FiniteStateProjection(tolerance=1e-6).run(get_gene_expression_network(), GENE_EXPRESSION_SIM)
+    np.testing.assert_allclose(results.mean[-1], GENE_EXPRESSION_MEAN, rtol=1e-4)
+    np.testing.assert_allclose(results.variance[-1], GENE_EXPRESSION_VARIANCE, rtol=1e-3)
+
+
+def test_invalid_time_space_raises():
+    with pytest.raises(ValueError):
+        FiniteStateProjection().run(get_birth_death_network(), SimulationSettings(0, 10, 1, []))
+    with pytest.raises(ValueError):
+        FiniteStateProjection().run(get_birth_death_network(), SimulationSettings(10, 0, 11, []))
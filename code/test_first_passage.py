@@ -0,0 +1,97 @@
+from math import inf
+
+import numpy as np
+import pytest
+from scipy.linalg import expm
+from scipy.stats import gamma
+
+from models.simulation_settings import SimulationSettings
+from simulation.first_passage import FirstPassageResults, FirstPassageRunner
+from test import get_gene_expression_network
+
+"""
+First passage times of a birth-death process are known exactly, from the master
+equation with the threshold made absorbing, or as sums of exponential waits when
+nothing degrades. Worker processes have to give the times of a single process.
+"""
+
+THRESHOLD = 15
+SIM = SimulationSettings(0, 10, 2, [])
+
+
+def get_birth_death_network():
+    # The mRNA of the gene expression network on its own, from zero
+    net = get_gene_expression_network()
+    net.species = {"m": 0}
+    net.reactions = [net.get_reaction_by_name("m_trans"), net.get_reaction_by_name("m_deg")]
+    return net
+
+
+def _exact_cdf(time_space):
+    # Probability that the count has reached the threshold by each time
+    generator = np.zeros((THRESHOLD + 1, THRESHOLD + 1))
+    for n in range(THRESHOLD):
+        generator[n, n + 1] = 5
+        if n > 0:
+            generator[n, n - 1] = 0.5 * n
+        generator[n, n] = -generator[n].sum()
+    return np.array([expm(generator * t)[0, THRESHOLD] for t in time_space])
+
+
+def many_molecules(state):
+    return state["m"] >= THRESHOLD
+
+
+def test_passage_time_distribution():
+    results = FirstPassageRunner({"m": THRESHOLD}, processes=1, seed=0).run(get_birth_death_network(), SIM, 1000)
+    assert len(results.times) == 1000
+
+    time_space = np.linspace(1, 10, 10)
+    exact = _exact_cdf(time_space)
+    assert np.all(np.abs(results.cdf(time_space) - exact) <= 4 * np.sqrt(exact * (1 - exact) / 1000) + 1e-3)
+    assert results.fraction_passed == results.cdf([SIM.end_time])[0]
+    assert np.all(results.passage_times() <= SIM.end_time)
+
+
+def test_pure_birth_waits_are_gamma_distributed():
+    net = get_birth_death_network()
+    net.reactions = net.reactions[:1]
+    results = FirstPassageRunner({"m": 3}, processes=1, seed=1).run(net, SIM, 1000)
+
+    # Three exponential waits at rate 5; a 10 time unit horizon censors none of them
+    assert results.fraction_passed == 1
+    assert abs(results.mean() - 0.6) <= 4 * np.sqrt(3 / 25 / 1000)
+    for p in (0.1, 0.5, 0.9):
+        assert abs(gamma.cdf(results.quantile(p), 3, scale=0.2) - p) <= 4 * np.sqrt(p * (1 - p) / 1000)
+
+
+def test_workers_give_the_times_of_one_process():
+    net = get_birth_death_network()
+    single = FirstPassageRunner(predicate=many_molecules, processes=1, seed=2, chunk_size=7).run(net, SIM, 50)
+    pool = FirstPassageRunner(predicate=many_molecules, processes=2, seed=2).run(net, SIM, 50)
+    np.testing.assert_array_equal(pool.times, single.times)
+
+    # The threshold and the predicate describe the same condition
+    thresholds = FirstPassageRunner({"m": THRESHOLD}, processes=1, seed=2).run(net, SIM, 50)
+    np.testing.assert_array_equal(thresholds.times, single.times)
+
+
+def test_quantiles_of_censored_times():
+    results = FirstPassageResults(np.array([2.0, inf, 1.0, inf]))
+    assert results.fraction_passed == 0.5
+    assert results.quantile(0) == 1.0
+    assert results.quantile(0.25) == 1.0
+    assert results.quantile(0.5) == 2.0
+    assert results.quantile(0.75) == inf
+    assert results.mean() == 1.5
+
+    assert FirstPassageResults(np.empty(0)).quantile(0.5) == inf
+    with pytest.raises(ValueError):
+        results.quantile(1.5)
+
+
+def test_invalid_conditions_raise():
+    with pytest.raises(ValueError):
+        FirstPassageRunner()
+    with pytest.raises(ValueError):
+        FirstPassageRunner({"p": 10}, processes=1).run(get_birth_death_network(), SIM, 10)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from models.formulae.degradation_formula import DegradationFormula
+from models.formulae.transcription_formula import TranscriptionFormula
+from models.formulae.translation_formula import TranslationFormula
+from models.network import Network
+from models.reaction import Reaction
+from simulation.hybrid_simulator import HybridSimulator
+from simulation.ode_simulator import OdeSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, \
+    NETWORK1_SIM, REFERENCE_SEEDS, assert_moments, final_states, network1_reference
+from test import get_gene_expression_network, get_test_network1
+
+"""
+The hybrid simulator has to be the direct method when no reaction is fast, and keep
+the noise of the slow reactions when the fast ones are integrated.
+"""
+
+
+def get_fast_translation_network():
+    # The gene expression network with 100 times the translation rate: the mRNA stays
+    # slow and stochastic, the protein is fast and follows it deterministically
+    net = get_gene_expression_network()
+    net.species = {"m": 10, "p": 5000}
+    net.get_reaction_by_name("p_translation").rate_function.rate = 100
+    return net
+
+
+def test_stationary_moments_without_fast_reactions():
+    # Too few copies of either species for a reaction to be fast; hybrid steps cost more
+    # than those of the direct method, fewer samples
+    samples = final_states(HybridSimulator, get_gene_expression_network(), GENE_EXPRESSION_SIM, range(150))
+    assert_moments(samples, GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+
+def test_means_match_direct_method():
+    # px starts with enough copies to be integrated, which drops its intrinsic noise,
+    # so only the means are those of the direct method
+    samples = final_states(HybridSimulator, get_test_network1(), NETWORK1_SIM, range(50))
+    mean, variance = network1_reference()
+    assert np.all(np.abs(samples.mean(axis=0) - mean) <= 4 * np.sqrt(variance / 50 + variance / REFERENCE_SEEDS))
+
+
+def test_slow_noise_drives_fast_species():
+    samples = final_states(HybridSimulator, get_fast_translation_network(), GENE_EXPRESSION_SIM, range(60))
+
+    # The protein filters the Poisson noise of the mRNA, Var(p) = b^2 Var(m) / (gp (gm + gp))
+    assert_moments(samples, [10, 5000], [10, 100 ** 2 * 10 / (0.2 * 0.7)])
+
+
+def test_all_fast_reactions_follow_the_ode():
+    net = get_fast_translation_network()
+    net.species["m"] = 1000
+    net.get_reaction_by_name("m_trans").rate_function.rate = 500
+    net.get_reaction_by_name("p_translation").rate_function.rate = 1
+
+    # Every species has enough copies for every reaction to be fast, nothing fires
+    results = HybridSimulator(rtol=1e-8, atol=1e-8).run(net, GENE_EXPRESSION_SIM, 0)
+    assert len(results) == 2
+    np.testing.assert_allclose(list(results[-1][1].values()), OdeSimulator.simulate(net, GENE_EXPRESSION_SIM)[-1],
+                               rtol=1e-5)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation.langevin_simulator import LangevinSimulator
+from simulation.ode_simulator import OdeSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, assert_moments
+from test import get_gene_expression_network, get_test_network1
+
+"""
+The Chemical Langevin Equation of a linear network has the exact means and variances
+of the chemical master equation, whichever the scheme, as long as the counts stay far
+from zero.
+"""
+
+
+def get_busy_gene_expression_network():
+    # The gene expression network with 100 times the transcription rate, far from zero
+    net = get_gene_expression_network()
+    net.species = {"m": 1000, "p": 5000}
+    net.get_reaction_by_name("m_trans").rate_function.rate = 500
+    return net
+
+
+@pytest.mark.parametrize("scheme", LangevinSimulator.SCHEMES)
+def test_stationary_moments(scheme):
+    results = LangevinSimulator(scheme, 0.01).run(get_busy_gene_expression_network(), GENE_EXPRESSION_SIM, 2000, 0)
+    assert results.shape == (2000, 2, 2)
+    assert_moments(results[:, -1], 100 * GENE_EXPRESSION_MEAN, [1000, 5000 * (1 + 1 / 0.7)])
+
+
+@pytest.mark.parametrize("scheme", LangevinSimulator.SCHEMES)
+def test_mean_follows_the_ode(scheme):
+    # Noise around the mean of a linear network averages out
+    net = get_busy_gene_expression_network()
+    net.species = {"m": 0, "p": 0}
+    sim = SimulationSettings(0, 10, 11, [])
+    results = LangevinSimulator(scheme, 0.01).run(net, sim, 1000, 0)
+
+    expected = OdeSimulator.simulate(net, sim)
+    spread = results.std(axis=0, ddof=1) / np.sqrt(1000)
+    assert np.all(np.abs(results.mean(axis=0) - expected)[1:] <= 4 * spread[1:] + 1e-2 * expected[1:])
+
+
+def test_seed_gives_the_same_realisations():
+    sim = SimulationSettings(0, 10, 11, [])
+    first = LangevinSimulator("milstein").run(get_test_network1(), sim, 5, 3)
+    np.testing.assert_array_equal(LangevinSimulator("milstein").run(get_test_network1(), sim, 5, 3), first)
+    assert np.all(first >= 0)
+
+    assert LangevinSimulator.simulate(get_test_network1(), sim, 3).shape == (11, 6)
+
+
+def test_invalid_settings_raise():
+    with pytest.raises(ValueError):
+        LangevinSimulator("runge-kutta")
+    with pytest.raises(ValueError):
+        LangevinSimulator().run(get_test_network1(), SimulationSettings(0, 10, 0, []), 5)
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation.moment_simulator import MomentSimulator
+from simulation.ode_simulator import OdeSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE, NETWORK1_SIM, REFERENCE_SEEDS, \
+    network1_reference
+from test import get_gene_expression_network, get_test_network1
+
+"""
+The moment equations are exact for a linear network, whichever the closure, and have
+to give the moments the direct method samples for a Hill network.
+"""
+
+# The covariance of the gene expression network relaxes at gm + gp = 0.7
+STATIONARY_SIM = SimulationSettings(0, 100, 101, [])
+
+
+@pytest.mark.parametrize("closure", MomentSimulator.CLOSURES)
+def test_stationary_moments_of_linear_network(closure):
+    results = MomentSimulator(closure).run(get_gene_expression_network(), STATIONARY_SIM)
+    assert results.species_names == ["m", "p"]
+    assert results.mean.shape == (101, 2) and results.covariance.shape == (101, 2, 2)
+
+    np.testing.assert_allclose(results.mean[-1], GENE_EXPRESSION_MEAN, rtol=1e-6)
+    np.testing.assert_allclose(results.variance[-1], GENE_EXPRESSION_VARIANCE, rtol=1e-6)
+    # Cov(m, p) = b mean(m) / (gm + gp)
+    np.testing.assert_allclose(results.covariance[-1, 0, 1], 10 / 0.7, rtol=1e-6)
+    np.testing.assert_array_equal(results.covariance[-1], results.covariance[-1].T)
+
+
+def test_linear_noise_mean_follows_the_ode():
+    sim = SimulationSettings(0, 100, 101, [])
+    results = MomentSimulator.simulate(get_test_network1(), sim)
+
+    np.testing.assert_allclose(results.mean, OdeSimulator.simulate(get_test_network1(), sim), rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(results.structured_mean().species["px"], results.mean[:, 0])
+    # The initial state is exact
+    np.testing.assert_array_equal(results.covariance[0], 0)
+
+
+@pytest.mark.parametrize("closure", MomentSimulator.CLOSURES)
+def test_moments_match_direct_method(closure):
+    results = MomentSimulator(closure).run(get_test_network1(), NETWORK1_SIM)
+    mean, variance = network1_reference()
+
+    assert np.all(np.linalg.eigvalsh(results.covariance[-1]) >= 0)
+    assert np.all(np.abs(results.mean[-1] - mean) <= 4 * np.sqrt(variance / REFERENCE_SEEDS))
+    np.testing.assert_allclose(np.sqrt(results.variance[-1]), np.sqrt(variance),
+                               rtol=4 * np.sqrt(1 / (2 * (REFERENCE_SEEDS - 1))))
+
+
+def test_unknown_closure_raises():
+    with pytest.raises(ValueError):
+        MomentSimulator("third-order")
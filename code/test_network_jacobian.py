@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from models.input_gate import InputGate
+from models.regulation import Regulation
+from models.reg_type import RegType
+from simulation.compiled_network import CompiledNetwork
+from simulation.ode_simulator import OdeSimulator
+from test import get_large_network, get_repressilator, get_synthetic_network, get_test_network1, \
+    get_test_network2, get_test_network3
+
+"""
+The analytic Jacobian of the compiled kernels (linear, Hill with AND gates, OR gates)
+has to be the derivative of the right hand side, and jacobian_sparsity() has to cover
+every entry which is not zero, as BDF and Radau rely on it.
+"""
+
+
+def get_or_network():
+    # Test network 3 with the AND gate of mG transcription turned into an OR gate
+    net = get_test_network3()
+    net.get_reaction_by_name("mg_trans").rate_function.set_regulation(
+        2, [Regulation("pY", "mG", RegType.REPRESSION, 5), Regulation("pZ", "mG", RegType.ACTIVATION, 5)],
+        input_gate=InputGate.OR)
+    return net
+
+
+def get_synthetic_network20():
+    return get_synthetic_network(20)
+
+
+NETWORKS = [get_repressilator, get_test_network1, get_test_network2, get_test_network3, get_or_network,
+            get_large_network, get_synthetic_network20]
+
+
+def _states(compiled, count=5, seed=0):
+    # Random states around the initial one, away from zero where Hill terms are flat
+    rng = np.random.default_rng(seed)
+    scale = np.maximum(compiled.initial_values, 10.0)
+    return [rng.uniform(0.1, 3.0, compiled.species_count) * scale for _ in range(count)]
+
+
+def _finite_difference_jacobian(fun, x, step=1e-6):
+    jacobian = np.empty((len(x), len(x)))
+    for i in range(len(x)):
+        h = step * max(abs(x[i]), 1.0)
+        up, down = x.copy(), x.copy()
+        up[i] += h
+        down[i] -= h
+        jacobian[:, i] = (fun(up) - fun(down)) / (2 * h)
+    return jacobian
+
+
+@pytest.mark.parametrize("network", NETWORKS, ids=lambda n: n.__name__)
+def test_sparsity_covers_the_jacobian(network):
+    compiled = CompiledNetwork(network())
+    pattern = compiled.jacobian_sparsity().toarray() != 0
+
+    for x in _states(compiled):
+        analytic = compiled.jacobian(x)
+        assert not np.any((analytic != 0) & ~pattern)
+        np.testing.assert_array_equal(compiled.jacobian(x, sparse_output=True).toarray(), analytic)
+
+
+@pytest.mark.parametrize("network", NETWORKS, ids=lambda n: n.__name__)
+def test_analytic_jacobian_matches_finite_differences(network):
+    net = network()
+    compiled = CompiledNetwork(net)
+    stoichiometry = compiled.stoichiometry.tocsr().astype(float)
+
+    def compiled_rhs(y):
+        return OdeSimulator._compiled_dy_dt(y, 0, compiled, stoichiometry)
+
+    def legacy_rhs(y):
+        return np.array(OdeSimulator._dy_dt(y, 0, net))
+
+    for x in _states(compiled):
+        analytic = compiled.jacobian(x)
+        np.testing.assert_allclose(compiled_rhs(x), legacy_rhs(x), rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(analytic, _finite_difference_jacobian(compiled_rhs, x), rtol=1e-5, atol=1e-7)
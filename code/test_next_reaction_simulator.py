@@ -0,0 +1,32 @@
+import numpy as np
+
+from simulation.next_reaction_simulator import NextReactionSimulator
+from simulation.trajectory_recorder import GridRecorder
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, \
+    NETWORK1_SIM, assert_matches_network1_reference, assert_moments, final_states
+from test import get_gene_expression_network, get_test_network1
+
+"""
+The next reaction method samples the same process as the direct method: its samples
+have the exact stationary moments of a linear network, and the moments of compiled
+direct method samples on a regulated one.
+"""
+
+
+def test_stationary_moments():
+    samples = final_states(NextReactionSimulator, get_gene_expression_network(), GENE_EXPRESSION_SIM, range(300))
+    assert_moments(samples, GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+
+def test_matches_direct_method():
+    assert_matches_network1_reference(final_states(NextReactionSimulator, get_test_network1(), NETWORK1_SIM,
+                                                   range(100)))
+
+
+def test_seed_gives_the_same_trajectory():
+    runs = [NextReactionSimulator.simulate(get_test_network1(), NETWORK1_SIM, 7) for _ in range(2)]
+    assert runs[0] == runs[1]
+    assert len(runs[0]) > 1
+
+    recorded = NextReactionSimulator.simulate(get_test_network1(), NETWORK1_SIM, 7, GridRecorder())
+    np.testing.assert_array_equal(recorded.values[-1], list(runs[0][-1][1].values()))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from models.formulae.degradation_formula import DegradationFormula
+from models.formulae.transcription_formula import TranscriptionFormula
+from models.formulae.translation_formula import TranslationFormula
+from models.network import Network
+from models.reaction import Reaction
+from models.simulation_settings import SimulationSettings, SolverSettings
+from simulation.ode_simulator import OdeSimulator
+from test import get_test_network1
+
+"""
+Every integrator of OdeSimulator.solve has to give the trajectory of odeint, within
+its tolerances, and "auto" has to pick a stiff method for a stiff network.
+"""
+
+TOLERANCE = 1e-8
+
+
+def get_stiff_network():
+    # The mRNA relaxes a million times faster than the protein it is translated into
+    net = Network()
+    net.species = {"m": 0, "p": 0}
+    net.reactions = [Reaction("m_trans", [], ["m"], TranscriptionFormula(1000, "m")),
+                     Reaction("m_deg", ["m"], [], DegradationFormula(1000, "m")),
+                     Reaction("p_translation", [], ["p"], TranslationFormula(1, "m")),
+                     Reaction("p_deg", ["p"], [], DegradationFormula(0.001, "p"))]
+    return net
+
+
+def _settings(solver, end_time=1000):
+    return SimulationSettings(0, end_time, 101, [], solver)
+
+
+@pytest.mark.parametrize("method", SolverSettings.METHODS)
+@pytest.mark.parametrize("jacobian", [None, "dense"])
+def test_methods_agree_with_odeint(method, jacobian):
+    net = get_test_network1()
+    expected = OdeSimulator.simulate(net, _settings(None))
+
+    solution = OdeSimulator.solve(net, _settings(SolverSettings(method, TOLERANCE, TOLERANCE)), True, jacobian)
+    assert solution.results.shape == expected.shape
+    assert solution.nfev > 0
+    np.testing.assert_allclose(solution.results, expected, rtol=1e-4, atol=1e-6)
+
+
+def test_auto_picks_a_stiff_method_for_a_stiff_network():
+    stiff = OdeSimulator.solve(get_stiff_network(), _settings(SolverSettings("auto", TOLERANCE, TOLERANCE)),
+                               True, "dense")
+    assert stiff.method == "BDF"
+    np.testing.assert_allclose(stiff.results, OdeSimulator.simulate(get_stiff_network(), _settings(None)),
+                               rtol=1e-5, atol=1e-6)
+
+    non_stiff = OdeSimulator.solve(get_test_network1(), _settings(SolverSettings("auto")), True, "dense")
+    assert non_stiff.method == "RK45"
+
+
+def test_integrator_options():
+    assert SolverSettings().integrator_options() == dict()
+    assert SolverSettings(rtol=1e-6, max_step=2).integrator_options() == {"rtol": 1e-6, "hmax": 2}
+    assert SolverSettings(rtol=1e-6, max_step=2).integrator_options("BDF") == {"rtol": 1e-6, "max_step": 2}
+    assert SolverSettings("RK45", atol=1e-9, max_step=2).integrator_options() == {"atol": 1e-9, "max_step": 2}
+
+    with pytest.raises(ValueError):
+        SolverSettings("Euler")
+
+
+@pytest.mark.parametrize("method", ["BDF", "RK45"])
+def test_dense_output(method):
+    net = get_test_network1()
+
+    solution = OdeSimulator.solve(net, _settings(SolverSettings(method, dense_output=True)), True, "dense")
+    time_space = _settings(None).generate_time_space()
+    np.testing.assert_allclose(solution.sol(time_space).T, solution.results, rtol=1e-12)
+    assert np.all(np.isfinite(solution.sol(time_space[:-1] + 5)))
+
+    assert OdeSimulator.solve(net, _settings(SolverSettings(method)), True, "dense").sol is None
+    assert OdeSimulator.solve(net, _settings(None)).sol is None
+
+
+@pytest.mark.parametrize("method", ["odeint", "BDF", "LSODA", "RK45"])
+def test_first_step_and_last_step(method):
+    net = get_test_network1()
+    sim = _settings(SolverSettings(method, TOLERANCE, TOLERANCE, max_step=5), end_time=100)
+    full = OdeSimulator.solve(net, sim, True, "dense")
+
+    # A segment from the middle of the run, starting with a given step
+    time_space = sim.generate_time_space()
+    segment = OdeSimulator.solve(net, sim, True, "dense", full.results[50], time_space[50:], 0.01)
+    assert 0 < segment.last_step <= 5
+    np.testing.assert_allclose(segment.results, full.results[50:], rtol=1e-5, atol=1e-6)
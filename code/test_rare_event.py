@@ -0,0 +1,94 @@
+from math import sqrt
+
+import numpy as np
+import pytest
+from scipy.linalg import expm
+
+from models.simulation_settings import SimulationSettings
+from simulation.rare_event import MultilevelSplitting, RareEventEstimate, WeightedSimulator
+from test import get_gene_expression_network
+
+"""
+Both rare event estimators are unbiased: their estimates have to be within a few of
+their standard errors of the probability given by the master equation with the target
+made absorbing, with far smaller errors than the direct method gets from as many runs.
+"""
+
+TARGET = 28
+SIM = SimulationSettings(0, 10, 2, [])
+
+
+def get_birth_death_network():
+    # The mRNA of the gene expression network on its own, from zero, Poisson(10) at steady state
+    net = get_gene_expression_network()
+    net.species = {"m": 0}
+    net.reactions = [net.get_reaction_by_name("m_trans"), net.get_reaction_by_name("m_deg")]
+    return net
+
+
+def _count(state):
+    return state["m"]
+
+
+def _exact_probability(target=TARGET):
+    # Probability that the count reaches the target by the end time, the target absorbing
+    generator = np.zeros((target + 1, target + 1))
+    for n in range(target):
+        generator[n, n + 1] = 5
+        if n > 0:
+            generator[n, n - 1] = 0.5 * n
+        generator[n, n] = -generator[n].sum()
+    return expm(generator * SIM.end_time)[0, target]
+
+
+def _assert_estimates(estimate, samples):
+    exact = _exact_probability()
+    assert abs(estimate.probability - exact) <= 4 * estimate.standard_error
+    # The direct method would estimate the same probability with this standard error
+    assert estimate.standard_error < sqrt(exact * (1 - exact) / samples) / 5
+
+
+def test_weighted_simulation():
+    estimate = WeightedSimulator(_count, TARGET, {"m_trans": 1.6, "m_deg": 0.6}, 5000).run(
+        get_birth_death_network(), SIM, 0)
+    assert estimate.samples == 5000 and estimate.events > 0
+    _assert_estimates(estimate, 5000)
+
+
+def test_multilevel_splitting():
+    estimate = MultilevelSplitting(_count, TARGET, 100, 10).run(get_birth_death_network(), SIM, 0)
+    assert estimate.samples == 10
+    _assert_estimates(estimate, 1000)
+
+    lower, upper = estimate.confidence_interval()
+    assert lower <= _exact_probability() <= upper
+
+
+def test_unbiased_weighted_simulation_is_the_direct_method():
+    # A likely event, without biases every weight is zero or one
+    target, samples = 12, 2000
+    estimate = WeightedSimulator(_count, target, dict(), samples).run(get_birth_death_network(), SIM, 1)
+
+    exact = _exact_probability(target)
+    assert abs(estimate.probability - exact) <= 4 * sqrt(exact * (1 - exact) / samples)
+    assert estimate.probability * samples == pytest.approx(round(estimate.probability * samples))
+
+
+def test_target_reached_at_the_start():
+    net = get_birth_death_network()
+    net.species["m"] = TARGET
+
+    assert WeightedSimulator(_count, TARGET, dict(), 10).run(net, SIM, 0).probability == 1
+    assert MultilevelSplitting(_count, TARGET, 10, 2).run(net, SIM, 0).probability == 1
+
+
+def test_confidence_interval_stays_a_probability():
+    assert RareEventEstimate(0.1, 1.0, 10, 0).confidence_interval() == (0.0, 1.0)
+    assert RareEventEstimate.of_samples([0.5], 0).standard_error == float("inf")
+
+
+def test_invalid_biases_raise():
+    with pytest.raises(ValueError):
+        WeightedSimulator(_count, TARGET, {"m_trans": 0})
+    with pytest.raises(ValueError):
+        WeightedSimulator(_count, TARGET, {"p_trans": 2}, 10).run(get_birth_death_network(), SIM, 0)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation import jit_gillespie
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.event_log import EventLog, EventLogRecorder
+from simulation.trajectory_recorder import ChunkedEventRecorder, EventRecorder, EveryKthEventRecorder, \
+    GridRecorder, SampledTrajectory, StatisticsRecorder, TimeAverageStatistics
+from test import get_test_network2
+
+"""
+Every recorder has to give the same results whether the compiled Gillespie simulator
+feeds it one event at a time (python backend) or in batches (numba backend). Without
+numba installed, the numba backend runs its kernels as plain Python.
+"""
+
+RECORDERS = {
+    "events": lambda path: EventRecorder(),
+    "grid": lambda path: GridRecorder(),
+    "every k-th event": lambda path: EveryKthEventRecorder(7),
+    "chunked events": lambda path: ChunkedEventRecorder(100),
+    "statistics": lambda path: StatisticsRecorder(burn_in=1.0, lags=3),
+    "event log": lambda path: EventLogRecorder(str(path), chunk_events=100),
+}
+
+
+def _as_arrays(results):
+    if isinstance(results, SampledTrajectory):
+        return [results.times, results.values]
+    if isinstance(results, TimeAverageStatistics):
+        return [results.mean, results.variance, results.autocorrelation()]
+    if isinstance(results, EventLog):
+        return _as_arrays(results.resample(np.linspace(results.start_time, results.end_time, 50)))
+    if results and isinstance(results[0], SampledTrajectory):
+        return [a for chunk in results for a in _as_arrays(chunk)]
+
+    return [np.array([t for t, _ in results])] + [np.array([list(s.values()) for _, s in results])]
+
+
+@pytest.fixture
+def numba_backend(monkeypatch):
+    if not jit_gillespie.available():
+        monkeypatch.setattr(jit_gillespie, "available", lambda: True)
+
+
+@pytest.mark.parametrize("name", sorted(RECORDERS))
+def test_recorders_agree_across_backends(name, tmp_path, numba_backend):
+    sim = SimulationSettings(0, 20, 101, [])
+    results = dict()
+
+    for backend in CompiledGillespieSimulator.BACKENDS:
+        recorder = RECORDERS[name](tmp_path / backend)
+        results[backend] = _as_arrays(CompiledGillespieSimulator.simulate(get_test_network2(), sim, 5,
+                                                                          recorder, backend))
+
+    for backend in ("auto", "numba"):
+        assert len(results[backend]) == len(results["python"])
+        for a, b in zip(results[backend], results["python"]):
+            np.testing.assert_allclose(a, b, rtol=1e-12)
+
+
+def test_auto_backend_falls_back_for_recorders_without_batches(numba_backend):
+    class PerEventRecorder(EventRecorder):
+        RECORDS_EVENT_BATCHES = False
+
+    sim = SimulationSettings(0, 5, 0, [])
+    results = CompiledGillespieSimulator.simulate(get_test_network2(), sim, 5, PerEventRecorder())
+    assert len(results) > 1
+
+    with pytest.raises(ValueError):
+        CompiledGillespieSimulator.simulate(get_test_network2(), sim, 5, PerEventRecorder(), "numba")
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings, SolverSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.ode_simulator import OdeSimulator
+from simulation.resumable_simulator import ResumableGillespieSimulator, ResumableOdeSimulator, \
+    load_checkpoint
+from simulation.trajectory_recorder import EventRecorder, GridRecorder
+from test import get_test_network1, get_test_network4
+
+"""
+A resumed run has to give exactly the results of an uninterrupted one, whether it was
+interrupted or is extended to a later end time.
+"""
+
+
+class Interruption(Exception):
+    pass
+
+
+class InterruptedRecorder(EventRecorder):
+    """
+    Records every event, and stops the simulation after a number of them as long as
+    the class has a limit. The limit is not part of the pickled checkpoint, so a
+    resumed run is not interrupted once the class has none.
+    """
+
+    limit = None
+
+    def record(self, t, x, j=None):
+        super().record(t, x, j)
+        if InterruptedRecorder.limit is not None and len(self.results) > InterruptedRecorder.limit:
+            raise Interruption()
+
+
+def test_extended_ssa_matches_a_single_run(tmp_path):
+    net, path = get_test_network1(), str(tmp_path / "ssa.pickle")
+    sim, longer = SimulationSettings(0, 10, 11, []), SimulationSettings(0, 20, 21, [])
+
+    ResumableGillespieSimulator(path).simulate(net, sim, 0, GridRecorder())
+    extended = ResumableGillespieSimulator(path).resume(net, longer)
+    single = ResumableGillespieSimulator(str(tmp_path / "single.pickle")).simulate(net, longer, 0, GridRecorder())
+    np.testing.assert_array_equal(extended.values, single.values)
+
+    # Without an extension the checkpointed run is the direct method
+    compiled = CompiledGillespieSimulator.simulate(net, longer, 0, GridRecorder())
+    np.testing.assert_array_equal(single.values, compiled.values)
+
+
+def test_interrupted_ssa_matches_an_uninterrupted_run(tmp_path):
+    net, path = get_test_network1(), str(tmp_path / "ssa.pickle")
+    sim = SimulationSettings(0, 20, 2, [])
+    uninterrupted = ResumableGillespieSimulator(str(tmp_path / "single.pickle")).simulate(net, sim, 4)
+    assert len(uninterrupted) > 3000
+
+    InterruptedRecorder.limit = 3000
+    try:
+        # A checkpoint every 1024 events
+        with pytest.raises(Interruption):
+            ResumableGillespieSimulator(path, every=0).simulate(net, sim, 4, InterruptedRecorder())
+    finally:
+        InterruptedRecorder.limit = None
+
+    assert load_checkpoint(path)["t"] > 0
+    assert ResumableGillespieSimulator(path).resume(net, sim) == uninterrupted
+
+
+def test_extended_ode_matches_a_single_run(tmp_path):
+    net, path = get_test_network4(), str(tmp_path / "ode.pickle")
+    sim = SimulationSettings(0, 100, 101, [], SolverSettings("auto"))
+    longer = SimulationSettings(0, 200, 201, [], SolverSettings("auto"))
+
+    ResumableOdeSimulator(path, segment=10).simulate(net, sim)
+    extended = ResumableOdeSimulator(path, segment=10).resume(net, longer)
+    single = ResumableOdeSimulator(str(tmp_path / "single.pickle"), segment=10).simulate(net, longer)
+    np.testing.assert_array_equal(extended, single)
+    np.testing.assert_allclose(single, OdeSimulator.simulate(net, longer), rtol=1e-3, atol=1e-3)
+
+
+def test_interrupted_ode_matches_an_uninterrupted_run(tmp_path, monkeypatch):
+    net, path = get_test_network4(), str(tmp_path / "ode.pickle")
+    sim = SimulationSettings(0, 100, 101, [])
+    uninterrupted = ResumableOdeSimulator(str(tmp_path / "single.pickle"), segment=10).simulate(net, sim)
+
+    solve = OdeSimulator.solve
+    calls = []
+
+    def interrupted_solve(*args, **kwargs):
+        calls.append(args)
+        if len(calls) > 4:
+            raise Interruption()
+        return solve(*args, **kwargs)
+
+    # A checkpoint after every segment, the fifth one is interrupted
+    monkeypatch.setattr(OdeSimulator, "solve", staticmethod(interrupted_solve))
+    with pytest.raises(Interruption):
+        ResumableOdeSimulator(path, segment=10, every=0).simulate(net, sim)
+    monkeypatch.undo()
+    assert len(load_checkpoint(path)["rows"]) == 41
+
+    np.testing.assert_array_equal(ResumableOdeSimulator(path, segment=10).resume(net, sim), uninterrupted)
+
+
+def test_resuming_another_run_raises(tmp_path):
+    path = str(tmp_path / "checkpoint.pickle")
+    ResumableOdeSimulator(path).simulate(get_test_network4(), SimulationSettings(0, 100, 101, []))
+
+    with pytest.raises(ValueError):
+        ResumableOdeSimulator(path).resume(get_test_network1(), SimulationSettings(0, 100, 101, []))
+    with pytest.raises(ValueError):
+        ResumableOdeSimulator(path).resume(get_test_network4(), SimulationSettings(0, 200, 101, []))
+
+    ResumableGillespieSimulator(path).simulate(get_test_network4(), SimulationSettings(0, 10, 2, []), 0)
+    with pytest.raises(ValueError):
+        ResumableGillespieSimulator(path).resume(get_test_network1(), SimulationSettings(0, 20, 2, []))
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from scipy.stats import poisson
+
+from models.simulation_settings import SimulationSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.trajectory_recorder import EventRecorder, StatisticsRecorder
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE
+from test import get_gene_expression_network, get_test_network1
+
+"""
+Time averages over one long trajectory of an ergodic network have to give its
+stationary distribution, and have to be the averages of the trajectory the events
+describe.
+"""
+
+LONG_SIM = SimulationSettings(0, 5000, 2, [])
+
+
+@pytest.fixture(scope="module")
+def long_run_statistics():
+    recorder = StatisticsRecorder(burn_in=50, lags=6, lag_spacing=0.5)
+    return CompiledGillespieSimulator.simulate(get_gene_expression_network(), LONG_SIM, 0, recorder)
+
+
+def test_time_averages_match_the_stationary_distribution(long_run_statistics):
+    statistics = long_run_statistics
+    assert statistics.species_names == ["m", "p"]
+    assert statistics.duration == 4950
+
+    # Samples along the trajectory are correlated over 1 / gm and 1 / gp, tolerances are
+    # several times the error of as many independent samples
+    np.testing.assert_allclose(statistics.mean, GENE_EXPRESSION_MEAN, rtol=0.05)
+    np.testing.assert_allclose(statistics.variance, GENE_EXPRESSION_VARIANCE, rtol=0.15)
+
+    histogram = statistics.histogram("m")
+    assert histogram.sum() == pytest.approx(1)
+    assert np.abs(histogram - poisson.pmf(np.arange(len(histogram)), 10)).max() <= 0.01
+
+
+def test_autocorrelation_of_the_mrna_decays_exponentially(long_run_statistics):
+    # The mRNA does not depend on the protein, its autocorrelation is exp(-gm lag)
+    autocorrelation = long_run_statistics.autocorrelation()
+    assert autocorrelation.shape == (7, 2)
+    assert autocorrelation[0, 0] == pytest.approx(1)
+    np.testing.assert_allclose(autocorrelation[:, 0], np.exp(-0.5 * 0.5 * np.arange(7)), atol=0.05)
+
+
+def test_statistics_are_the_averages_of_the_events():
+    sim = SimulationSettings(0, 20, 2, [])
+    net = get_test_network1()
+    statistics = CompiledGillespieSimulator.simulate(net, sim, 3, StatisticsRecorder(burn_in=2))
+    events = CompiledGillespieSimulator.simulate(net, sim, 3, EventRecorder())
+    assert statistics.autocorrelation() is None
+
+    # Every state holds from its event until the next one, clipped to the burn-in
+    times = np.array([t for t, _ in events] + [sim.end_time])
+    states = np.array([list(state.values()) for _, state in events])
+    held = np.diff(np.clip(times, 2, sim.end_time))
+
+    np.testing.assert_allclose(statistics.mean, held @ states / 18, rtol=1e-9)
+    np.testing.assert_allclose(statistics.variance, held @ states ** 2 / 18 - (held @ states / 18) ** 2,
+                               rtol=1e-9, atol=1e-9)
+
+
+def test_burn_in_over_the_whole_simulation_raises():
+    with pytest.raises(ValueError):
+        CompiledGillespieSimulator.simulate(get_test_network1(), SimulationSettings(0, 5, 2, []), 0,
+                                            StatisticsRecorder(burn_in=5))
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from models.simulation_settings import SimulationSettings
+from simulation import steady_state_solver
+from simulation.ode_simulator import OdeSimulator
+from simulation.steady_state_solver import SteadyStateSolver
+from test import get_large_network, get_repressilator, get_test_network1, get_test_network2, \
+    get_test_network3, get_test_network4, get_test_network5
+
+"""
+The steady state solver has to find the fixed point a long integration relaxes to,
+whether Newton finds it directly or pseudo-transient continuation has to follow the
+dynamics there first.
+"""
+
+RELAXING_NETWORKS = [get_test_network1, get_test_network3, get_test_network4, get_test_network5, get_large_network]
+
+
+def _long_run(net):
+    # The slowest species of these networks decay at 0.001, 50 of its time constants
+    return OdeSimulator.simulate(net, SimulationSettings(0, 50000, 501, []), True, "dense")[-1]
+
+
+@pytest.mark.parametrize("network", RELAXING_NETWORKS, ids=lambda n: n.__name__)
+def test_steady_state_matches_long_integration(network):
+    net = network()
+    steady_state = SteadyStateSolver().solve(net)
+
+    assert steady_state.species_names == list(net.species.keys())
+    assert steady_state.residual <= 1e-8 * max(1.0, np.max(steady_state.values))
+    assert steady_state.stable
+    np.testing.assert_allclose(steady_state.values, _long_run(net), rtol=1e-6, atol=1e-6)
+
+
+@pytest.mark.parametrize("network", [get_test_network1, get_test_network4, get_large_network],
+                         ids=lambda n: n.__name__)
+def test_analytic_and_finite_difference_jacobians_agree(network):
+    analytic = SteadyStateSolver(jacobian="analytic").solve(network())
+    finite_differences = SteadyStateSolver(jacobian=None).solve(network())
+
+    assert analytic.method == finite_differences.method == "newton"
+    np.testing.assert_allclose(finite_differences.values, analytic.values, rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(np.sort_complex(finite_differences.eigenvalues), np.sort_complex(analytic.eigenvalues),
+                               rtol=1e-4, atol=1e-8)
+
+
+def test_pseudo_transient_continuation_follows_the_dynamics():
+    # Newton misses the fixed point on the boundary from the short transient, which is
+    # one of two of this network; the continuation has to reach the one the ODEs reach
+    net = get_test_network3()
+    steady_state = SteadyStateSolver().solve(net)
+
+    assert steady_state.method == "pseudo-transient"
+    np.testing.assert_allclose(steady_state.values, _long_run(net), rtol=1e-6, atol=1e-6)
+
+
+def test_network_without_fixed_point_raises():
+    # Nothing degrades in test network 2, it grows without bound
+    with pytest.raises(RuntimeError):
+        SteadyStateSolver().solve(get_test_network2())
+
+
+def test_warm_start_reuses_the_last_fixed_point(monkeypatch):
+    solver = SteadyStateSolver()
+    first = solver.solve(get_test_network4())
+    assert solver.last is first
+
+    def no_transient(*args, **kwargs):
+        raise AssertionError("The transient was integrated")
+
+    # A network with the same species starts from the last fixed point, without a transient
+    monkeypatch.setattr(steady_state_solver, "odeint", no_transient)
+    net = get_test_network4()
+    net.get_reaction_by_name("x_deg").rate_function.rate *= 1.1
+    second = solver.solve(net)
+    assert second.values[0] < first.values[0]
+
+    # Without a warm start, or for other species, the transient is integrated again
+    with pytest.raises(AssertionError):
+        SteadyStateSolver(warm_start=False).solve(get_test_network4())
+    with pytest.raises(AssertionError):
+        solver.solve(get_test_network1())
+
+
+def test_stability_of_fixed_points():
+    assert SteadyStateSolver().solve(get_test_network4()).stable
+
+    # The repressilator oscillates around its only fixed point
+    repressilator = SteadyStateSolver().solve(get_repressilator())
+    assert not repressilator.stable
+    assert np.any(repressilator.eigenvalues.real > 0)
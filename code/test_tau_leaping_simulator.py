@@ -0,0 +1,58 @@
+import numpy as np
+
+from models.formulae.degradation_formula import DegradationFormula
+from models.formulae.transcription_formula import TranscriptionFormula
+from models.formulae.translation_formula import TranslationFormula
+from models.network import Network
+from models.reaction import Reaction
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.tau_leaping_simulator import TauLeapingSimulator
+from statistical_checks import GENE_EXPRESSION_MEAN, GENE_EXPRESSION_SIM, GENE_EXPRESSION_VARIANCE, \
+    NETWORK1_SIM, assert_matches_network1_reference, assert_moments, final_states
+from test import get_gene_expression_network, get_test_network1
+
+"""
+Tau-leaping has to keep the moments of the direct method, both where it leaps and
+where it falls back to exact steps, and never drive a species negative.
+"""
+
+
+def get_busy_gene_expression_network():
+    # The gene expression network with 100 times the transcription rate, so that it leaps
+    net = Network()
+    net.species = {"m": 1000, "p": 5000}
+    net.reactions = [Reaction("m_trans", [], ["m"], TranscriptionFormula(500, "m")),
+                     Reaction("m_deg", ["m"], [], DegradationFormula(0.5, "m")),
+                     Reaction("p_translation", [], ["p"], TranslationFormula(1, "m")),
+                     Reaction("p_deg", ["p"], [], DegradationFormula(0.2, "p"))]
+    return net
+
+
+def test_stationary_moments_of_exact_steps():
+    # Exact steps of tau-leaping cost more than those of the direct method, fewer samples
+    samples = final_states(TauLeapingSimulator, get_gene_expression_network(), GENE_EXPRESSION_SIM, range(150))
+    assert_moments(samples, GENE_EXPRESSION_MEAN, GENE_EXPRESSION_VARIANCE)
+
+
+def test_stationary_moments_of_leaps():
+    net = get_busy_gene_expression_network()
+    leaps = len(TauLeapingSimulator.simulate(net, GENE_EXPRESSION_SIM, 0))
+    events = len(CompiledGillespieSimulator.simulate(net, GENE_EXPRESSION_SIM, 0))
+    assert leaps < events / 10
+
+    samples = final_states(TauLeapingSimulator, net, GENE_EXPRESSION_SIM, range(300))
+    assert_moments(samples, 100 * GENE_EXPRESSION_MEAN, np.array([1000, 5000 * (1 + 1 / 0.7)]))
+
+
+def test_matches_direct_method():
+    assert_matches_network1_reference(final_states(TauLeapingSimulator, get_test_network1(), NETWORK1_SIM,
+                                                   range(100)))
+
+
+def test_species_stay_non_negative():
+    # Few mRNA molecules, degraded fast: critical reactions have to keep them non-negative
+    net = get_gene_expression_network()
+    net.species = {"m": 0, "p": 0}
+    for seed in range(20):
+        leaps = TauLeapingSimulator(epsilon=0.3).run(net, GENE_EXPRESSION_SIM, seed)
+        assert all(count >= 0 for _, state in leaps for count in state.values())
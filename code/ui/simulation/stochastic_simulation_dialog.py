@@ -1,16 +1,29 @@
 import copy
 import threading
 
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QPushButton
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QFormLayout, QLineEdit, QPushButton, QComboBox
 
 import helper
 from models.simulation_settings import SimulationSettings
+from simulation.compiled_gillespie_simulator import CompiledGillespieSimulator
+from simulation.composition_rejection_simulator import CompositionRejectionSimulator
 from simulation.gillespie_simulator import GillespieSimulator
+from simulation.hybrid_simulator import HybridSimulator
+from simulation.next_reaction_simulator import NextReactionSimulator
+from simulation.tau_leaping_simulator import TauLeapingSimulator
 from ui import common_widgets
 from ui.gene_presenter import GenePresenter
 
 
 class StochasticSimulationDialog(QDialog):
+    # Simulation method name: simulator class
+    methods = {"Gillespie": GillespieSimulator,
+               "Gillespie (compiled)": CompiledGillespieSimulator,
+               "Next Reaction Method": NextReactionSimulator,
+               "Composition-rejection": CompositionRejectionSimulator,
+               "Tau-leaping": TauLeapingSimulator,
+               "Hybrid SSA/ODE": HybridSimulator}
+
     def _ok_button_clicked(self):
         time_text = self.time_field.text().strip()
 
@@ -27,9 +40,10 @@ class StochasticSimulationDialog(QDialog):
         # Precision field does not apply to stochastic simulation!
         s = SimulationSettings(0, end_time, 0, [s.strip() for s in species])
         sim_net = copy.deepcopy(GenePresenter.get_instance().network)
+        simulator = self.methods[self.method_combo.currentText()]
 
         def do_simulation():
-            GillespieSimulator.visualise(GillespieSimulator.simulate(sim_net, s), s)
+            simulator.visualise(simulator.simulate(sim_net, s), s)
 
         # t = threading.Thread(target=do_simulation)
         # t.start()
@@ -44,6 +58,11 @@ class StochasticSimulationDialog(QDialog):
         self.time_field.setValidator(helper.get_double_validator())
         fields.addRow(QLabel("Simulation time"), self.time_field)
 
+        self.method_combo = QComboBox()
+        for m in self.methods:
+            self.method_combo.addItem(m)
+        fields.addRow(QLabel("Method"), self.method_combo)
+
         self.species_checkboxes = common_widgets.make_species_checkboxes_layout()
 
         self.ok_button = QPushButton("Ok")